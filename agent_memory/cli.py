@@ -5,17 +5,19 @@ Zero-dependency persistent memory system for GitHub Copilot CLI
 """
 
 import argparse
+import json
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from db import get_db, init_db
+from db import init_db
 from conversations import (
     list_conversations,
     start_conversation,
     add_message,
+    add_messages,
     end_conversation,
     get_conversation,
 )
@@ -26,7 +28,14 @@ from preferences import (
     list_insights,
     add_insight,
 )
-from search import search_all
+from search import search, hybrid_search
+from retention import compact, search_archives
+from stats import counters
+from context import load_context_bundle
+from vectors import get_store, NUMPY_AVAILABLE, SEARCH_CATCH_UP
+
+# Rows embedded per step by 'vectors', so a large backfill reports progress
+VECTOR_BATCH = 5000
 
 
 def cmd_init(args):
@@ -37,29 +46,22 @@ def cmd_init(args):
 
 def cmd_status(args):
     """Show memory system status"""
-    db = get_db()
-    
-    # Count conversations
-    conv_count = db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
-    active_count = db.execute(
-        "SELECT COUNT(*) FROM conversations WHERE end_time IS NULL"
-    ).fetchone()[0]
-    
-    # Count messages
-    msg_count = db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-    
-    # Count preferences and insights
-    pref_count = db.execute("SELECT COUNT(*) FROM preferences").fetchone()[0]
-    insight_count = db.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+    stats = counters()
     
     print("📊 PHEPy Agent Memory Status")
-    print(f"   Conversations: {conv_count} (Active: {active_count})")
-    print(f"   Messages: {msg_count}")
-    print(f"   Preferences: {pref_count}")
-    print(f"   Insights: {insight_count}")
+    print(f"   Conversations: {stats['conversations']} (Active: {stats['active_conversations']})")
+    print(f"   Messages: {stats['messages']}")
+    print(f"   Preferences: {stats['preferences']}")
+    print(f"   Insights: {stats['insights']}")
     print(f"   Database: {Path(__file__).parent / 'memory.db'}")
 
 
+def cmd_context(args):
+    """Print the startup context bundle as JSON (cached until memory.db changes)"""
+    bundle = load_context_bundle(args.recent, args.insights, use_cache=not args.no_cache)
+    print(json.dumps(bundle, indent=2 if args.pretty else None, ensure_ascii=False))
+
+
 def cmd_start(args):
     """Start a new conversation"""
     conv_id = start_conversation(args.title, args.tags.split(",") if args.tags else None)
@@ -72,6 +74,21 @@ def cmd_msg(args):
     print(f"✅ Added {args.role} message to conversation {args.conversation_id}")
 
 
+def cmd_import(args):
+    """Import a transcript (JSON list or JSONL of {role, content}) in one transaction"""
+    with open(args.file, "r", encoding="utf-8") as f:
+        text = f.read()
+    
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        messages = json.loads(stripped)
+    else:
+        messages = [json.loads(line) for line in text.splitlines() if line.strip()]
+    
+    count = add_messages(args.conversation_id, messages)
+    print(f"✅ Imported {count} messages into conversation {args.conversation_id}")
+
+
 def cmd_end(args):
     """End a conversation"""
     end_conversation(args.conversation_id, args.summary)
@@ -179,9 +196,31 @@ def cmd_insight_add(args):
 
 def cmd_search(args):
     """Search across all memory"""
-    results = search_all(args.query, args.limit)
+    pending = 0
+    if args.hybrid:
+        page = {"results": hybrid_search(args.query, args.limit), "next_cursor": None}
+        pending = get_store().backlog()
+    else:
+        page = search(
+            args.query,
+            args.limit,
+            cursor=args.cursor,
+            tags=args.tags.split(",") if args.tags else None,
+            since=args.since,
+            until=args.until,
+            role=args.role,
+            full_text=args.full,
+        )
+    results = page["results"]
+    if args.archive:
+        results = results + search_archives(args.query, args.limit)
+    hint = None
+    if pending > SEARCH_CATCH_UP:
+        hint = f"⚠️  {pending} item(s) not embedded yet, only the newest are searched; run 'python cli.py vectors' to include them all"
     if not results:
         print(f"No results found for: {args.query}")
+        if hint:
+            print(hint)
         return
     
     print(f"\n🔍 Search Results for: {args.query}")
@@ -189,9 +228,52 @@ def cmd_search(args):
     
     for result in results:
         print(f"[{result['type']}] {result['title']}")
-        print(f"   {result['snippet'][:150]}...")
+        print(f"   {result['snippet']}")
         print(f"   [{result['timestamp']}]")
         print()
+    
+    if page["next_cursor"]:
+        print(f"➡️  More results: --cursor=\"{page['next_cursor']}\"")
+    if hint:
+        print(hint)
+
+
+def cmd_vectors(args):
+    """Embed everything not embedded yet, e.g. history from before an upgrade (and optionally prune or re-index)"""
+    store = get_store()
+    backlog = store.backlog()
+    added = 0
+    while True:
+        batch = store.sync(limit=VECTOR_BATCH)
+        if not batch:
+            break
+        added += batch
+        if backlog > VECTOR_BATCH:
+            print(f"   Embedded {added}/{backlog}...")
+    print(f"✅ Embedded {added} new item(s); {store.count} vector(s) in {store.path.name}")
+    if args.prune:
+        print(f"   Pruned {store.prune()} vector(s) of deleted/archived rows")
+    if args.build_ivf:
+        if not NUMPY_AVAILABLE:
+            print("❌ Building the IVF index requires numpy (searches stay exhaustive)")
+            return
+        print(f"   IVF index rebuilt with {store.build_ivf(args.lists)} list(s)")
+
+
+def cmd_compact(args):
+    """Archive old ended conversations and optimize memory.db"""
+    stats = compact(args.days, args.archive_dir, dry_run=args.dry_run)
+    if not stats["conversations"]:
+        print(f"Nothing to compact (no ended conversations older than {args.days} days)")
+        return
+    
+    months = ", ".join(stats["months"])
+    if args.dry_run:
+        print(f"🔎 Would archive {stats['conversations']} conversation(s) into: {months}")
+        return
+    
+    print(f"✅ Archived {stats['conversations']} conversation(s), {stats['messages']} message(s)")
+    print(f"   Months: {months}")
 
 
 def main():
@@ -204,6 +286,13 @@ def main():
     # Status command
     subparsers.add_parser("status", help="Show memory status")
     
+    # Context bundle
+    p = subparsers.add_parser("context", help="Print session-start context as JSON")
+    p.add_argument("--recent", type=int, default=5, help="Recent conversations to include")
+    p.add_argument("--insights", type=int, default=5, help="Recent insights to include")
+    p.add_argument("--pretty", action="store_true", help="Indent the JSON output")
+    p.add_argument("--no-cache", action="store_true", help="Always read from memory.db")
+    
     # Start conversation
     p = subparsers.add_parser("start", help="Start a new conversation")
     p.add_argument("-t", "--title", required=True, help="Conversation title")
@@ -215,6 +304,11 @@ def main():
     p.add_argument("role", choices=["user", "assistant"], help="Message role")
     p.add_argument("content", help="Message content")
     
+    # Import transcript
+    p = subparsers.add_parser("import", help="Bulk import messages from a JSON/JSONL transcript")
+    p.add_argument("conversation_id", type=int, help="Conversation ID")
+    p.add_argument("file", help="Transcript file ({role, content} objects)")
+    
     # End conversation
     p = subparsers.add_parser("end", help="End a conversation")
     p.add_argument("conversation_id", type=int, help="Conversation ID")
@@ -261,6 +355,27 @@ def main():
     p = subparsers.add_parser("search", help="Search all memory")
     p.add_argument("query", help="Search query")
     p.add_argument("-n", "--limit", type=int, default=10, help="Max results")
+    p.add_argument("--cursor", help="Continue from a previous page's cursor")
+    p.add_argument("--tags", help="Only conversations/insights with any of these comma-separated tags")
+    p.add_argument("--since", help="Only results at or after this date (YYYY-MM-DD)")
+    p.add_argument("--until", help="Only results before this date (YYYY-MM-DD)")
+    p.add_argument("--role", choices=["user", "assistant"], help="Only messages with this role")
+    p.add_argument("--full", action="store_true", help="Show full highlighted text instead of snippets")
+    p.add_argument("--archive", action="store_true", help="Also search archived conversations")
+    p.add_argument("--hybrid", action="store_true",
+                   help="Rank by keywords and vector similarity together (ignores filters/--cursor)")
+    
+    # Vector store
+    p = subparsers.add_parser("vectors", help="Embed new and old items for --hybrid search (backfill)")
+    p.add_argument("--prune", action="store_true", help="Drop vectors of deleted/archived rows")
+    p.add_argument("--build-ivf", action="store_true", help="Rebuild the IVF index now (needs numpy)")
+    p.add_argument("--lists", type=int, help="IVF list count (default: sqrt of the vector count)")
+    
+    # Compact
+    p = subparsers.add_parser("compact", help="Archive old conversations and optimize the database")
+    p.add_argument("-d", "--days", type=int, default=90, help="Archive conversations ended more than N days ago")
+    p.add_argument("--archive-dir", help="Archive directory (default: agent_memory/archive)")
+    p.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
     
     args = parser.parse_args()
     
@@ -272,12 +387,16 @@ def main():
     commands = {
         "init": cmd_init,
         "status": cmd_status,
+        "context": cmd_context,
         "start": cmd_start,
         "msg": cmd_msg,
+        "import": cmd_import,
         "end": cmd_end,
         "list": cmd_list,
         "show": cmd_show,
         "search": cmd_search,
+        "compact": cmd_compact,
+        "vectors": cmd_vectors,
     }
     
     if args.command in commands:
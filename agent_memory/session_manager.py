@@ -13,8 +13,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "agent_memory" / "src"))
 
 from db import get_db
 from conversations import start_conversation, end_conversation, list_conversations
-from preferences import add_preference, list_preferences
-from insights import add_insight, list_insights
+from preferences import add_preference, list_preferences, add_insight, list_insights
+from stats import session_summary
+from context import load_context_bundle
 
 WORKSPACE_ROOT = Path(__file__).parent.parent
 
@@ -43,16 +44,7 @@ def quick_end(conv_id, summary):
 
 def active_session():
     """Get the active session info"""
-    db = get_db()
-    cursor = db.execute("""
-        SELECT id, title, start_time, tags
-        FROM conversations
-        WHERE end_time IS NULL
-        ORDER BY start_time DESC
-        LIMIT 1
-    """)
-    
-    row = cursor.fetchone()
+    row = load_context_bundle()["active_conversation"]
     if not row:
         print("No active session")
         return None
@@ -87,59 +79,33 @@ def recent_sessions(limit=5):
 
 def session_stats():
     """Show session statistics"""
-    db = get_db()
-    
-    # Total sessions
-    total = db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
-    
-    # Active
-    active = db.execute("SELECT COUNT(*) FROM conversations WHERE end_time IS NULL").fetchone()[0]
-    
-    # This week
-    this_week = db.execute("""
-        SELECT COUNT(*) FROM conversations 
-        WHERE start_time >= datetime('now', '-7 days')
-    """).fetchone()[0]
-    
-    # Total messages
-    messages = db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-    
-    # Avg messages per session
-    avg_messages = round(messages / total, 1) if total > 0 else 0
+    stats = session_summary()
     
     print("\n📊 Session Statistics")
-    print(f"   Total sessions: {total}")
-    print(f"   Active now: {active}")
-    print(f"   This week: {this_week}")
-    print(f"   Total messages: {messages}")
-    print(f"   Avg messages/session: {avg_messages}")
+    print(f"   Total sessions: {stats['conversations']}")
+    print(f"   Active now: {stats['active_conversations']}")
+    print(f"   This week: {stats['this_week']}")
+    print(f"   Total messages: {stats['messages']}")
+    print(f"   Avg messages/session: {stats['avg_messages']}")
 
 
 def work_context():
     """Show current work context (preferences + recent insights)"""
     print("\n⚙️ Work Context\n")
+    bundle = load_context_bundle()
     
-    # Key preferences
-    prefs = list_preferences()
+    # Key preferences (top 3 per category)
+    prefs = bundle["top_preferences"]
     if prefs:
         print("📌 Key Preferences:")
         for cat in ['work', 'tech', 'workflow']:
-            cat_prefs = [p for p in prefs if p['category'] == cat]
-            if cat_prefs:
+            if cat in prefs:
                 print(f"\n[{cat}]")
-                for p in cat_prefs[:3]:  # Top 3 per category
+                for p in prefs[cat]:
                     print(f"   {p['key']}: {p['value']}")
     
     # Recent insights
-    db = get_db()
-    cursor = db.execute("""
-        SELECT type, content, created_at
-        FROM insights
-        ORDER BY created_at DESC
-        LIMIT 5
-    """)
-    
-    insights = cursor.fetchall()
+    insights = bundle["insights"]
     if insights:
         print("\n💡 Recent Insights:")
         for insight in insights:
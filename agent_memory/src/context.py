@@ -0,0 +1,120 @@
+"""Startup context bundle: everything an agent loads at session start, in one read"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import db
+from stats import counters, top_preferences
+
+BUNDLE_VERSION = 2
+
+
+def cache_path():
+    """Bundle cache file, kept next to the database it was read from"""
+    path = Path(db.DB_PATH)
+    return path.with_name(path.stem + ".context.json")
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if st.st_size == 0:
+        return None  # An empty WAL holds no changes; same as no WAL at all
+    return [st.st_mtime_ns, st.st_size]
+
+
+def database_signature():
+    """
+    Change key for memory.db that needs no SQLite connection.
+    
+    Every commit appends to the WAL and every checkpoint rewrites the main
+    file, so their (mtime, size) pairs change whenever the data does.
+    """
+    path = str(db.DB_PATH)
+    return [BUNDLE_VERSION, _file_signature(path), _file_signature(path + "-wal")]
+
+
+def _read_bundle(recent_limit, insight_limit):
+    conn = db.get_db()
+    started = not conn.in_transaction
+    if started:
+        conn.execute("BEGIN")  # One snapshot for every query below
+    try:
+        active = conn.execute("""
+            SELECT id, title, start_time, tags
+            FROM conversations
+            WHERE end_time IS NULL
+            ORDER BY start_time DESC
+            LIMIT 1
+        """).fetchone()
+        
+        recent = conn.execute("""
+            SELECT id, title, start_time, end_time, summary, tags
+            FROM conversations
+            ORDER BY start_time DESC
+            LIMIT ?
+        """, (recent_limit,)).fetchall()
+        
+        preferences = {}
+        for row in conn.execute("SELECT category, key, value FROM preferences ORDER BY category, key"):
+            preferences.setdefault(row["category"], {})[row["key"]] = row["value"]
+        
+        insights = conn.execute("""
+            SELECT type, content, tags, created_at
+            FROM insights
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (insight_limit,)).fetchall()
+        
+        return {
+            "active_conversation": dict(active) if active else None,
+            "recent_conversations": [dict(row) for row in recent],
+            "preferences": preferences,
+            "top_preferences": top_preferences(per_category=3),
+            "insights": [dict(row) for row in insights],
+            "counters": counters(),
+        }
+    finally:
+        if started:
+            conn.rollback()  # Read-only; just release the snapshot
+
+
+def load_context_bundle(recent_limit=5, insight_limit=5, use_cache=True):
+    """
+    Active conversation, recent sessions, preferences, recent insights and counters.
+    
+    Served from the on-disk cache without opening the database when nothing
+    has changed since it was written; otherwise read in one transaction and
+    re-cached. The result is plain JSON-serialisable data.
+    """
+    signature = database_signature() + [recent_limit, insight_limit]
+    path = cache_path()
+    
+    if use_cache:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("signature") == signature:
+                return cached["bundle"]
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable cache: rebuild it
+    
+    bundle = _read_bundle(recent_limit, insight_limit)
+    bundle["generated_at"] = datetime.now().isoformat(timespec="seconds")
+    
+    if use_cache:
+        # Signature taken before the read: a write that lands meanwhile makes
+        # the next call miss instead of serving stale data
+        temp_path = path.with_suffix(".tmp")
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature, "bundle": bundle}, f)
+            os.replace(temp_path, path)
+        except OSError:
+            pass  # Cache is an optimisation only
+    
+    return bundle
@@ -1,7 +1,12 @@
 """Conversation management functions"""
 
 from datetime import datetime
-from db import get_db
+from db import get_db, get_db_context
+from vectors import request_sync
+
+VALID_ROLES = ("user", "assistant")
+
+INSERT_MESSAGE_SQL = "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)"
 
 
 def start_conversation(title, tags=None):
@@ -19,11 +24,33 @@ def start_conversation(title, tags=None):
 def add_message(conversation_id, role, content):
     """Add a message to a conversation"""
     db = get_db()
-    db.execute(
-        "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
-        (conversation_id, role, content)
-    )
+    db.execute(INSERT_MESSAGE_SQL, (conversation_id, role, content))
     db.commit()
+    request_sync()
+
+
+def add_messages(conversation_id, messages):
+    """
+    Add many messages to a conversation in a single transaction.
+    
+    messages is an iterable of (role, content) tuples or {"role", "content"}
+    dicts. Returns the number of messages inserted; nothing is written if any
+    message is invalid.
+    """
+    rows = []
+    for message in messages:
+        if isinstance(message, dict):
+            role, content = message["role"], message["content"]
+        else:
+            role, content = message
+        if role not in VALID_ROLES:
+            raise ValueError(f"Invalid role {role!r} (expected one of {VALID_ROLES})")
+        rows.append((conversation_id, role, content))
+    
+    with get_db_context() as db:
+        db.executemany(INSERT_MESSAGE_SQL, rows)
+    request_sync()
+    return len(rows)
 
 
 def end_conversation(conversation_id, summary=None):
@@ -40,7 +67,7 @@ def list_conversations(limit=10):
     """List recent conversations"""
     db = get_db()
     cursor = db.execute("""
-        SELECT id, title, start_time, end_time, summary, tags
+        SELECT id, title, start_time, end_time, summary, tags, archived_at
         FROM conversations
         ORDER BY start_time DESC
         LIMIT ?
@@ -55,7 +82,8 @@ def get_conversation(conversation_id):
     
     # Get conversation
     cursor = db.execute("""
-        SELECT id, title, start_time, end_time, summary, tags
+        SELECT id, title, start_time, end_time, summary, tags, archived_at, archive_path,
+               strftime('%Y-%m', start_time) AS archive_month
         FROM conversations
         WHERE id = ?
     """, (conversation_id,))
@@ -65,6 +93,14 @@ def get_conversation(conversation_id):
         return None
     
     conv = dict(conv_row)
+    archive_month = conv.pop("archive_month")
+    archive_path = conv.pop("archive_path")
+    
+    # Archived conversations keep their messages in the monthly archive they were moved to
+    if conv["archived_at"]:
+        from retention import load_archived_messages
+        conv["messages"] = load_archived_messages(conversation_id, archive_month, path=archive_path)
+        return conv
     
     # Get messages
     cursor = db.execute("""
@@ -1,22 +1,91 @@
 """Database connection and initialization"""
 
+import atexit
+import os
 import sqlite3
+import threading
+import weakref
 from pathlib import Path
 from contextlib import contextmanager
 
 DB_PATH = Path(__file__).parent.parent / "memory.db"
 
+# Connection tuning applied once per pooled connection. WAL lets readers run
+# alongside a writer, and synchronous=NORMAL means a commit no longer fsyncs
+# (only checkpoints do), which is what makes per-message logging cheap.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",       # ~16 MB page cache
+    "PRAGMA mmap_size = 268435456",     # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",       # Wait for concurrent writers instead of failing
+)
+
+# Per-connection statement cache, so repeated INSERT/SELECTs are prepared once
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+# Weak so a finished thread's connection is released along with its thread-local
+_pool = weakref.WeakSet()
+_pool_lock = threading.Lock()
+
+
+class _PooledConnection:
+    """Thread-local slot holding one tuned connection"""
+    
+    def __init__(self, path):
+        self.key = (str(path), os.getpid())
+        self.conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE)
+        self.conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+        migrate_db(self.conn)
+
 
 def get_db():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Get the calling thread's pooled database connection (with row factory).
+    
+    The connection is opened on first use and reused for every later call on
+    the same thread, keyed by DB_PATH and process id so a changed path or a
+    forked child gets a fresh connection. Callers must not close it.
+    """
+    slot = getattr(_local, "slot", None)
+    if slot is None or slot.key != (str(DB_PATH), os.getpid()):
+        slot = _PooledConnection(DB_PATH)
+        _local.slot = slot
+        with _pool_lock:
+            _pool.add(slot)
+    return slot.conn
+
+
+def close_db():
+    """Close the calling thread's pooled connection (reopened on next get_db)"""
+    slot = getattr(_local, "slot", None)
+    if slot is not None:
+        _local.slot = None
+        with _pool_lock:
+            _pool.discard(slot)
+        slot.conn.close()
+
+
+@atexit.register
+def close_all():
+    """Close every pooled connection (checkpoints the WAL on the last close)"""
+    with _pool_lock:
+        slots = list(_pool)
+        _pool.clear()
+    for slot in slots:
+        try:
+            slot.conn.close()
+        except sqlite3.ProgrammingError:
+            pass  # Owned by another thread that is still running
 
 
 @contextmanager
 def get_db_context():
-    """Context manager for database connections"""
+    """Context manager for a transaction on the pooled connection"""
     conn = get_db()
     try:
         yield conn
@@ -24,8 +93,170 @@ def get_db_context():
     except Exception:
         conn.rollback()
         raise
-    finally:
-        conn.close()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+# messages_fts/insights_fts are external-content tables: a delete has to pass
+# the old values with the 'delete' command, since the row itself is already gone
+FTS_DELETE_TRIGGERS = {
+    "messages_ad": """
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    """,
+    "insights_ad": """
+        CREATE TRIGGER IF NOT EXISTS insights_ad AFTER DELETE ON insights BEGIN
+            INSERT INTO insights_fts(insights_fts, rowid, content, tags)
+            VALUES ('delete', old.id, old.content, old.tags);
+        END
+    """,
+}
+
+
+def _fix_fts_delete_triggers(conn):
+    """Replace the old delete triggers, which left postings behind, and drop those postings (one-time rebuild)"""
+    for name, table in (("messages_ad", "messages_fts"), ("insights_ad", "insights_fts")):
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+        if row is None or "'delete'" in row[0]:
+            continue
+        conn.execute(f"DROP TRIGGER {name}")
+        conn.execute(FTS_DELETE_TRIGGERS[name])
+        conn.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+
+
+# Trigger-maintained counters so status/stats never scan the big tables
+STATS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS memory_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        conversations INTEGER NOT NULL DEFAULT 0,
+        active_conversations INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        preferences INTEGER NOT NULL DEFAULT 0,
+        insights INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_days (
+        day TEXT PRIMARY KEY,
+        started INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_ai AFTER INSERT ON conversations BEGIN
+        UPDATE memory_stats SET
+            conversations = conversations + 1,
+            active_conversations = active_conversations + (new.end_time IS NULL)
+        WHERE id = 1;
+        INSERT INTO conversation_days (day, started) VALUES (date(new.start_time), 1)
+        ON CONFLICT(day) DO UPDATE SET started = started + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_ad AFTER DELETE ON conversations BEGIN
+        UPDATE memory_stats SET
+            conversations = conversations - 1,
+            active_conversations = active_conversations - (old.end_time IS NULL)
+        WHERE id = 1;
+        UPDATE conversation_days SET started = started - 1 WHERE day = date(old.start_time);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_end AFTER UPDATE OF end_time ON conversations BEGIN
+        UPDATE memory_stats SET
+            active_conversations = active_conversations + (new.end_time IS NULL) - (old.end_time IS NULL)
+        WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_start AFTER UPDATE OF start_time ON conversations
+    WHEN date(new.start_time) IS NOT date(old.start_time) BEGIN
+        UPDATE conversation_days SET started = started - 1 WHERE day = date(old.start_time);
+        INSERT INTO conversation_days (day, started) VALUES (date(new.start_time), 1)
+        ON CONFLICT(day) DO UPDATE SET started = started + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_messages_ai AFTER INSERT ON messages BEGIN
+        UPDATE memory_stats SET messages = messages + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_messages_ad AFTER DELETE ON messages BEGIN
+        UPDATE memory_stats SET messages = messages - 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_preferences_ai AFTER INSERT ON preferences BEGIN
+        UPDATE memory_stats SET preferences = preferences + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_preferences_ad AFTER DELETE ON preferences BEGIN
+        UPDATE memory_stats SET preferences = preferences - 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_insights_ai AFTER INSERT ON insights BEGIN
+        UPDATE memory_stats SET insights = insights + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_insights_ad AFTER DELETE ON insights BEGIN
+        UPDATE memory_stats SET insights = insights - 1 WHERE id = 1;
+    END
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_insights_created ON insights(created_at DESC)",
+)
+
+
+def _install_stats(conn):
+    """Create the counter tables/triggers and backfill them from existing rows (one-time scan)"""
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    
+    conn.execute("""
+        INSERT OR REPLACE INTO memory_stats
+            (id, conversations, active_conversations, messages, preferences, insights)
+        SELECT 1,
+            (SELECT COUNT(*) FROM conversations),
+            (SELECT COUNT(*) FROM conversations WHERE end_time IS NULL),
+            (SELECT COUNT(*) FROM messages),
+            (SELECT COUNT(*) FROM preferences),
+            (SELECT COUNT(*) FROM insights)
+    """)
+    conn.execute("DELETE FROM conversation_days")
+    conn.execute("""
+        INSERT INTO conversation_days (day, started)
+        SELECT date(start_time), COUNT(*) FROM conversations GROUP BY date(start_time)
+    """)
+
+
+def migrate_db(conn):
+    """Bring a database created by an older version up to the current schema"""
+    conversation_columns = _columns(conn, "conversations")
+    if not conversation_columns:
+        return  # Not initialized yet; init_db creates the current schema
+    
+    if "archived_at" not in conversation_columns:
+        conn.execute("ALTER TABLE conversations ADD COLUMN archived_at TIMESTAMP")
+        conn.commit()
+    
+    if "archive_path" not in conversation_columns:
+        conn.execute("ALTER TABLE conversations ADD COLUMN archive_path TEXT")
+        conn.commit()
+    
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_stats'"
+    ).fetchone():
+        with conn:
+            _install_stats(conn)
+    
+    with conn:
+        _fix_fts_delete_triggers(conn)
 
 
 def init_db():
@@ -41,7 +272,9 @@ def init_db():
             end_time TIMESTAMP,
             summary TEXT,
             tags TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            archived_at TIMESTAMP,
+            archive_path TEXT
         )
     """)
     
@@ -107,11 +340,7 @@ def init_db():
         END
     """)
     
-    conn.execute("""
-        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
-            DELETE FROM messages_fts WHERE rowid = old.id;
-        END
-    """)
+    conn.execute(FTS_DELETE_TRIGGERS["messages_ad"])
     
     conn.execute("""
         CREATE TRIGGER IF NOT EXISTS insights_ai AFTER INSERT ON insights BEGIN
@@ -119,11 +348,7 @@ def init_db():
         END
     """)
     
-    conn.execute("""
-        CREATE TRIGGER IF NOT EXISTS insights_ad AFTER DELETE ON insights BEGIN
-            DELETE FROM insights_fts WHERE rowid = old.id;
-        END
-    """)
+    conn.execute(FTS_DELETE_TRIGGERS["insights_ad"])
     
     # Create indexes
     conn.execute("""
@@ -146,5 +371,10 @@ def init_db():
         ON insights(type, created_at DESC)
     """)
     
+    # Dashboard counters (see STATS_SCHEMA)
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memory_stats'"
+    ).fetchone():
+        _install_stats(conn)
+    
     conn.commit()
-    conn.close()
@@ -0,0 +1,95 @@
+"""Local text embeddings for vector recall (CPU-only, no model download)"""
+
+import math
+import re
+import zlib
+
+# Below ~512 buckets hash collisions alone give unrelated texts similarities
+# as high as a real paraphrase's
+DIM = 512
+
+# Only the start of very long messages is embedded
+MAX_CHARS = 4000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be by can could do does for from has have how i in is it
+    its me my of on or our please that the their there this to us was we what
+    when where which who why will with you your
+""".split())
+
+# Feature weights: whole words, adjacent word pairs, character trigrams.
+# Trigrams let "deploy"/"deployment" or "label"/"labeling" land close together.
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.3
+
+
+def _features(text):
+    words = [w for w in TOKEN_PATTERN.findall(text[:MAX_CHARS].lower()) if w not in STOPWORDS]
+    for word in words:
+        yield word, WORD_WEIGHT
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            yield "#" + padded[i:i + 3], TRIGRAM_WEIGHT
+    for first, second in zip(words, words[1:]):
+        yield f"{first} {second}", BIGRAM_WEIGHT
+
+
+def hashed_embedding(text):
+    """
+    L2-normalised feature-hashing vector of length DIM.
+    
+    Each feature is hashed to a bucket and a sign (crc32, stable across runs
+    and platforms), so similar wording gives similar vectors without a model.
+    """
+    vector = [0.0] * DIM
+    for feature, weight in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % DIM] += weight if h & 0x80000000 else -weight
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm:
+        vector = [v / norm for v in vector]
+    return vector
+
+
+# (name, dim, function) of the active embedder; the name is stored in the
+# vector file so switching embedders triggers a re-index instead of mixing spaces
+_embedder = ("hash-v2", DIM, hashed_embedding)
+
+
+def set_embedder(name, dim, function):
+    """
+    Use a different local model, e.g. a sentence-transformers encoder.
+    
+    function(text) must return a sequence of dim floats; it is L2-normalised here.
+    """
+    global _embedder
+    if len(name.encode("utf-8")) > 32:
+        raise ValueError("Embedder name must fit in 32 bytes")
+    _embedder = (name, dim, function)
+
+
+def current_embedder():
+    """(name, dim) of the active embedder"""
+    return _embedder[0], _embedder[1]
+
+
+def embed(text):
+    """Embed text with the active embedder (unit length)"""
+    _, dim, function = _embedder
+    vector = [float(v) for v in function(text)]
+    if len(vector) != dim:
+        raise ValueError(f"Embedder returned {len(vector)} values, expected {dim}")
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+def quantize(vector):
+    """int8 codes plus the scale that maps them back (value ~= code * scale)"""
+    peak = max((abs(v) for v in vector), default=0.0)
+    if not peak:
+        return bytes(len(vector)), 0.0
+    scale = peak / 127
+    codes = bytes(round(v / scale) & 0xFF for v in vector)
+    return codes, scale
@@ -1,6 +1,7 @@
 """Preferences and insights management"""
 
 from db import get_db
+from vectors import request_sync
 
 
 def list_preferences(category=None):
@@ -81,6 +82,7 @@ def add_insight(insight_type, content, tags=None):
         VALUES (?, ?, ?)
     """, (insight_type, content, tags_str))
     db.commit()
+    request_sync()
 
 
 def get_recent_insights(limit=10):
@@ -0,0 +1,308 @@
+"""Retention: archive old conversations into per-month databases and keep memory.db small"""
+
+import sqlite3
+import zlib
+from pathlib import Path
+
+from db import get_db, get_db_context
+from vectors import get_store
+
+ARCHIVE_DIR = Path(__file__).parent.parent / "archive"
+
+# FTS5 incremental merge work per step, and free pages returned per step
+FTS_MERGE_PAGES = 500
+VACUUM_PAGES = 1000
+
+SUMMARY_PREVIEW_CHARS = 120
+
+ARCHIVE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        start_time TIMESTAMP,
+        end_time TIMESTAMP,
+        summary TEXT,
+        tags TEXT,
+        created_at TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        conversation_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        timestamp TIMESTAMP,
+        content_z BLOB NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, timestamp)",
+    # Contentless: the text lives only once, compressed, in messages.content_z
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='')",
+)
+
+
+def archive_path(month, archive_dir=None):
+    """Archive database for a YYYY-MM month"""
+    return Path(archive_dir or ARCHIVE_DIR) / f"memory_{month}.db"
+
+
+def _open_archive(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    for statement in ARCHIVE_SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+def _open_archive_readonly(path):
+    conn = sqlite3.connect(f"file:{Path(path).as_posix()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _auto_summary(hot, conversation_id):
+    """Extractive summary for conversations that ended without one"""
+    row = hot.execute("""
+        SELECT COUNT(*) AS message_count,
+               (SELECT content FROM messages
+                WHERE conversation_id = ? AND role = 'user'
+                ORDER BY timestamp, id LIMIT 1) AS first_request
+        FROM messages
+        WHERE conversation_id = ?
+    """, (conversation_id, conversation_id)).fetchone()
+    summary = f"{row['message_count']} messages"
+    if row["first_request"]:
+        preview = " ".join(row["first_request"].split())[:SUMMARY_PREVIEW_CHARS]
+        summary += f"; first request: {preview}"
+    return summary
+
+
+def find_compactable(older_than_days):
+    """Ended, not yet archived conversations that ended more than older_than_days ago"""
+    hot = get_db()
+    cursor = hot.execute("""
+        SELECT id, title, start_time, end_time, summary, tags, created_at,
+               strftime('%Y-%m', start_time) AS month
+        FROM conversations
+        WHERE end_time IS NOT NULL
+          AND archived_at IS NULL
+          AND end_time < datetime('now', ?)
+        ORDER BY start_time
+    """, (f"-{int(older_than_days)} days",))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def archive_conversation(conversation, archive_dir=None):
+    """
+    Move one conversation's messages into its month's archive.
+    
+    The archive is committed first; the hot rows are then deleted and the
+    conversation is marked archived (keeping its title, tags and summary)
+    with the archive file it went to, so it can be read back from any archive_dir.
+    Only messages found in the archive are deleted, so re-running after a
+    crash between the two steps finishes the delete, and messages added
+    since an earlier run are moved rather than lost.
+    Returns the number of messages moved.
+    """
+    hot = get_db()
+    conversation_id = conversation["id"]
+    path = archive_path(conversation["month"], archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    summary = conversation["summary"] or _auto_summary(hot, conversation_id)
+    
+    archive = _open_archive(path)
+    try:
+        moved = 0
+        with archive:
+            archive.execute("""
+                INSERT OR IGNORE INTO conversations (id, title, start_time, end_time, summary, tags, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (conversation_id, conversation["title"], conversation["start_time"],
+                  conversation["end_time"], summary, conversation["tags"], conversation["created_at"]))
+            archived_ids = {row[0] for row in archive.execute(
+                "SELECT id FROM messages WHERE conversation_id = ?", (conversation_id,)
+            )}
+            
+            cursor = hot.execute("""
+                SELECT id, role, content, timestamp
+                FROM messages
+                WHERE conversation_id = ?
+                ORDER BY id
+            """, (conversation_id,))
+            for message in cursor:
+                if message["id"] in archived_ids:
+                    continue  # Moved by an earlier run that stopped before the delete
+                archive.execute("""
+                    INSERT INTO messages (id, conversation_id, role, timestamp, content_z)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (message["id"], conversation_id, message["role"], message["timestamp"],
+                      zlib.compress(message["content"].encode("utf-8"))))
+                archive.execute(
+                    "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+                    (message["id"], message["content"])
+                )
+                archived_ids.add(message["id"])
+                moved += 1
+    finally:
+        archive.close()
+    
+    with get_db_context() as conn:
+        conn.executemany(
+            "DELETE FROM messages WHERE id = ? AND conversation_id = ?",
+            ((message_id, conversation_id) for message_id in archived_ids)
+        )
+        conn.execute("""
+            UPDATE conversations
+            SET archived_at = CURRENT_TIMESTAMP, summary = ?, archive_path = ?
+            WHERE id = ?
+        """, (summary, str(path.resolve()), conversation_id))
+    
+    return moved
+
+
+def optimize_hot_db(max_steps=20):
+    """
+    Incrementally merge FTS segments and hand freed pages back to the OS.
+    
+    The first run switches memory.db to incremental auto-vacuum (a one-time
+    full VACUUM); afterwards each call does at most max_steps bounded steps
+    so it never holds the write lock for long.
+    """
+    hot = get_db()
+    
+    if hot.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        hot.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        hot.execute("VACUUM")
+    
+    for table in ("messages_fts", "insights_fts"):
+        for _ in range(max_steps):
+            before = hot.total_changes
+            hot.execute(f"INSERT INTO {table}({table}, rank) VALUES ('merge', ?)", (FTS_MERGE_PAGES,))
+            hot.commit()
+            if hot.total_changes - before <= 1:
+                break  # Nothing left to merge
+    
+    for _ in range(max_steps):
+        if not hot.execute("PRAGMA freelist_count").fetchone()[0]:
+            break
+        hot.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+    
+    hot.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def compact(older_than_days=90, archive_dir=None, dry_run=False):
+    """
+    Archive ended conversations older than older_than_days, then optimize memory.db.
+    
+    Returns {"conversations": n, "messages": n, "months": [...]}
+    """
+    candidates = find_compactable(older_than_days)
+    months = sorted({c["month"] for c in candidates})
+    stats = {"conversations": len(candidates), "messages": 0, "months": months}
+    
+    if dry_run:
+        return stats
+    
+    for conversation in candidates:
+        stats["messages"] += archive_conversation(conversation, archive_dir)
+    
+    optimize_hot_db()
+    if stats["messages"]:
+        get_store().prune()  # Archived messages drop out of vector recall too
+    return stats
+
+
+def list_archives(archive_dir=None):
+    """Archive database files, oldest month first"""
+    return sorted(Path(archive_dir or ARCHIVE_DIR).glob("memory_*.db"))
+
+
+def known_archives():
+    """Archive files of the default directory plus every file conversations were archived to"""
+    cursor = get_db().execute(
+        "SELECT DISTINCT archive_path FROM conversations WHERE archive_path IS NOT NULL"
+    )
+    recorded = {Path(row[0]) for row in cursor.fetchall()}
+    paths = {path.resolve() for path in list_archives()}
+    paths.update(path for path in recorded if path.exists())
+    return sorted(paths, key=lambda path: (path.name, str(path)))
+
+
+def load_archived_messages(conversation_id, month, archive_dir=None, path=None):
+    """
+    Messages of an archived conversation, in the same shape as get_conversation()
+    
+    path is the archive file recorded when the conversation was archived;
+    without it the file is looked up by month in archive_dir.
+    """
+    path = Path(path) if path else archive_path(month, archive_dir)
+    if not path.exists():
+        return []
+    
+    archive = _open_archive_readonly(path)
+    try:
+        cursor = archive.execute("""
+            SELECT role, content_z, timestamp
+            FROM messages
+            WHERE conversation_id = ?
+            ORDER BY timestamp, id
+        """, (conversation_id,))
+        return [
+            {
+                "role": row["role"],
+                "content": zlib.decompress(row["content_z"]).decode("utf-8"),
+                "timestamp": row["timestamp"],
+            }
+            for row in cursor.fetchall()
+        ]
+    finally:
+        archive.close()
+
+
+def search_archives(query, limit=10, archive_dir=None, snippet_chars=150):
+    """
+    Full-text search over every monthly archive, best bm25 matches first.
+    
+    Searches archive_dir, or by default every archive conversations were
+    moved to (see known_archives). Archives are opened read-only; only the
+    returned rows are decompressed.
+    """
+    hits = []
+    for path in (list_archives(archive_dir) if archive_dir else known_archives()):
+        archive = _open_archive_readonly(path)
+        try:
+            cursor = archive.execute("""
+                SELECT m.id, m.role, m.timestamp, m.content_z,
+                       c.title AS conversation_title, c.id AS conversation_id,
+                       bm25(messages_fts) AS score
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE messages_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            """, (query, limit))
+            hits.extend((row["score"], path.stem, dict(row)) for row in cursor.fetchall())
+        finally:
+            archive.close()
+    
+    hits.sort(key=lambda hit: (hit[0], hit[1], hit[2]["id"]))
+    
+    results = []
+    for score, source, row in hits[:limit]:
+        content = zlib.decompress(row["content_z"]).decode("utf-8")
+        results.append({
+            "type": "message (archived)",
+            "title": row["conversation_title"],
+            "snippet": content[:snippet_chars],
+            "timestamp": row["timestamp"],
+            "role": row["role"],
+            "conversation_id": row["conversation_id"],
+            "id": row["id"],
+            "score": score,
+            "archive": source,
+        })
+    return results
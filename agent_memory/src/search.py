@@ -1,60 +1,271 @@
 """Full-text search across all memory"""
 
+import sqlite3
+
 from db import get_db
+from vectors import vector_search
 
 
-def search_all(query, limit=10):
-    """Search across messages and insights"""
+# Marker text wrapped around matched terms in snippets/highlights
+HIGHLIGHT_OPEN = "**"
+HIGHLIGHT_CLOSE = "**"
+SNIPPET_TOKENS = 16
+
+# Insight tags are weighted below insight content in bm25
+INSIGHT_WEIGHTS = (1.0, 0.5)
+
+# Hybrid ranking: weight of cosine similarity vs normalised bm25, and how many
+# candidates each side contributes per requested result
+HYBRID_ALPHA = 0.5
+HYBRID_CANDIDATES = 4
+PREVIEW_CHARS = 150
+
+
+def _tag_clause(column, tags, params):
+    """SQL matching rows whose comma-separated tags column contains any of tags"""
+    clauses = []
+    for tag in tags:
+        clauses.append(f"(',' || COALESCE({column}, '') || ',') LIKE ?")
+        params.append(f"%,{tag.strip()},%")
+    return "(" + " OR ".join(clauses) + ")"
+
+
+def _encode_cursor(row):
+    return f"{row['score']!r}|{row['kind']}|{row['id']}"
+
+
+def _decode_cursor(cursor):
+    score, kind, row_id = cursor.split("|")
+    return float(score), kind, int(row_id)
+
+
+def search(query, limit=10, cursor=None, tags=None, since=None, until=None,
+           role=None, conversation_id=None, kinds=("message", "insight"), full_text=False):
+    """
+    Ranked search across messages and insights with keyset pagination.
+    
+    Both FTS tables are ranked together by bm25 (lower is better) so the page
+    is globally ordered. Filters are applied in SQL: tags (any of, matched
+    against conversation tags for messages and insight tags for insights),
+    since/until (timestamp bounds), role and conversation_id (messages only).
+    Pass the returned next_cursor back as cursor to fetch the following page.
+    
+    Only the page's rows are turned into text: snippet() excerpts by default,
+    or the full highlight() text with full_text=True.
+    
+    Returns {"results": [...], "next_cursor": str or None}
+    """
     db = get_db()
-    results = []
     
-    # Search messages
-    cursor = db.execute("""
-        SELECT 
-            m.id,
-            m.content,
-            m.timestamp,
-            c.title as conversation_title
-        FROM messages_fts mf
-        JOIN messages m ON m.id = mf.rowid
-        JOIN conversations c ON c.id = m.conversation_id
-        WHERE messages_fts MATCH ?
-        ORDER BY rank
-        LIMIT ?
-    """, (query, limit))
+    if role is not None or conversation_id is not None:
+        kinds = tuple(k for k in kinds if k == "message")
     
-    for row in cursor.fetchall():
-        results.append({
-            "type": "message",
-            "title": row["conversation_title"],
-            "snippet": row["content"],
-            "timestamp": row["timestamp"],
-        })
+    params = []
+    branches = []
     
-    # Search insights
-    cursor = db.execute("""
-        SELECT 
-            i.id,
-            i.type,
-            i.content,
-            i.tags,
-            i.created_at
-        FROM insights_fts if
-        JOIN insights i ON i.id = if.rowid
-        WHERE insights_fts MATCH ?
-        ORDER BY rank
+    if "message" in kinds:
+        where = ["messages_fts MATCH ?"]
+        params.append(query)
+        if role is not None:
+            where.append("m.role = ?")
+            params.append(role)
+        if conversation_id is not None:
+            where.append("m.conversation_id = ?")
+            params.append(conversation_id)
+        if since is not None:
+            where.append("m.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("m.timestamp < ?")
+            params.append(until)
+        if tags:
+            where.append(_tag_clause("c.tags", tags, params))
+        branches.append(f"""
+            SELECT 'message' AS kind, m.id AS id, bm25(messages_fts) AS score
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE {" AND ".join(where)}
+        """)
+    
+    if "insight" in kinds:
+        where = ["insights_fts MATCH ?"]
+        params.append(query)
+        if since is not None:
+            where.append("i.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("i.created_at < ?")
+            params.append(until)
+        if tags:
+            where.append(_tag_clause("i.tags", tags, params))
+        branches.append(f"""
+            SELECT 'insight' AS kind, i.id AS id, bm25(insights_fts, {INSIGHT_WEIGHTS[0]}, {INSIGHT_WEIGHTS[1]}) AS score
+            FROM insights_fts
+            JOIN insights i ON i.id = insights_fts.rowid
+            WHERE {" AND ".join(where)}
+        """)
+    
+    if not branches:
+        return {"results": [], "next_cursor": None}
+    
+    keyset = ""
+    if cursor:
+        keyset = "WHERE (score, kind, id) > (?, ?, ?)"
+        params.extend(_decode_cursor(cursor))
+    params.append(limit + 1)
+    
+    page = db.execute(f"""
+        SELECT kind, id, score
+        FROM ({" UNION ALL ".join(branches)})
+        {keyset}
+        ORDER BY score, kind, id
         LIMIT ?
-    """, (query, limit))
+    """, params).fetchall()
+    
+    next_cursor = _encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+    
+    details = {}
+    message_ids = [row["id"] for row in page if row["kind"] == "message"]
+    insight_ids = [row["id"] for row in page if row["kind"] == "insight"]
+    text_fn = (
+        "highlight({table}, {column}, ?, ?)" if full_text
+        else f"snippet({{table}}, {{column}}, ?, ?, '…', {SNIPPET_TOKENS})"
+    )
+    
+    if message_ids:
+        placeholders = ",".join("?" * len(message_ids))
+        for row in db.execute(f"""
+            SELECT m.id, m.role, m.timestamp, m.conversation_id,
+                   c.title AS conversation_title,
+                   {text_fn.format(table="messages_fts", column=0)} AS snippet
+            FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE messages_fts MATCH ? AND messages_fts.rowid IN ({placeholders})
+        """, [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, query, *message_ids]):
+            details[("message", row["id"])] = {
+                "type": "message",
+                "title": row["conversation_title"],
+                "snippet": row["snippet"],
+                "timestamp": row["timestamp"],
+                "role": row["role"],
+                "conversation_id": row["conversation_id"],
+            }
+    
+    if insight_ids:
+        placeholders = ",".join("?" * len(insight_ids))
+        for row in db.execute(f"""
+            SELECT i.id, i.type, i.tags, i.created_at,
+                   {text_fn.format(table="insights_fts", column=0)} AS snippet
+            FROM insights_fts
+            JOIN insights i ON i.id = insights_fts.rowid
+            WHERE insights_fts MATCH ? AND insights_fts.rowid IN ({placeholders})
+        """, [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, query, *insight_ids]):
+            details[("insight", row["id"])] = {
+                "type": f"insight ({row['type']})",
+                "title": f"{row['type'].title()} Insight",
+                "snippet": row["snippet"],
+                "timestamp": row["created_at"],
+                "tags": row["tags"],
+            }
+    
+    results = []
+    for row in page:
+        result = details[(row["kind"], row["id"])]
+        result["id"] = row["id"]
+        result["score"] = row["score"]
+        results.append(result)
+    
+    return {"results": results, "next_cursor": next_cursor}
+
+
+def search_all(query, limit=10):
+    """Search across messages and insights (best matches first across both)"""
+    return search(query, limit)["results"]
+
+
+def _vector_details(db, keys):
+    """Result dicts for (kind, id) pairs found only by vector search"""
+    details = {}
+    message_ids = [row_id for kind, row_id in keys if kind == "message"]
+    insight_ids = [row_id for kind, row_id in keys if kind == "insight"]
+    
+    if message_ids:
+        placeholders = ",".join("?" * len(message_ids))
+        for row in db.execute(f"""
+            SELECT m.id, m.role, m.timestamp, m.conversation_id, m.content,
+                   c.title AS conversation_title
+            FROM messages m
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE m.id IN ({placeholders})
+        """, message_ids):
+            details[("message", row["id"])] = {
+                "type": "message",
+                "title": row["conversation_title"],
+                "snippet": row["content"][:PREVIEW_CHARS],
+                "timestamp": row["timestamp"],
+                "role": row["role"],
+                "conversation_id": row["conversation_id"],
+            }
+    
+    if insight_ids:
+        placeholders = ",".join("?" * len(insight_ids))
+        for row in db.execute(f"""
+            SELECT id, type, tags, created_at, content
+            FROM insights
+            WHERE id IN ({placeholders})
+        """, insight_ids):
+            details[("insight", row["id"])] = {
+                "type": f"insight ({row['type']})",
+                "title": f"{row['type'].title()} Insight",
+                "snippet": row["content"][:PREVIEW_CHARS],
+                "timestamp": row["created_at"],
+                "tags": row["tags"],
+            }
+    
+    return details
+
+
+def hybrid_search(query, limit=10, alpha=HYBRID_ALPHA, kinds=("message", "insight")):
+    """
+    Rank by keyword and meaning together.
+    
+    bm25 candidates from search() are normalised to 0..1 (best match = 1) and
+    fused with the cosine similarity of the embedding store:
+    score = alpha * similarity + (1 - alpha) * bm25. Results found by only one
+    side get 0 from the other, so paraphrases with no shared terms still rank.
+    Each result also carries its "bm25" and "similarity" parts.
+    """
+    db = get_db()
+    candidates = limit * HYBRID_CANDIDATES
+    
+    try:
+        keyword_hits = search(query, candidates, kinds=kinds)["results"]
+    except sqlite3.OperationalError:
+        keyword_hits = []  # Not valid FTS5 syntax; rely on the vector side
+    
+    fused = {}
+    best_bm25 = max((-hit["score"] for hit in keyword_hits), default=0.0)
+    for hit in keyword_hits:
+        kind = "message" if hit["type"] == "message" else "insight"
+        strength = -hit["score"] / best_bm25 if best_bm25 > 0 else 0.0
+        hit.update(bm25=strength, similarity=0.0)
+        fused[(kind, hit["id"])] = hit
+    
+    similarities = {(kind, row_id): similarity for kind, row_id, similarity in vector_search(query, candidates, kinds)}
+    missing = [key for key in similarities if key not in fused]
+    for key, detail in _vector_details(db, missing).items():
+        detail.update(id=key[1], bm25=0.0)
+        fused[key] = detail
     
-    for row in cursor.fetchall():
-        results.append({
-            "type": f"insight ({row['type']})",
-            "title": f"{row['type'].title()} Insight",
-            "snippet": row["content"],
-            "timestamp": row["created_at"],
-        })
+    for key, result in fused.items():
+        result["similarity"] = max(0.0, similarities.get(key, 0.0))
+        result["score"] = alpha * result["similarity"] + (1 - alpha) * result["bm25"]
     
-    return results[:limit]
+    ranked = sorted(fused.values(), key=lambda r: (-r["score"], r["type"], r["id"]))
+    return ranked[:limit]
 
 
 def search_messages(conversation_id, query):
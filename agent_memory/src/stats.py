@@ -0,0 +1,92 @@
+"""Dashboard aggregates served from the trigger-maintained counters in memory_stats"""
+
+from datetime import datetime, timedelta, timezone
+
+from db import get_db
+
+CONTEXT_CATEGORIES = ("work", "tech", "workflow")
+
+
+def counters():
+    """Totals for conversations, messages, preferences and insights (single-row read)"""
+    db = get_db()
+    row = db.execute("""
+        SELECT conversations, active_conversations, messages, preferences, insights
+        FROM memory_stats
+        WHERE id = 1
+    """).fetchone()
+    if row is None:
+        return {"conversations": 0, "active_conversations": 0, "messages": 0,
+                "preferences": 0, "insights": 0}
+    return dict(row)
+
+
+def conversations_since(days=7):
+    """
+    Conversations started in the last N days.
+    
+    Whole days come from the conversation_days rollup; only the boundary day
+    is counted row by row (through the start_time index).
+    """
+    db = get_db()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    cutoff_day = cutoff.strftime("%Y-%m-%d")
+    cutoff_time = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    return db.execute("""
+        SELECT
+            (SELECT COALESCE(SUM(started), 0) FROM conversation_days WHERE day > ?)
+          + (SELECT COUNT(*) FROM conversations
+             WHERE start_time >= ? AND start_time < date(?, '+1 day'))
+    """, (cutoff_day, cutoff_time, cutoff_day)).fetchone()[0]
+
+
+def top_preferences(categories=CONTEXT_CATEGORIES, per_category=3):
+    """First N preferences (by key) of each category, as {category: [pref, ...]}"""
+    db = get_db()
+    placeholders = ",".join("?" * len(categories))
+    cursor = db.execute(f"""
+        SELECT category, key, value, confidence, updated_at
+        FROM (
+            SELECT category, key, value, confidence, updated_at,
+                   ROW_NUMBER() OVER (PARTITION BY category ORDER BY key) AS rank
+            FROM preferences
+            WHERE category IN ({placeholders})
+        )
+        WHERE rank <= ?
+        ORDER BY category, key
+    """, (*categories, per_category))
+    
+    grouped = {}
+    for row in cursor.fetchall():
+        grouped.setdefault(row["category"], []).append(dict(row))
+    return grouped
+
+
+def recent_insights(limit=5):
+    """Newest insights first"""
+    db = get_db()
+    cursor = db.execute("""
+        SELECT type, content, created_at
+        FROM insights
+        ORDER BY created_at DESC
+        LIMIT ?
+    """, (limit,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def session_summary(days=7):
+    """Counters plus recent activity and messages per session"""
+    summary = counters()
+    summary["this_week"] = conversations_since(days)
+    # Archived conversations' messages have left memory.db, so only count the ones still here
+    total = get_db().execute("SELECT COUNT(*) FROM conversations WHERE archived_at IS NULL").fetchone()[0]
+    summary["avg_messages"] = round(summary["messages"] / total, 1) if total > 0 else 0
+    return summary
+
+
+def dashboard(per_category=3, insight_limit=5):
+    """Everything the status/stats/context views show, in one dict"""
+    summary = session_summary()
+    summary["top_preferences"] = top_preferences(per_category=per_category)
+    summary["recent_insights"] = recent_insights(insight_limit)
+    return summary
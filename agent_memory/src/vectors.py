@@ -0,0 +1,509 @@
+"""Embedding store next to memory.db: int8 vectors with exhaustive or IVF search"""
+
+import heapq
+import logging
+import math
+import mmap
+import operator
+import os
+import struct
+import threading
+from pathlib import Path
+
+import db
+from embeddings import current_embedder, embed, quantize
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+VECTOR_MAGIC = b"PHMV"
+IVF_MAGIC = b"PHMI"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH8s32s")      # magic, version, dim, generation, embedder name
+RECORD_PREFIX = struct.Struct("<Bqf")     # kind, row id, scale; followed by dim int8 codes
+IVF_HEADER = struct.Struct("<4sHH8sII")   # magic, version, dim, generation, lists, indexed records
+
+KINDS = ("message", "insight")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+SOURCE_SQL = {
+    "message": "SELECT id, content FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+    "insight": "SELECT id, content FROM insights WHERE id > ? ORDER BY id LIMIT ?",
+}
+PENDING_SQL = {
+    "message": "SELECT id, content FROM messages WHERE id > ? ORDER BY id DESC LIMIT ?",
+    "insight": "SELECT id, content FROM insights WHERE id > ? ORDER BY id DESC LIMIT ?",
+}
+BACKLOG_SQL = {
+    "message": "SELECT COUNT(*) FROM messages WHERE id > ?",
+    "insight": "SELECT COUNT(*) FROM insights WHERE id > ?",
+}
+
+# Writes hand embedding to a background thread (request_sync), which appends
+# SYNC_BATCH rows per kind at a time. Until it catches up, a search also
+# scores the SEARCH_CATCH_UP newest rows not stored yet, so new rows are
+# found straight away.
+SYNC_BATCH = 500
+SEARCH_CATCH_UP = 500
+
+# Below IVF_MIN_RECORDS every vector is scored; above it (numpy only) an IVF
+# index narrows the scan to the IVF_NPROBE closest lists. The index is rebuilt
+# once the records appended after it exceed IVF_REBUILD_RATIO of those it covers.
+IVF_MIN_RECORDS = 50000
+IVF_NPROBE = 32
+IVF_REBUILD_RATIO = 0.5
+IVF_TRAIN_PER_LIST = 40
+IVF_ITERATIONS = 10
+
+SCORE_CHUNK = 65536
+
+logger = logging.getLogger(__name__)
+
+
+def vector_path():
+    """Vector file kept next to the database it indexes"""
+    path = Path(db.DB_PATH)
+    return path.with_name(path.stem + ".vec")
+
+
+class VectorStore:
+    """
+    Append-only file of quantised embeddings for messages and insights.
+    
+    Each record is (kind, row id, scale, dim int8 codes) at a fixed size, so
+    the file is read by memory-mapping it. sync() embeds rows added to
+    memory.db since the highest id already stored (ids are AUTOINCREMENT),
+    oldest first.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.ivf_path = self.path.with_suffix(".ivf")
+        self.name, self.dim = current_embedder()
+        self.record_size = RECORD_PREFIX.size + self.dim
+        self.high_water = {kind: 0 for kind in KINDS}
+        self._scanned = 0
+        self._ivf = None
+        self._ivf_stamp = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        
+        header = self._read_header()
+        if header is None:
+            self._reset()
+        else:
+            self.generation = header
+            self._scan_new()
+    
+    def _read_header(self):
+        """Generation of a compatible existing file, else None"""
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(raw) < HEADER.size:
+            return None
+        magic, version, dim, generation, name = HEADER.unpack(raw)
+        if (magic, version, dim) != (VECTOR_MAGIC, FORMAT_VERSION, self.dim):
+            return None
+        if name.rstrip(b"\0").decode("utf-8") != self.name:
+            return None  # Built by another embedder: start over
+        return generation
+    
+    def _header_bytes(self):
+        return HEADER.pack(VECTOR_MAGIC, FORMAT_VERSION, self.dim, self.generation,
+                           self.name.encode("utf-8"))
+    
+    def _reset(self):
+        self.generation = os.urandom(8)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(self._header_bytes())
+        self.ivf_path.unlink(missing_ok=True)
+        self.high_water = {kind: 0 for kind in KINDS}
+        self._scanned = 0
+        self._ivf = None
+    
+    @property
+    def count(self):
+        """Number of complete records in the file"""
+        return max(0, os.path.getsize(self.path) - HEADER.size) // self.record_size
+    
+    def _scan_new(self):
+        """Advance the high-water marks past records appended since the last scan"""
+        count = self.count
+        if count <= self._scanned:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(HEADER.size + self._scanned * self.record_size)
+            block = f.read((count - self._scanned) * self.record_size)
+        for offset in range(0, len(block), self.record_size):
+            kind_code, row_id, _ = RECORD_PREFIX.unpack_from(block, offset)
+            kind = KINDS[kind_code]
+            if row_id > self.high_water[kind]:
+                self.high_water[kind] = row_id
+        self._scanned = count
+    
+    def sync(self, limit=None):
+        """
+        Embed and append messages/insights newer than what is stored; returns the number added
+        
+        limit caps the rows embedded per kind (oldest first); None embeds them all.
+        Rows are embedded outside the store lock, so searches don't wait on it.
+        """
+        added = 0
+        with self._sync_lock:
+            for kind in KINDS:
+                with self._lock:
+                    self._scan_new()
+                    after = self.high_water[kind]
+                rows = db.get_db().execute(SOURCE_SQL[kind], (after, -1 if limit is None else limit)).fetchall()
+                if not rows:
+                    continue
+                buffer = bytearray()
+                for row in rows:
+                    codes, scale = quantize(embed(row["content"]))
+                    buffer += RECORD_PREFIX.pack(KIND_CODES[kind], row["id"], scale)
+                    buffer += codes
+                with self._lock:
+                    self._scan_new()
+                    if self.high_water[kind] != after:
+                        continue  # Another process stored these meanwhile
+                    self._append(buffer)
+                    self.high_water[kind] = rows[-1]["id"]
+                    self._scanned = self.count
+                added += len(rows)
+        return added
+    
+    def backlog(self):
+        """Number of messages/insights not embedded yet"""
+        with self._lock:
+            self._scan_new()
+            conn = db.get_db()
+            return sum(conn.execute(BACKLOG_SQL[kind], (self.high_water[kind],)).fetchone()[0] for kind in KINDS)
+    
+    def _append(self, buffer):
+        with open(self.path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            aligned = HEADER.size + max(0, size - HEADER.size) // self.record_size * self.record_size
+            if size != aligned:
+                f.truncate(aligned)  # Drop a partial record left by an interrupted write
+                f.seek(aligned)
+            f.write(buffer)
+    
+    def search(self, query, k=10, kinds=KINDS, nprobe=IVF_NPROBE):
+        """Top-k (kind, row id, cosine similarity) for query, best first, including rows not stored yet"""
+        vector = embed(query)
+        wanted = {KIND_CODES[kind] for kind in kinds}
+        with self._lock:
+            self._scan_new()
+            count = self.count
+            high_water = dict(self.high_water)
+            hits = []
+            if count and NUMPY_AVAILABLE:
+                hits = self._search_numpy(vector, count, k, wanted, nprobe)
+            elif count:
+                hits = self._search_python(vector, count, k, wanted)
+        hits = sorted(hits + self._search_pending(vector, k, wanted, high_water), reverse=True)
+        
+        # A record can be duplicated if two processes synced at once
+        seen = set()
+        results = []
+        for score, kind_code, row_id in hits:
+            key = (kind_code, row_id)
+            if key not in seen:
+                seen.add(key)
+                results.append((KINDS[kind_code], row_id, score))
+        return results[:k]
+    
+    def _search_python(self, vector, count, k, wanted):
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                scored = []
+                for i in range(count):
+                    offset = HEADER.size + i * self.record_size
+                    kind_code, row_id, scale = RECORD_PREFIX.unpack_from(mm, offset)
+                    if kind_code not in wanted:
+                        continue
+                    codes = view[offset + RECORD_PREFIX.size:offset + self.record_size].cast("b")
+                    scored.append((sum(map(operator.mul, vector, codes)) * scale, kind_code, row_id))
+                    codes.release()
+                return heapq.nlargest(k * 2, scored)
+            finally:
+                view.release()
+    
+    def _search_pending(self, vector, k, wanted, high_water):
+        """Score the newest rows the background sync hasn't stored yet (embedded here, not stored)"""
+        conn = db.get_db()
+        scored = []
+        failed = 0
+        for kind in KINDS:
+            if KIND_CODES[kind] not in wanted:
+                continue
+            for row in conn.execute(PENDING_SQL[kind], (high_water[kind], SEARCH_CATCH_UP)):
+                try:
+                    codes, scale = quantize(embed(row["content"]))
+                except Exception:
+                    failed += 1
+                    continue
+                scored.append((sum(map(operator.mul, vector, memoryview(codes).cast("b"))) * scale, KIND_CODES[kind], row["id"]))
+        if failed:
+            logger.warning("Could not embed %d new memory row(s); they are left out of this search", failed)
+        return heapq.nlargest(k * 2, scored)
+    
+    def _records(self, count):
+        dtype = np.dtype([("kind", "u1"), ("id", "<i8"), ("scale", "<f4"), ("codes", "i1", (self.dim,))])
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+    
+    def _search_numpy(self, vector, count, k, wanted, nprobe):
+        records = self._records(count)
+        query = np.asarray(vector, dtype=np.float32)
+        
+        ivf = self._current_ivf(records, count)
+        if ivf is None:
+            candidates = None
+            total = count
+        else:
+            centroids, offsets, members, indexed = ivf
+            lists = np.argsort(centroids @ query)[::-1][:nprobe]
+            candidates = np.concatenate(
+                [members[offsets[l]:offsets[l + 1]] for l in lists]
+                + [np.arange(indexed, count, dtype=np.uint32)]
+            )
+            candidates.sort()  # Sequential reads through the memory map
+            total = len(candidates)
+        
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_CHUNK):
+            stop = min(start + SCORE_CHUNK, total)
+            rows = records[start:stop] if candidates is None else records[candidates[start:stop]]
+            scores[start:stop] = (rows["codes"].astype(np.float32) @ query) * rows["scale"]
+        
+        positions = np.arange(count) if candidates is None else candidates
+        kinds = records["kind"][positions]
+        if len(wanted) < len(KINDS):
+            keep = np.isin(kinds, list(wanted))
+            scores, positions, kinds = scores[keep], positions[keep], kinds[keep]
+        
+        top = min(k * 2, len(scores))
+        if not top:
+            return []
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        ids = records["id"][positions[best]]
+        return [(float(scores[i]), int(kinds[i]), int(row_id)) for i, row_id in zip(best, ids)]
+    
+    def _ivf_stale(self, ivf, count):
+        return ivf is None or ivf[3] > count or count - ivf[3] > ivf[3] * IVF_REBUILD_RATIO
+    
+    def _current_ivf(self, records, count):
+        """
+        Loaded IVF index, or None below IVF_MIN_RECORDS or before one is built
+        
+        A missing or stale index is rebuilt by the background thread; until
+        then searches use the old one (records past it are scored exhaustively).
+        """
+        if count < IVF_MIN_RECORDS:
+            return None
+        ivf = self._load_ivf()
+        if ivf is not None and ivf[3] > count:
+            ivf = None
+        if self._ivf_stale(ivf, count):
+            request_sync(self, rebuild_ivf=True)
+        return ivf
+    
+    def rebuild_ivf_if_stale(self):
+        """Rebuild the IVF index if it is missing or stale; the store lock is only held to take a snapshot"""
+        if not NUMPY_AVAILABLE:
+            return
+        with self._lock:
+            self._scan_new()
+            count = self.count
+            if count < IVF_MIN_RECORDS or not self._ivf_stale(self._load_ivf(), count):
+                return
+            records = self._records(count)
+            generation = self.generation
+        self._build_ivf(records, count, generation=generation)
+    
+    def _load_ivf(self):
+        try:
+            stamp = os.stat(self.ivf_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if stamp != self._ivf_stamp:
+            with open(self.ivf_path, "rb") as f:
+                magic, version, dim, generation, lists, indexed = IVF_HEADER.unpack(f.read(IVF_HEADER.size))
+                if (magic, version, dim, generation) != (IVF_MAGIC, FORMAT_VERSION, self.dim, self.generation):
+                    return None
+                centroids = np.fromfile(f, dtype=np.float32, count=lists * self.dim).reshape(lists, self.dim)
+                offsets = np.fromfile(f, dtype=np.uint32, count=lists + 1)
+                members = np.fromfile(f, dtype=np.uint32, count=indexed)
+            self._ivf = (centroids, offsets, members, indexed)
+            self._ivf_stamp = stamp
+        return self._ivf
+    
+    def _build_ivf(self, records, count, lists=None, generation=None):
+        """Spherical k-means over a sample, then assign every record to its nearest centroid"""
+        lists = lists or max(1, int(math.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample_size = min(count, lists * IVF_TRAIN_PER_LIST)
+        sample_rows = records[np.sort(rng.choice(count, sample_size, replace=False))]
+        sample = sample_rows["codes"].astype(np.float32) * sample_rows["scale"][:, None]
+        centroids = sample[rng.choice(sample_size, lists, replace=False)].copy()
+        
+        for _ in range(IVF_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0  # Empty lists keep their previous centroid
+            centroids[filled] = sums[filled] / norms[filled, None]
+        
+        assignment = np.empty(count, dtype=np.uint32)
+        for start in range(0, count, SCORE_CHUNK):
+            stop = min(start + SCORE_CHUNK, count)
+            codes = records["codes"][start:stop].astype(np.float32)
+            assignment[start:stop] = np.argmax(codes @ centroids.T, axis=1)
+        
+        members = np.argsort(assignment, kind="stable").astype(np.uint32)
+        offsets = np.zeros(lists + 1, dtype=np.uint32)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=lists))
+        
+        temp_path = self.ivf_path.with_suffix(f".ivf.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(IVF_HEADER.pack(IVF_MAGIC, FORMAT_VERSION, self.dim, generation or self.generation, lists, count))
+            f.write(centroids.astype(np.float32).tobytes())
+            f.write(offsets.tobytes())
+            f.write(members.tobytes())
+        os.replace(temp_path, self.ivf_path)
+    
+    def build_ivf(self, lists=None):
+        """Rebuild the IVF index now (needs numpy); returns the number of lists"""
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("Building an IVF index requires numpy")
+        with self._lock:
+            self._scan_new()
+            count = self.count
+            if not count:
+                return 0
+            lists = min(lists or max(1, int(math.sqrt(count))), count)
+            self._build_ivf(self._records(count), count, lists)
+            return lists
+    
+    def prune(self):
+        """Drop vectors whose rows are gone from memory.db (e.g. archived); returns the number removed"""
+        conn = db.get_db()
+        live = {
+            KIND_CODES["message"]: {row[0] for row in conn.execute("SELECT id FROM messages")},
+            KIND_CODES["insight"]: {row[0] for row in conn.execute("SELECT id FROM insights")},
+        }
+        with self._lock:
+            count = self.count
+            with open(self.path, "rb") as f:
+                f.seek(HEADER.size)
+                block = f.read(count * self.record_size)
+            
+            kept = bytearray()
+            seen = set()
+            for offset in range(0, len(block), self.record_size):
+                kind_code, row_id, _ = RECORD_PREFIX.unpack_from(block, offset)
+                if row_id in live[kind_code] and (kind_code, row_id) not in seen:
+                    seen.add((kind_code, row_id))
+                    kept += block[offset:offset + self.record_size]
+            
+            # New generation: record positions change, so any IVF index is void
+            self.generation = os.urandom(8)
+            temp_path = self.path.with_suffix(".vec.tmp")
+            with open(temp_path, "wb") as f:
+                f.write(self._header_bytes())
+                f.write(kept)
+            os.replace(temp_path, self.path)
+            self.ivf_path.unlink(missing_ok=True)
+            self._ivf = None
+            self._ivf_stamp = None
+            self._scanned = 0
+            self._scan_new()
+            return count - len(seen)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    """Shared store for the current DB_PATH and embedder"""
+    key = (str(vector_path()), current_embedder())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VectorStore(vector_path())
+    return store
+
+
+def sync_vectors(limit=None):
+    """Embed messages and insights added since the last sync (at most limit per kind)"""
+    return get_store().sync(limit)
+
+
+class BackgroundSync:
+    """
+    Daemon thread that embeds new rows and rebuilds IVF indexes off the write and query paths.
+    
+    Errors are logged and the work is retried on the next request.
+    """
+    
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def request(self, store, rebuild_ivf=False):
+        with self._lock:
+            self._pending[store] = self._pending.get(store, False) or rebuild_ivf
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="agent-memory-vectors", daemon=True)
+                self._thread.start()
+        self._wake.set()
+    
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for store, rebuild_ivf in pending.items():
+                try:
+                    while store.sync(SYNC_BATCH):
+                        pass
+                    store.rebuild_ivf_if_stale()
+                except Exception:
+                    logger.warning("Background vector sync failed for %s", store.path, exc_info=True)
+
+
+_background = BackgroundSync()
+
+
+def request_sync(store=None, rebuild_ivf=False):
+    """Have the background thread embed rows added since the last sync (returns immediately, never raises)"""
+    try:
+        _background.request(store or get_store(), rebuild_ivf)
+    except Exception:
+        logger.warning("Could not start the background vector sync", exc_info=True)
+
+
+def vector_search(query, k=10, kinds=KINDS):
+    """
+    Nearest messages/insights by cosine similarity: [(kind, id, similarity), ...]
+    
+    Rows the background sync hasn't stored yet are scored too (the newest
+    SEARCH_CATCH_UP per kind), and the sync is nudged to catch up.
+    """
+    store = get_store()
+    request_sync(store)
+    return store.search(query, k, kinds)
@@ -0,0 +1,137 @@
+"""Background message writer that coalesces inserts into batched transactions"""
+
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from db import get_db_context
+from conversations import VALID_ROLES
+from vectors import request_sync
+
+# Same text format SQLite's CURRENT_TIMESTAMP produces (UTC)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+INSERT_TIMESTAMPED_SQL = """
+    INSERT INTO messages (conversation_id, role, content, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+class MessageWriter:
+    """
+    Queue messages from any thread and write them from one background thread.
+    
+    Queued messages are committed together once max_batch rows are waiting or
+    flush_interval_ms has passed since the first one arrived, whichever comes
+    first. Each message keeps the timestamp of when it was queued.
+    """
+    
+    def __init__(self, flush_interval_ms=50, max_batch=500):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="agent-memory-writer", daemon=True)
+        self._thread.start()
+    
+    def submit(self, conversation_id, role, content):
+        """Queue one message for writing"""
+        if self._closed:
+            raise RuntimeError("MessageWriter is closed")
+        if role not in VALID_ROLES:
+            raise ValueError(f"Invalid role {role!r} (expected one of {VALID_ROLES})")
+        timestamp = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self._queue.put((conversation_id, role, content, timestamp))
+    
+    def flush(self):
+        """Block until everything queued so far is committed; re-raise any write error"""
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+    
+    def close(self):
+        """Flush outstanding messages and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            batch = []
+            if first is None:
+                stopping = True
+            else:
+                batch.append(first)
+            
+            # Coalesce whatever else arrives within the flush window
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            
+            try:
+                if batch:
+                    with get_db_context() as db:
+                        db.executemany(INSERT_TIMESTAMPED_SQL, batch)
+                    request_sync()
+            except Exception as e:
+                self._error = e
+            finally:
+                # One task_done per item taken off the queue (including the stop marker)
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self._queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Shared process-wide writer, started on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter()
+    return _writer
+
+
+def queue_message(conversation_id, role, content):
+    """Log a message through the shared background writer (returns immediately)"""
+    get_writer().submit(conversation_id, role, content)
+
+
+def flush_messages():
+    """Wait until every queued message has been committed"""
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.flush()
+
+
+@atexit.register
+def _close_writer():
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
@@ -3,25 +3,439 @@ PHEPy Intelligent Agent Router
 Fast, direct routing based on intent patterns instead of regex keyword matching
 """
 
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional, Set
 import re
 
+# Volatile tokens masked out of route cache keys so "icm 21000000887894" and
+# "icm 21000000901234" share one entry
+ICM_ID_PATTERN = re.compile(r"\b\d{6,}\b")
+DATE_PATTERN = re.compile(
+    r"\b(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{2,4})\b"
+)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace (the form every routing decision is made on)"""
+    return " ".join(query.lower().split())
+
+
+def mask_volatile(query: str) -> str:
+    """Replace dates and ICM/case IDs with placeholders"""
+    return ICM_ID_PATTERN.sub("<id>", DATE_PATTERN.sub("<date>", query))
+
+
+class PatternAutomaton:
+    """Aho-Corasick automaton that finds every known pattern in a single pass over a query"""
+    
+    def __init__(self, patterns: List[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._build()
+    
+    def _build(self):
+        """Build the trie, then link failure transitions breadth-first"""
+        outputs: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(pattern_id)
+        
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                # Inherit matches that end at the failure state (suffix patterns)
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+        
+        self._out = [tuple(ids) for ids in outputs]
+    
+    def find_all(self, text: str) -> Set[int]:
+        """Return the ids of every pattern occurring as a substring of text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(out[0])  # Empty patterns match everything
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class RoutingIndex:
+    """
+    Parsed routing map plus every lookup structure AgentRouter builds from it.
+    
+    Workflow triggers, direct-map keys and domain patterns are lowercased (queries
+    are lowercased before matching) and compiled into one automaton. Pattern ids map
+    back to the earliest workflow / direct script that uses them and to the domains
+    that list them, so routing keeps the priority order and tie-breaking of a linear
+    scan over the map.
+    """
+    
+    def __init__(self, config: Dict, digest: str = "", version: int = 1):
+        self.config = config
+        self.digest = digest
+        self.version = version
+        self.patterns = config.get("routing_patterns", {})
+        self.workflows = config.get("workflow_shortcuts", {})
+        self.direct_map = config.get("common_asks_direct_map", {})
+        self._build()
+    
+    def _build(self):
+        """Compile the automaton, rank tables and reverse agent index"""
+        pattern_ids: Dict[str, int] = {}
+        
+        def pattern_id(pattern: str) -> int:
+            return pattern_ids.setdefault(pattern.lower(), len(pattern_ids))
+        
+        # Workflow triggers -> index of the first workflow that declares them
+        self.workflow_list = list(self.workflows.items())
+        self.workflow_hits: Dict[int, int] = {}
+        for rank, (_, workflow_config) in enumerate(self.workflow_list):
+            for trigger in workflow_config.get("triggers", []):
+                self.workflow_hits.setdefault(pattern_id(trigger), rank)
+        
+        # Direct-map keys -> index of the first routable script (path must name an agent)
+        self.direct_list: List[Tuple[str, str]] = []
+        self.direct_hits: Dict[int, int] = {}
+        for category, scripts in self.direct_map.items():
+            for script_key, script_path in scripts.items():
+                if "/" not in script_path:
+                    continue
+                rank = len(self.direct_list)
+                self.direct_list.append((category, script_path))
+                self.direct_hits.setdefault(pattern_id(script_key.replace("_", " ")), rank)
+        
+        # Domain patterns -> (domain index, occurrences) so duplicates still count twice
+        self.domain_list = list(self.patterns.items())
+        self.domain_hits: Dict[int, List[Tuple[int, int]]] = {}
+        self.pattern_sets: Dict[str, frozenset] = {}
+        for domain_index, (domain, config) in enumerate(self.domain_list):
+            counts: Dict[int, int] = {}
+            for pattern in config.get("patterns", []):
+                pid = pattern_id(pattern)
+                counts[pid] = counts.get(pid, 0) + 1
+            for pid, count in counts.items():
+                self.domain_hits.setdefault(pid, []).append((domain_index, count))
+            self.pattern_sets[domain] = frozenset(p.lower() for p in config.get("patterns", []))
+        
+        self.matcher = PatternAutomaton(list(pattern_ids))
+        
+        # Masking is only safe for cache keys if no pattern mentions an ID or a date
+        self.mask_safe = all(mask_volatile(pattern) == pattern for pattern in pattern_ids)
+        
+        # Reverse index: agent keyword (first segment of a direct script path) -> domain
+        self.agent_index: Dict[str, Optional[str]] = {}
+        for _, script_path in self.direct_list:
+            agent = script_path.split("/")[0]
+            if agent not in self.agent_index:
+                self.agent_index[agent] = self._scan_agent_domain(agent)
+    
+    def _scan_agent_domain(self, agent_keyword: str) -> Optional[str]:
+        """First domain whose sub_agent_path contains the keyword"""
+        for domain, config in self.patterns.items():
+            if agent_keyword in config.get("sub_agent_path", ""):
+                return domain
+        return None
+    
+    def get_agent_config(self, agent_keyword: str) -> Optional[Dict]:
+        """Get agent configuration by matching keyword to domain"""
+        if agent_keyword in self.agent_index:
+            domain = self.agent_index[agent_keyword]
+        else:
+            domain = self._scan_agent_domain(agent_keyword)
+        return self.patterns[domain] if domain is not None else None
+    
+    def workflow_result(self, rank: int) -> Dict:
+        """Build the routing result for the workflow at the given rank"""
+        workflow_name, workflow_config = self.workflow_list[rank]
+        return {
+            "routing_type": "workflow",
+            "workflow": workflow_name,
+            "description": workflow_config.get("description"),
+            "steps": workflow_config.get("steps"),
+            "confidence": 0.95
+        }
+    
+    def direct_result(self, rank: int) -> Dict:
+        """Build the routing result for the direct script at the given rank"""
+        # Determine agent from script path
+        category, script_path = self.direct_list[rank]
+        agent = script_path.split("/")[0]
+        agent_config = self.get_agent_config(agent)
+        return {
+            "routing_type": "direct",
+            "category": category,
+            "script": script_path,
+            "agent": agent,
+            "mcp_tools": agent_config.get("mcp_tools", []) if agent_config else [],
+            "confidence": 0.90
+        }
+    
+    def agent_result(self, scores: List[int]) -> Optional[Dict]:
+        """Build the routing result for the best-scoring domain (first one wins ties)"""
+        best_index = None
+        best_score = 0
+        for domain_index, matches in enumerate(scores):
+            if matches > best_score:
+                best_score = matches
+                best_index = domain_index
+        
+        if best_index is None:
+            return None
+        
+        domain = self.domain_list[best_index][0]
+        return self.domain_result(domain, min(0.85, 0.50 + (best_score * 0.15)))  # Scale confidence
+    
+    def domain_result(self, domain: str, confidence: float) -> Dict:
+        """Build an agent routing result for a domain"""
+        config = self.patterns[domain]
+        return {
+            "routing_type": "agent",
+            "domain": domain,
+            "agent": config.get("agent"),
+            "path": config.get("sub_agent_path"),
+            "mcp_tools": config.get("mcp_tools", []),
+            "quick_actions": config.get("quick_actions", {}),
+            "confidence": confidence
+        }
+
+
+class RoutingMapLoader:
+    """
+    Process-wide cache of RoutingIndex objects, one loader per routing map file.
+    
+    refresh() is a cheap stat() when the file is unchanged; when mtime or size
+    moves, the content hash decides whether the map is actually re-parsed.
+    start_watching() does the same from a daemon thread so long-lived workers
+    pick up edits without restarting.
+    """
+    
+    _loaders: Dict[Path, "RoutingMapLoader"] = {}
+    _loaders_lock = threading.Lock()
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._index: Optional[RoutingIndex] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.refresh()
+    
+    @classmethod
+    def for_path(cls, path) -> "RoutingMapLoader":
+        """Return the shared loader for a routing map file, creating it on first use"""
+        key = Path(path).resolve()
+        with cls._loaders_lock:
+            loader = cls._loaders.get(key)
+            if loader is None:
+                loader = cls._loaders[key] = cls(key)
+        return loader
+    
+    @property
+    def index(self) -> RoutingIndex:
+        """The most recently loaded routing index"""
+        return self._index
+    
+    def refresh(self) -> bool:
+        """Reload the map if the file changed on disk. Returns True when a new index was installed."""
+        stat = self.path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+        
+        with self._lock:
+            if signature == self._signature:
+                return False
+            
+            raw = self.path.read_bytes()
+            digest = hashlib.sha256(raw).hexdigest()
+            if self._index is not None and digest == self._index.digest:
+                # Touched but not edited
+                self._signature = signature
+                return False
+            
+            try:
+                config = json.loads(raw)
+            finally:
+                # Remember this revision even if it's invalid so it is only reported once
+                self._signature = signature
+            version = self._index.version + 1 if self._index is not None else 1
+            self._index = RoutingIndex(config, digest, version)
+            return True
+    
+    def start_watching(self, interval: float = 2.0):
+        """Poll the routing map in a background thread and swap in changes"""
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(
+                target=self._watch,
+                args=(interval,),
+                name=f"routing-map-watcher:{self.path.name}",
+                daemon=True
+            )
+            self._watcher.start()
+    
+    def stop_watching(self):
+        """Stop the background watcher, if one is running"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+    
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good map (file mid-save, invalid JSON, a map
+                # RoutingIndex can't use); an uncaught error would end the watcher for good
+                print(f"⚠️  Routing map reload failed for {self.path}: {type(e).__name__}: {e}")
+
+
+class RouteCache:
+    """Thread-safe LRU cache of routing decisions with a per-entry TTL"""
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str, version: int) -> Optional[Dict]:
+        """Cached result for key, or None. A new routing map version empties the cache."""
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+    
+    def put(self, key: str, version: int, result: Dict):
+        """Store a result computed against the given routing map version"""
+        with self._lock:
+            if version != self._version:
+                return  # Map reloaded while this result was being computed
+            self._entries[key] = (time.monotonic() + self.ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
 class AgentRouter:
     """Efficient intent-based routing to PHEPy sub-agents"""
     
-    def __init__(self, routing_map_path: str = "agent_routing_map.json"):
+    def __init__(self, routing_map_path: str = "agent_routing_map.json",
+                 auto_reload: bool = False, reload_interval: float = 2.0,
+                 semantic_fallback: bool = False, semantic_index_path: Optional[str] = None,
+                 semantic_threshold: float = 0.25,
+                 cache_size: int = 1024, cache_ttl: float = 300.0):
         self.routing_map_path = Path(routing_map_path)
-        self.routing_config = self._load_routing_map()
-        self.patterns = self.routing_config.get("routing_patterns", {})
-        self.workflows = self.routing_config.get("workflow_shortcuts", {})
-        self.direct_map = self.routing_config.get("common_asks_direct_map", {})
+        self._loader = RoutingMapLoader.for_path(self.routing_map_path)
+        # Routers built per request share the cached index; this only stats the file
+        self._loader.refresh()
+        if auto_reload:
+            self._loader.start_watching(reload_interval)
         
-    def _load_routing_map(self) -> Dict:
-        """Load the routing configuration"""
-        with open(self.routing_map_path, 'r') as f:
-            return json.load(f)
+        # Optional TF-IDF nearest-neighbour tier tried before the orchestrator fallback
+        self.semantic_threshold = semantic_threshold
+        self._semantic_index = None
+        if semantic_fallback:
+            from semantic_router import load_or_build_index
+            self._semantic_index = load_or_build_index(
+                self._index,
+                self.routing_map_path.resolve().parent,
+                Path(semantic_index_path) if semantic_index_path else None
+            )
+        
+        # Routing decisions keyed by normalized query; cache_size=0 disables caching
+        self._cache = RouteCache(cache_size, cache_ttl) if cache_size > 0 else None
+    
+    @property
+    def _index(self) -> RoutingIndex:
+        return self._loader.index
+    
+    @property
+    def routing_config(self) -> Dict:
+        return self._index.config
+    
+    @property
+    def patterns(self) -> Dict:
+        return self._index.patterns
+    
+    @property
+    def workflows(self) -> Dict:
+        return self._index.workflows
+    
+    @property
+    def direct_map(self) -> Dict:
+        return self._index.direct_map
+    
+    def reload(self) -> bool:
+        """Pick up routing map edits now. Returns True if the map changed."""
+        return self._loader.refresh()
+    
+    def cache_stats(self) -> Dict:
+        """Route cache hit/miss counters (empty when caching is disabled)"""
+        return self._cache.stats() if self._cache is not None else {}
     
     def route(self, user_query: str) -> Dict:
         """
@@ -37,97 +451,157 @@ class AgentRouter:
                 "confidence": 0.0-1.0
             }
         """
-        query_lower = user_query.lower().strip()
+        query_lower = normalize_query(user_query)
+        
+        # Snapshot the index so a background reload can't change it mid-route
+        index = self._index
+        
+        if self._cache is None:
+            return self._route_uncached(query_lower, index)
+        
+        cache_key = mask_volatile(query_lower) if index.mask_safe else query_lower
+        cached = self._cache.get(cache_key, index.version)
+        if cached is not None:
+            return cached
+        
+        result = self._route_uncached(query_lower, index)
+        self._cache.put(cache_key, index.version, result)
+        return result
+    
+    def _route_uncached(self, query_lower: str, index: RoutingIndex) -> Dict:
+        """Run the workflow -> direct -> agent -> fallback priority chain"""
+        # Single pass over the query finds every trigger, direct key and pattern
+        matched = index.matcher.find_all(query_lower)
         
         # Priority 1: Check workflow shortcuts (multi-step operations)
-        workflow_match = self._match_workflow(query_lower)
+        workflow_match = self._match_workflow(query_lower, matched, index)
         if workflow_match:
             return workflow_match
         
         # Priority 2: Check direct script mappings (specific reports/operations)
-        direct_match = self._match_direct_script(query_lower)
+        direct_match = self._match_direct_script(query_lower, matched, index)
         if direct_match:
             return direct_match
         
         # Priority 3: Match to agent patterns
-        agent_match = self._match_agent_pattern(query_lower)
+        agent_match = self._match_agent_pattern(query_lower, matched, index)
         if agent_match:
             return agent_match
         
         # Fallback: Return orchestrator recommendation
         return self._fallback_routing(query_lower)
     
-    def _match_workflow(self, query: str) -> Optional[Dict]:
+    def route_many(self, queries: Iterable[str]) -> List[Dict]:
+        """
+        Route a batch of queries, returning one result per query in input order.
+        
+        Duplicate queries are matched once, then every unique query is scored
+        against all patterns at once through the sparse query x pattern matrix.
+        Results are identical to calling route() on each query.
+        """
+        index = self._index
+        normalized = [normalize_query(query) for query in queries]
+        unique_index: Dict[str, int] = {}
+        rows = [unique_index.setdefault(query, len(unique_index)) for query in normalized]
+        unique_queries = list(unique_index)
+        
+        indptr, indices = self.match_matrix(unique_queries, index)
+        
+        # Column reductions over the sparse matrix: earliest workflow / direct script per row
+        workflow_ranks = self._min_rank_per_row(indptr, indices, index.workflow_hits)
+        direct_ranks = self._min_rank_per_row(indptr, indices, index.direct_hits)
+        
+        # Sparse (query x pattern) @ (pattern x domain) product for agent scoring
+        domain_count = len(index.domain_list)
+        domain_scores = [[0] * domain_count for _ in unique_queries]
+        for row, scores in enumerate(domain_scores):
+            for pid in indices[indptr[row]:indptr[row + 1]]:
+                for domain_index, count in index.domain_hits.get(pid, ()):
+                    scores[domain_index] += count
+        
+        unique_results = []
+        for row, query in enumerate(unique_queries):
+            if workflow_ranks[row] is not None:
+                result = index.workflow_result(workflow_ranks[row])
+            elif direct_ranks[row] is not None:
+                result = index.direct_result(direct_ranks[row])
+            else:
+                result = index.agent_result(domain_scores[row]) or self._fallback_routing(query)
+            unique_results.append(result)
+        
+        # Fresh dict per input so callers can mutate results independently, like route()
+        return [dict(unique_results[row]) for row in rows]
+    
+    def match_matrix(self, queries: List[str],
+                     index: Optional[RoutingIndex] = None) -> Tuple[List[int], List[int]]:
+        """
+        Build the sparse query x pattern match matrix in CSR form.
+        
+        Returns (indptr, indices): the pattern ids matched by queries[i] are
+        indices[indptr[i]:indptr[i + 1]]. Queries are expected to be lowercased.
+        """
+        matcher = (index or self._index).matcher
+        indptr = [0]
+        indices: List[int] = []
+        for query in queries:
+            indices.extend(sorted(matcher.find_all(query)))
+            indptr.append(len(indices))
+        return indptr, indices
+    
+    @staticmethod
+    def _min_rank_per_row(indptr: List[int], indices: List[int],
+                          hits: Dict[int, int]) -> List[Optional[int]]:
+        """Lowest rank of any matched pattern in each row, or None when nothing matched"""
+        ranks: List[Optional[int]] = []
+        for row in range(len(indptr) - 1):
+            row_ranks = [hits[pid] for pid in indices[indptr[row]:indptr[row + 1]] if pid in hits]
+            ranks.append(min(row_ranks) if row_ranks else None)
+        return ranks
+    
+    def _match_workflow(self, query: str, matched: Optional[Set[int]] = None,
+                        index: Optional[RoutingIndex] = None) -> Optional[Dict]:
         """Check if query matches a predefined workflow"""
-        for workflow_name, workflow_config in self.workflows.items():
-            # Check if any trigger matches
-            for trigger in workflow_config.get("triggers", []):
-                if trigger in query:
-                    return {
-                        "routing_type": "workflow",
-                        "workflow": workflow_name,
-                        "description": workflow_config.get("description"),
-                        "steps": workflow_config.get("steps"),
-                        "confidence": 0.95
-                    }
-        return None
+        index = index or self._index
+        if matched is None:
+            matched = index.matcher.find_all(query)
+        
+        ranks = [index.workflow_hits[pid] for pid in matched if pid in index.workflow_hits]
+        return index.workflow_result(min(ranks)) if ranks else None
     
-    def _match_direct_script(self, query: str) -> Optional[Dict]:
+    def _match_direct_script(self, query: str, matched: Optional[Set[int]] = None,
+                             index: Optional[RoutingIndex] = None) -> Optional[Dict]:
         """Check if query matches a direct script mapping"""
-        # Check each category in direct_map
-        for category, scripts in self.direct_map.items():
-            for script_key, script_path in scripts.items():
-                # Convert script_key to readable pattern (e.g. "ic_production_report" -> "ic production report")
-                pattern = script_key.replace("_", " ")
-                if pattern in query:
-                    # Determine agent from script path
-                    if "/" in script_path:
-                        agent = script_path.split("/")[0]
-                        agent_config = self._get_agent_config(agent)
-                        return {
-                            "routing_type": "direct",
-                            "category": category,
-                            "script": script_path,
-                            "agent": agent,
-                            "mcp_tools": agent_config.get("mcp_tools", []) if agent_config else [],
-                            "confidence": 0.90
-                        }
-        return None
+        index = index or self._index
+        if matched is None:
+            matched = index.matcher.find_all(query)
+        
+        ranks = [index.direct_hits[pid] for pid in matched if pid in index.direct_hits]
+        return index.direct_result(min(ranks)) if ranks else None
     
-    def _match_agent_pattern(self, query: str) -> Optional[Dict]:
+    def _match_agent_pattern(self, query: str, matched: Optional[Set[int]] = None,
+                             index: Optional[RoutingIndex] = None) -> Optional[Dict]:
         """Match query to agent based on pattern matching"""
-        best_match = None
-        best_score = 0
+        index = index or self._index
+        if matched is None:
+            matched = index.matcher.find_all(query)
         
-        for domain, config in self.patterns.items():
-            patterns = config.get("patterns", [])
-            
-            # Count how many patterns match
-            matches = sum(1 for pattern in patterns if pattern in query)
-            
-            if matches > best_score:
-                best_score = matches
-                best_match = {
-                    "routing_type": "agent",
-                    "domain": domain,
-                    "agent": config.get("agent"),
-                    "path": config.get("sub_agent_path"),
-                    "mcp_tools": config.get("mcp_tools", []),
-                    "quick_actions": config.get("quick_actions", {}),
-                    "confidence": min(0.85, 0.50 + (matches * 0.15))  # Scale confidence
-                }
-        
-        return best_match if best_score > 0 else None
+        # Count how many patterns match per domain
+        scores = [0] * len(index.domain_list)
+        for pid in matched:
+            for domain_index, count in index.domain_hits.get(pid, ()):
+                scores[domain_index] += count
+        return index.agent_result(scores)
     
     def _get_agent_config(self, agent_keyword: str) -> Optional[Dict]:
         """Get agent configuration by matching keyword to domain"""
-        for domain, config in self.patterns.items():
-            if agent_keyword in config.get("sub_agent_path", ""):
-                return config
-        return None
+        return self._index.get_agent_config(agent_keyword)
     
     def _fallback_routing(self, query: str) -> Dict:
         """Fallback when no clear match is found"""
+        semantic_match = self._match_semantic(query)
+        if semantic_match:
+            return semantic_match
+        
         return {
             "routing_type": "orchestrator",
             "agent": "orchestrator",
@@ -136,6 +610,26 @@ class AgentRouter:
             "confidence": 0.30
         }
     
+    def _match_semantic(self, query: str) -> Optional[Dict]:
+        """Route to the single agent whose phrases/example prompts are most similar"""
+        if self._semantic_index is None:
+            return None
+        
+        hit = self._semantic_index.nearest(query)
+        if not hit or hit[1] < self.semantic_threshold:
+            return None
+        
+        domain, similarity = hit
+        index = self._index
+        if domain not in index.patterns:
+            return None  # Index built from an older map that had this domain
+        
+        # Below any pattern match (0.65) but above the orchestrator fallback (0.30)
+        result = index.domain_result(domain, round(0.30 + 0.30 * similarity, 2))
+        result["match_type"] = "semantic"
+        result["similarity"] = round(similarity, 3)
+        return result
+    
     def get_agent_capabilities(self, agent_name: str) -> Dict:
         """Get capabilities for a specific agent"""
         for domain, config in self.patterns.items():
@@ -0,0 +1,245 @@
+"""
+PHEPy Agent Router - Latency & Accuracy Benchmark
+
+Generates a synthetic corpus from agent_routing_map.json and the sub-agents'
+EXAMPLE_PROMPTS.md / TEST_SCENARIOS.md files, routes every query, and reports
+latency percentiles, throughput, memory and top-1 routing accuracy.
+
+Usage:
+    python benchmark_routing.py
+    python benchmark_routing.py --size 50000 --output bench.json
+    python benchmark_routing.py --baseline bench_v1.json --output bench_v2.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agent_router import AgentRouter
+from semantic_router import extract_example_prompts
+
+# Surrounding text for pattern-derived queries (placeholders filled per query)
+QUERY_TEMPLATES = [
+    "{phrase}",
+    "{phrase} please",
+    "can you {phrase}",
+    "I need {phrase} for {customer}",
+    "{phrase} for {customer} {date}",
+    "show me {phrase} for icm {icm_id}",
+    "quick one: {phrase}?",
+]
+CUSTOMERS = ["Contoso", "Fabrikam", "CIBC", "Ford Motor", "Northwind", "Desjardins", "GE"]
+DATES = ["today", "this week", "since 2026-01-15", "for 2/3/2026", "last 14 days"]
+
+# (query, expected route) where expected is ("workflow", name), ("direct", script) or ("agent", domain)
+Case = Tuple[str, Tuple[str, str]]
+
+
+def fill(template: str, phrase: str, rng: random.Random) -> str:
+    """Render one template with random placeholder values"""
+    return template.format(
+        phrase=phrase,
+        customer=rng.choice(CUSTOMERS),
+        date=rng.choice(DATES),
+        icm_id=rng.randint(21000000000000, 21000000999999)
+    )
+
+
+def seed_cases(router: AgentRouter, root: Path) -> List[Case]:
+    """Labelled seed phrases: workflow triggers, direct keys, domain patterns, sub-agent prompts"""
+    cases: List[Case] = []
+    
+    for workflow_name, config in router.workflows.items():
+        cases.extend((trigger, ("workflow", workflow_name)) for trigger in config.get("triggers", []))
+    
+    for scripts in router.direct_map.values():
+        for script_key, script_path in scripts.items():
+            if "/" in script_path:
+                cases.append((script_key.replace("_", " "), ("direct", script_path)))
+    
+    for domain, config in router.patterns.items():
+        cases.extend((pattern, ("agent", domain)) for pattern in config.get("patterns", []))
+        
+        agent_dir = root / config.get("sub_agent_path", "")
+        if not config.get("sub_agent_path") or not agent_dir.is_dir():
+            continue
+        for name in ("EXAMPLE_PROMPTS.md", "TEST_SCENARIOS.md"):
+            prompts_file = agent_dir / name
+            if prompts_file.exists():
+                cases.extend((prompt, ("agent", domain)) for prompt in extract_example_prompts(prompts_file))
+    
+    return cases
+
+
+def build_corpus(router: AgentRouter, root: Path, size: int, seed: int) -> List[Case]:
+    """Expand the seed phrases through the query templates until the corpus reaches size"""
+    rng = random.Random(seed)
+    seeds = seed_cases(router, root)
+    corpus = list(seeds)
+    while len(corpus) < size:
+        phrase, expected = rng.choice(seeds)
+        corpus.append((fill(rng.choice(QUERY_TEMPLATES), phrase, rng), expected))
+    rng.shuffle(corpus)
+    return corpus[:size]
+
+
+def route_target(result: Dict) -> Tuple[str, Optional[str]]:
+    """Reduce a routing result to the same shape as the expected labels"""
+    routing_type = result.get("routing_type")
+    if routing_type == "workflow":
+        return ("workflow", result.get("workflow"))
+    if routing_type == "direct":
+        return ("direct", result.get("script"))
+    if routing_type == "agent":
+        return ("agent", result.get("domain"))
+    return (routing_type, None)
+
+
+def is_correct(router: AgentRouter, expected: Tuple[str, str], actual: Tuple[str, Optional[str]]) -> bool:
+    """Exact match, or a direct script owned by the expected agent domain"""
+    if expected == actual:
+        return True
+    if expected[0] == "agent" and actual[0] == "direct":
+        agent_config = router._get_agent_config(actual[1].split("/")[0])
+        return agent_config is router.patterns.get(expected[1])
+    return False
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_benchmark(map_path: str, size: int, seed: int, use_cache: bool, semantic: bool) -> Dict:
+    """Build the corpus, time every route() call and score accuracy"""
+    root = Path(map_path).resolve().parent
+    
+    # Memory: everything the router allocates to load and index the map
+    tracemalloc.start()
+    router = AgentRouter(
+        map_path,
+        semantic_fallback=semantic,
+        cache_size=1024 if use_cache else 0
+    )
+    router_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    corpus = build_corpus(router, root, size, seed)
+    
+    # Warm-up so first-call effects don't land in the percentiles
+    for query, _ in corpus[:200]:
+        router.route(query)
+    
+    latencies_us = []
+    correct = 0
+    by_type: Dict[str, List[int]] = {}
+    start = time.perf_counter()
+    for query, expected in corpus:
+        t0 = time.perf_counter_ns()
+        result = router.route(query)
+        latencies_us.append((time.perf_counter_ns() - t0) / 1000)
+        
+        hit = is_correct(router, expected, route_target(result))
+        correct += hit
+        counts = by_type.setdefault(expected[0], [0, 0])
+        counts[0] += hit
+        counts[1] += 1
+    elapsed = time.perf_counter() - start
+    
+    batch_start = time.perf_counter()
+    router.route_many(query for query, _ in corpus)
+    batch_elapsed = time.perf_counter() - batch_start
+    
+    latencies_us.sort()
+    index = router._index
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "routing_map": {
+            "path": str(map_path),
+            "version": router.routing_config.get("version"),
+            "sha256": index.digest,
+            "patterns": len(index.matcher.patterns)
+        },
+        "config": {"size": size, "seed": seed, "cache": use_cache, "semantic_fallback": semantic},
+        "latency_us": {
+            "p50": round(percentile(latencies_us, 50), 2),
+            "p95": round(percentile(latencies_us, 95), 2),
+            "p99": round(percentile(latencies_us, 99), 2),
+            "max": round(latencies_us[-1], 2),
+            "mean": round(statistics.fmean(latencies_us), 2)
+        },
+        "throughput_qps": round(len(corpus) / elapsed, 1),
+        "batch_throughput_qps": round(len(corpus) / batch_elapsed, 1),
+        "memory": {"router_kib": round(router_bytes / 1024, 1)},
+        "accuracy": {
+            "top1": round(correct / len(corpus), 4),
+            "by_expected_type": {
+                kind: round(hits / total, 4) for kind, (hits, total) in sorted(by_type.items())
+            }
+        },
+        "cache": router.cache_stats()
+    }
+
+
+def print_report(results: Dict, baseline: Optional[Dict] = None):
+    """Human-readable summary, with deltas against a previous run if given"""
+    def delta(section: str, key: str) -> str:
+        old = (baseline or {}).get(section, {}).get(key)
+        if not old:
+            return ""
+        return f"  ({(results[section][key] - old) / old:+.1%} vs baseline)"
+    
+    print("=" * 80)
+    print("PHEPy Agent Router - Benchmark")
+    print("=" * 80)
+    print(f"Routing map: v{results['routing_map']['version']} "
+          f"({results['routing_map']['patterns']} patterns, sha256 {results['routing_map']['sha256'][:12]})")
+    print(f"Corpus: {results['config']['size']} queries (seed {results['config']['seed']})")
+    print()
+    for key in ("p50", "p95", "p99"):
+        print(f"   Latency {key}: {results['latency_us'][key]:.1f} us{delta('latency_us', key)}")
+    print(f"   Throughput: {results['throughput_qps']:,.0f} queries/s")
+    print(f"   Batch (route_many): {results['batch_throughput_qps']:,.0f} queries/s")
+    print(f"   Router memory: {results['memory']['router_kib']:,.1f} KiB")
+    print(f"   Top-1 accuracy: {results['accuracy']['top1']:.1%}{delta('accuracy', 'top1')}")
+    for kind, accuracy in results["accuracy"]["by_expected_type"].items():
+        print(f"      {kind}: {accuracy:.1%}")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AgentRouter latency and accuracy")
+    parser.add_argument("--map", default="agent_routing_map.json", help="Routing map path")
+    parser.add_argument("--size", type=int, default=20000, help="Number of synthetic queries")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus random seed")
+    parser.add_argument("--cache", action="store_true", help="Enable the route cache")
+    parser.add_argument("--semantic", action="store_true", help="Enable the semantic fallback tier")
+    parser.add_argument("--output", help="Write machine-readable JSON results here")
+    parser.add_argument("--baseline", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.map, args.size, args.seed, args.cache, args.semantic)
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Shared ICM tooling for the PHEPy agents and analyzers
+
+Add the repository root to sys.path and import from here, e.g.:
+    
+    from icm_tools import ICMFetcher, get_backend
+"""
+
+from .fetcher import (
+    Checkpoint,
+    FetchError,
+    FetchResult,
+    ICMFetcher,
+    TokenBucket,
+    get_backend,
+    progress_printer,
+)
+from .progress import ProgressStore
@@ -0,0 +1,489 @@
+"""
+Concurrent ICM detail retrieval
+
+Incident details are fetched through a backend (anything with an async
+fetch(icm_id) returning the incident as a dict):
+    
+    HTTPBackend - the ICM MCP server from mcp.json, over streamable HTTP
+                  (aiohttp when installed, otherwise urllib on threads)
+    FileBackend - offline stand-in answering from saved details (a folder of
+                  <id>.json files, a JSON file or a JSONL checkpoint), with
+                  optional simulated latency and throttling
+
+ICMFetcher keeps a bounded number of requests in flight, spaces them with a
+token bucket, retries throttling and dropped connections with jittered
+backoff (honouring Retry-After) and appends every incident to a JSONL
+checkpoint as soon as it arrives, so an interrupted run resumes where it
+stopped:
+    
+    fetcher = ICMFetcher(get_backend("http"), checkpoint="data/icm_details.jsonl")
+    results = fetcher.fetch_all(icm_ids, on_result=progress_printer(len(icm_ids)))
+    results[51000000877262].data  # incident dict
+
+The checkpoint holds one incident JSON object per line with its "id", the
+format of tsg_system/data/retrieved_incidents.jsonl.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+ICM_MCP_URL = "https://icm-mcp-prod.azure-api.net/v1/"
+TOKEN_ENV = "ICM_MCP_TOKEN"
+
+CONCURRENCY = 16
+RATE = 20.0          # Requests started per second, across all workers
+RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+TIMEOUT = 60.0       # Seconds per request
+
+FetchResult = namedtuple("FetchResult", "id data error attempts elapsed resumed", defaults=(False,))
+
+
+class FetchError(Exception):
+    """An incident could not be fetched; transient errors are retried by ICMFetcher"""
+    
+    def __init__(self, message, transient=False, retry_after=None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+
+def is_transient(error):
+    """Whether a failed fetch is worth retrying"""
+    if isinstance(error, FetchError):
+        return error.transient
+    if AIOHTTP_AVAILABLE and isinstance(error, aiohttp.ClientConnectionError):
+        return True
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+
+
+def _status_error(status, text, retry_after=None):
+    """FetchError for an HTTP error status (429 and 5xx are transient)"""
+    try:
+        retry_after = float(retry_after) if retry_after else None
+    except ValueError:
+        retry_after = None  # An HTTP date; fall back to backoff
+    transient = status == 429 or status >= 500
+    hint = f" (set ${TOKEN_ENV})" if status in (401, 403) else ""
+    return FetchError(f"HTTP {status}{hint}: {text[:200]}", transient=transient, retry_after=retry_after)
+
+
+def _record_id(record):
+    """Incident ID of a saved record (ICM responses vary in the key they use)"""
+    return record.get("id") or record.get("incidentId") or record.get("Id")
+
+
+class TokenBucket:
+    """
+    Async rate limiter: rate tokens per second, up to capacity saved up
+    
+    pause() stops handing out tokens for a while, e.g. after the server
+    answered 429 with Retry-After, so every worker backs off, not just the
+    throttled one.
+    """
+    
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens go out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+class Checkpoint:
+    """Fetched incidents, one JSON object per line, appended as they arrive"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+    
+    def load(self):
+        """{str(id): record} of everything fetched so far"""
+        records = {}
+        if not self.path.exists():
+            return records
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Line cut short by an interrupted run; refetched
+                records[str(_record_id(record))] = record
+        return records
+    
+    def _drop_partial_line(self):
+        """Cut a last line an interrupted run left half-written, so the next record starts on its own line"""
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            size = end
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                f.truncate(end)
+    
+    def append(self, record):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self.path.exists():
+                self._drop_partial_line()
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class HTTPBackend:
+    """
+    Fetches incidents from the ICM MCP server (see mcp.json) over streamable HTTP
+    
+    One MCP session is opened per run and shared by all requests.
+    """
+    
+    name = "http"
+    
+    def __init__(self, url=ICM_MCP_URL, token=None, tool="get_incident_details_by_id",
+                 argument_name="incidentId", timeout=TIMEOUT):
+        """
+        Args:
+            url: MCP endpoint
+            token: Bearer token (default: $ICM_MCP_TOKEN)
+            tool: Name of the incident details tool exposed by the server
+            argument_name: Tool argument that takes the incident ID
+            timeout: Seconds to wait for one response
+        """
+        self.url = url
+        self.token = token or os.environ.get(TOKEN_ENV)
+        self.tool = tool
+        self.argument_name = argument_name
+        self.timeout = timeout
+        self._session = None
+        self._session_id = None
+        self._ids = 0
+    
+    def _headers(self):
+        headers = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self._session_id:
+            headers["Mcp-Session-Id"] = self._session_id
+        return headers
+    
+    async def _post(self, message):
+        """(status, headers, body text) of one JSON-RPC POST"""
+        body = json.dumps(message).encode("utf-8")
+        if AIOHTTP_AVAILABLE:
+            async with self._session.post(self.url, data=body, headers=self._headers()) as response:
+                return response.status, response.headers, await response.text()
+        
+        def post():
+            request = urllib.request.Request(self.url, data=body, headers=self._headers(), method="POST")
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    return response.status, response.headers, response.read().decode("utf-8")
+            except urllib.error.HTTPError as e:
+                return e.code, e.headers, e.read().decode("utf-8", "replace")
+        
+        return await asyncio.to_thread(post)
+    
+    async def _request(self, method, params):
+        self._ids += 1
+        request_id = self._ids
+        status, headers, text = await self._post({"jsonrpc": "2.0", "id": request_id,
+                                                  "method": method, "params": params})
+        if status >= 400:
+            raise _status_error(status, text, headers.get("Retry-After"))
+        if headers.get("Mcp-Session-Id"):
+            self._session_id = headers["Mcp-Session-Id"]
+        
+        # Plain JSON, or a server-sent event stream carrying the response
+        if "text/event-stream" in headers.get("Content-Type", ""):
+            messages = [json.loads(line[5:]) for line in text.splitlines() if line.startswith("data:")]
+        else:
+            messages = [json.loads(text)]
+        for message in messages:
+            if message.get("id") == request_id:
+                if "error" in message:
+                    raise FetchError(f"ICM MCP: {message['error'].get('message', message['error'])}")
+                return message["result"]
+        raise FetchError("ICM MCP sent no response", transient=True)
+    
+    async def open(self):
+        if AIOHTTP_AVAILABLE:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._session_id = None
+        await self._request("initialize", {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "phepy-icm-tools", "version": "1.0"},
+        })
+        await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+    
+    async def fetch(self, icm_id):
+        result = await self._request("tools/call", {"name": self.tool,
+                                                    "arguments": {self.argument_name: int(icm_id)}})
+        text = "".join(part.get("text", "") for part in result.get("content", []) if part.get("type") == "text")
+        if result.get("isError"):
+            transient = any(marker in text.lower() for marker in ("throttl", "too many requests", "timeout"))
+            raise FetchError(text or f"ICM {icm_id} lookup failed", transient=transient)
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise FetchError(f"ICM MCP returned non-JSON output for {icm_id}: {text[:200]}")
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class FileBackend:
+    """
+    Offline stand-in that answers from saved incident details
+    
+    latency and throttle_rate make it behave like a remote service, for
+    trying out concurrency, rate and retry settings without touching ICM.
+    """
+    
+    name = "file"
+    
+    def __init__(self, source, latency=0.0, throttle_rate=0.0, seed=None):
+        """
+        Args:
+            source: Folder of <id>.json files, a JSON file ({id: details} or a
+                list of incidents) or a JSONL file of incidents
+            latency: Seconds each fetch takes
+            throttle_rate: Fraction of fetches answered with a (transient) 429
+        """
+        self.source = Path(source)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._records = None
+    
+    def _load(self):
+        if self.source.is_dir():
+            return None  # Read per incident
+        if self.source.suffix == ".jsonl":
+            return Checkpoint(self.source).load()
+        with open(self.source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return {str(key): value for key, value in data.items()}
+        return {str(_record_id(record)): record for record in data}
+    
+    async def open(self):
+        self._records = await asyncio.to_thread(self._load)
+    
+    async def fetch(self, icm_id):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            raise FetchError("HTTP 429: simulated throttling", transient=True)
+        if self._records is None:
+            path = self.source / f"{icm_id}.json"
+            if not path.exists():
+                raise FetchError(f"ICM {icm_id} not found in {self.source}")
+            return json.loads(await asyncio.to_thread(path.read_text, encoding="utf-8"))
+        try:
+            return self._records[str(icm_id)]
+        except KeyError:
+            raise FetchError(f"ICM {icm_id} not found in {self.source}")
+    
+    async def close(self):
+        pass
+
+
+BACKENDS = {
+    "http": HTTPBackend,
+    "file": FileBackend,
+}
+
+
+def get_backend(name, **options):
+    """Backend instance by name ('http' or 'file')"""
+    try:
+        backend_class = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown ICM backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return backend_class(**options)
+
+
+class ICMFetcher:
+    """
+    Fetches many incidents concurrently from a backend
+    
+    At most concurrency requests are in flight and at most rate start per
+    second (burst may start at once after a quiet spell). Transient failures
+    are retried up to retries times, waiting Retry-After when the server
+    sends one and otherwise a random time up to backoff_base * 2**attempt
+    (capped at backoff_max).
+    """
+    
+    def __init__(self, backend, concurrency=CONCURRENCY, rate=RATE, burst=None, retries=RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, timeout=TIMEOUT, checkpoint=None):
+        """
+        Args:
+            backend: Backend instance (see get_backend())
+            rate: Requests per second, or None for no limit
+            checkpoint: JSONL file incidents are appended to; incidents already
+                in it are not fetched again
+        """
+        self.backend = backend
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.checkpoint = Checkpoint(checkpoint) if checkpoint else None
+    
+    async def _fetch_one(self, icm_id, bucket):
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            if bucket is not None:
+                await bucket.acquire()
+            try:
+                data = await asyncio.wait_for(self.backend.fetch(icm_id), self.timeout)
+                return FetchResult(icm_id, data, None, attempt, time.perf_counter() - started)
+            except Exception as e:
+                error = e
+            if attempt > self.retries or not is_transient(error):
+                return FetchResult(icm_id, None, error, attempt, time.perf_counter() - started)
+            retry_after = getattr(error, "retry_after", None)
+            if retry_after and bucket is not None:
+                bucket.pause(retry_after)
+            # Full jitter: spreads retries out instead of hitting the service in lockstep
+            await asyncio.sleep(retry_after or random.uniform(0, min(self.backoff_max,
+                                                                     self.backoff_base * 2 ** (attempt - 1))))
+    
+    async def _worker(self, queue, bucket, results, on_result):
+        while True:
+            try:
+                icm_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await self._fetch_one(icm_id, bucket)
+            if result.error is None:
+                record = result.data
+                if isinstance(record, dict) and "id" not in record:
+                    record = dict(record, id=icm_id)
+                    result = result._replace(data=record)
+                if self.checkpoint is not None:
+                    self.checkpoint.append(record)
+            results[str(icm_id)] = result
+            if on_result is not None:
+                on_result(result)
+    
+    async def run(self, icm_ids, on_result=None):
+        """
+        Fetch incidents concurrently; returns {icm_id: FetchResult} in input order
+        
+        Incidents already in the checkpoint come back with resumed=True
+        without a request. on_result(result) is called for each of those
+        first, then as each fetch finishes (or finally fails).
+        """
+        icm_ids = list(dict.fromkeys(icm_ids))
+        saved = self.checkpoint.load() if self.checkpoint is not None else {}
+        results = {str(i): FetchResult(i, saved[str(i)], None, 0, 0.0, True) for i in icm_ids if str(i) in saved}
+        if on_result is not None:
+            for result in results.values():
+                on_result(result)
+        todo = [i for i in icm_ids if str(i) not in results]
+        
+        if todo:
+            queue = asyncio.Queue()
+            for icm_id in todo:
+                queue.put_nowait(icm_id)
+            bucket = TokenBucket(self.rate, self.burst) if self.rate else None
+            await self.backend.open()
+            try:
+                await asyncio.gather(*(self._worker(queue, bucket, results, on_result)
+                                       for _ in range(min(self.concurrency, len(todo)))))
+            finally:
+                await self.backend.close()
+                if self.checkpoint is not None:
+                    self.checkpoint.close()
+        return {i: results[str(i)] for i in icm_ids}
+    
+    def fetch_all(self, icm_ids, on_result=None):
+        """Blocking run(); safe to call whether or not an event loop is already running"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(icm_ids, on_result))
+        # Inside a running loop (e.g. a notebook): run on a separate thread
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.run(icm_ids, on_result)).result()
+
+
+def progress_printer(total, every=100):
+    """on_result callback printing failures and a progress line every `every` incidents"""
+    state = {"done": 0, "resumed": 0, "failed": 0, "started": None}
+    
+    def on_result(result):
+        state["done"] += 1
+        if result.resumed:
+            state["resumed"] += 1
+        elif state["started"] is None:
+            state["started"] = time.perf_counter() - result.elapsed
+        if result.error is not None:
+            state["failed"] += 1
+            print(f"  ✗ {result.id}: {result.error} (after {result.attempts} attempt(s))")
+        if state["done"] % every == 0 or state["done"] == total:
+            fetched = state["done"] - state["resumed"]
+            rate = fetched / max(time.perf_counter() - (state["started"] or time.perf_counter()), 1e-9)
+            print(f"  ✓ {state['done']}/{total} done ({state['resumed']} from checkpoint, "
+                  f"{state['failed']} failed, {rate:.1f}/s)")
+    
+    return on_result
@@ -0,0 +1,296 @@
+"""
+Indexed progress tracking for long ICM retrievals
+
+ProgressStore keeps the state of every incident of a retrieval (pending,
+retrieved or failed) in SQLite, and appends retrieved incidents to a JSONL
+data file, one object per line with its "id":
+    
+    store = ProgressStore("data/retrieval_progress.db", "data/retrieved_incidents.jsonl")
+    store.set_targets(incident_ids)
+    for icm_id in store.next_pending(50):
+        store.add_retrieved(fetch(icm_id))   # buffered
+    store.counts()                           # {"pending": ..., "retrieved": ..., "failed": ...}
+    store.close()
+
+- Status is O(1): triggers keep incident counts per state (and whether
+  the incident is in the target list) up to date, and the next pending
+  incidents come from an index on (state, position).
+- Writes are buffered and flushed in batches (every flush_every incidents
+  or flush_interval seconds, and on close/exit). A flush appends the batch
+  to the data file and updates the states in one transaction.
+- Writers are safe to run concurrently, from threads or processes. A flush
+  holds the database write lock while it appends, so lines never
+  interleave, and incidents another writer already saved are skipped.
+- The database records how much of the data file it has accounted for.
+  Lines appended by a run that died before committing are picked up on
+  the next open, and a half-written last line is cut off.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 5.0  # Seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    incident_id PRIMARY KEY,
+    position INTEGER,
+    state TEXT NOT NULL,
+    error TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS incidents_state ON incidents (state, position);
+CREATE TABLE IF NOT EXISTS state_counts (
+    state TEXT NOT NULL,
+    targeted INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (state, targeted)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TRIGGER IF NOT EXISTS incidents_insert AFTER INSERT ON incidents BEGIN
+    INSERT INTO state_counts VALUES (NEW.state, NEW.position IS NOT NULL, 1)
+    ON CONFLICT (state, targeted) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS incidents_delete AFTER DELETE ON incidents BEGIN
+    UPDATE state_counts SET n = n - 1 WHERE state = OLD.state AND targeted = (OLD.position IS NOT NULL);
+END;
+CREATE TRIGGER IF NOT EXISTS incidents_update AFTER UPDATE OF state, position ON incidents
+WHEN NEW.state != OLD.state OR (NEW.position IS NULL) != (OLD.position IS NULL) BEGIN
+    UPDATE state_counts SET n = n - 1 WHERE state = OLD.state AND targeted = (OLD.position IS NOT NULL);
+    INSERT INTO state_counts VALUES (NEW.state, NEW.position IS NOT NULL, 1)
+    ON CONFLICT (state, targeted) DO UPDATE SET n = n + 1;
+END;
+"""
+
+STATES = ("pending", "retrieved", "failed")
+
+UPSERT = """
+INSERT INTO incidents (incident_id, state, error, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (incident_id) DO UPDATE SET state = excluded.state, error = excluded.error,
+    updated_at = excluded.updated_at
+WHERE incidents.state != 'retrieved'
+"""
+
+
+def incident_key(incident_id):
+    """IDs as stored: numeric strings become ints, so "51000000877262" and 51000000877262 match"""
+    if isinstance(incident_id, str) and incident_id.strip().isdigit():
+        return int(incident_id)
+    return incident_id
+
+
+def _chunks(items, size=500):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class ProgressStore:
+    """Incident states in SQLite plus the retrieved incidents in a JSONL file"""
+    
+    def __init__(self, db_path, data_file, flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL):
+        self.db_path = Path(db_path)
+        self.data_file = Path(data_file)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+        self._records = []
+        self._failures = []
+        self._last_flush = time.monotonic()
+        with self._write() as conn:
+            self._catch_up(conn)
+        atexit.register(self.close)
+    
+    @contextmanager
+    def _write(self):
+        """Write transaction; BEGIN IMMEDIATE takes the database write lock up front"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def _meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT INTO meta VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                     (key, str(value)))
+    
+    def _catch_up(self, conn):
+        """Account for data file lines the database hasn't seen (a run that died mid-flush)"""
+        size = self.data_file.stat().st_size if self.data_file.exists() else 0
+        offset = int(self._meta(conn, "data_offset", 0))
+        if size == offset:
+            return
+        if size < offset:
+            # Data file replaced or truncated: rebuild the retrieved states from it
+            conn.execute("UPDATE incidents SET state = 'pending' WHERE state = 'retrieved' AND position IS NOT NULL")
+            conn.execute("DELETE FROM incidents WHERE state = 'retrieved'")
+            offset = 0
+            self._set_meta(conn, "data_offset", 0)
+            if size == 0:
+                return
+        
+        with open(self.data_file, "rb+") as f:
+            f.seek(offset)
+            tail = f.read()
+            end = tail.rfind(b"\n") + 1
+            if end < len(tail):
+                f.truncate(offset + end)  # Half-written last line
+        now = datetime.now().isoformat()
+        ids = []
+        for line in tail[:end].splitlines():
+            try:
+                ids.append(incident_key(json.loads(line).get("id")))
+            except ValueError:
+                continue
+        conn.executemany(UPSERT, [(i, "retrieved", None, now) for i in ids])
+        self._set_meta(conn, "data_offset", offset + end)
+    
+    def set_targets(self, incident_ids):
+        """
+        Set the incidents to retrieve, in order
+        
+        Incidents already retrieved or failed keep their state; pending
+        incidents no longer in the list are dropped.
+        """
+        keys = list(dict.fromkeys(incident_key(i) for i in incident_ids))
+        self.flush()
+        with self._write() as conn:
+            conn.execute("UPDATE incidents SET position = NULL WHERE position IS NOT NULL")
+            conn.execute("DELETE FROM incidents WHERE state = 'pending'")
+            conn.executemany("INSERT INTO incidents (incident_id, position, state) VALUES (?, ?, 'pending') "
+                             "ON CONFLICT (incident_id) DO UPDATE SET position = excluded.position",
+                             [(key, position) for position, key in enumerate(keys)])
+            self._set_meta(conn, "total", len(keys))
+            self._set_meta(conn, "last_updated", datetime.now().isoformat())
+    
+    def add_retrieved(self, record):
+        """Queue a retrieved incident (a dict with its "id") for the next flush"""
+        with self._lock:
+            self._records.append(record)
+            self._maybe_flush()
+    
+    def add_failed(self, incident_id, error):
+        """Queue a failure for the next flush (incidents already retrieved stay retrieved)"""
+        with self._lock:
+            self._failures.append((incident_key(incident_id), str(error), datetime.now().isoformat()))
+            self._maybe_flush()
+    
+    def _maybe_flush(self):
+        pending = len(self._records) + len(self._failures)
+        if pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        """Write the queued incidents and failures"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._records and not self._failures:
+                return
+            records, self._records = self._records, []
+            failures, self._failures = self._failures, []
+            now = datetime.now().isoformat()
+            
+            with self._write() as conn:
+                self._catch_up(conn)
+                # Skip incidents already saved (by this or another writer) and repeats within the batch
+                keys = list(dict.fromkeys(incident_key(r.get("id")) for r in records))
+                saved = set()
+                for chunk in _chunks(keys):
+                    placeholders = ", ".join("?" * len(chunk))
+                    # Look up by ID only: filtering on state here makes SQLite scan every retrieved row
+                    rows = conn.execute(f"SELECT incident_id, state FROM incidents "
+                                        f"WHERE incident_id IN ({placeholders})", chunk)
+                    saved.update(incident_id for incident_id, state in rows if state == "retrieved")
+                new_keys, lines = [], []
+                for record in records:
+                    key = incident_key(record.get("id"))
+                    if key not in saved:
+                        saved.add(key)
+                        new_keys.append(key)
+                        lines.append(json.dumps(record) + "\n")
+                
+                if lines:
+                    with open(self.data_file, "a", encoding="utf-8") as f:
+                        f.write("".join(lines))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    conn.executemany(UPSERT, [(key, "retrieved", None, now) for key in new_keys])
+                    self._set_meta(conn, "data_offset", self.data_file.stat().st_size)
+                conn.executemany(UPSERT, [(key, "failed", error, at) for key, error, at in failures])
+                self._set_meta(conn, "last_updated", now)
+    
+    def counts(self, targets_only=True):
+        """{state: number of incidents}, counting only the target list unless targets_only is False"""
+        self.flush()
+        query = "SELECT state, SUM(n) FROM state_counts" + (" WHERE targeted" if targets_only else "")
+        with self._lock:
+            counts = dict(self._conn.execute(query + " GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in STATES}
+    
+    def total(self):
+        """Number of incidents in the target list"""
+        with self._lock:
+            return int(self._meta(self._conn, "total", 0))
+    
+    def last_updated(self):
+        with self._lock:
+            return self._meta(self._conn, "last_updated")
+    
+    def next_pending(self, limit):
+        """The next pending incidents, in target list order"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT incident_id FROM incidents WHERE state = 'pending' "
+                                      "ORDER BY position LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def ids(self, state):
+        """IDs of every incident in a state"""
+        self.flush()
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT incident_id FROM incidents WHERE state = ?",
+                                                         (state,))}
+    
+    def failures(self):
+        """[{"incident_id", "error", "timestamp"}] of the failed incidents"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT incident_id, error, updated_at FROM incidents "
+                                      "WHERE state = 'failed' ORDER BY updated_at").fetchall()
+        return [{"incident_id": i, "error": error, "timestamp": at} for i, error, at in rows]
+    
+    def close(self):
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+        atexit.unregister(self.close)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
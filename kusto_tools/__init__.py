@@ -0,0 +1,19 @@
+"""
+Shared Kusto tooling for the PHEPy agents and report pipelines
+
+Add the repository root to sys.path and import from here, e.g.:
+    
+    from kusto_tools import QueryExecutor, SnapshotStore, get_backend
+"""
+
+from .cache import ResultCache, default_cache
+from .executor import (
+    QueryError,
+    QueryExecutor,
+    QueryRequest,
+    QueryResult,
+    default_backend,
+    get_backend,
+    print_progress,
+)
+from .snapshots import PYARROW_AVAILABLE, SnapshotStore, to_arrow
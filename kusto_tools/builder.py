@@ -0,0 +1,122 @@
+"""
+Composable KQL builder
+
+Queries are assembled from shared fragments instead of copy-pasted text:
+    
+    incidents = (KQL("IncidentsDedupView")
+                 .where('OwningTenantName == "Purview"', "ResolveDate > ago(7d)")
+                 .project("IncidentId", "Title", "ResolveDate"))
+    fields = pivot_fields({"EscalationQuality": "Escalation Quality"},
+                          keys_from="escalationIds", required=["EscalationQuality"])
+    script(("escalations", incidents),
+           ("escalationIds", KQL("escalations").project("IncidentId")),
+           ("customFields", fields),
+           KQL("escalations").join("customFields"))
+
+KQL objects are immutable: every operator returns a new query, so a
+fragment can be extended differently by each caller.
+"""
+
+CUSTOM_FIELDS_TABLE = "IncidentCustomFieldEntriesDedupView"
+
+
+def quote(value):
+    """KQL string literal"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class KQL:
+    """A tabular expression: a source (table or let name) piped through operators"""
+    
+    def __init__(self, source, operators=()):
+        self.source = source
+        self.operators = tuple(operators)
+    
+    def pipe(self, operator):
+        """Append a raw operator (without the leading "|")"""
+        return KQL(self.source, self.operators + (operator,))
+    
+    def where(self, *conditions):
+        """One where per condition, in order (put the most selective first)"""
+        query = self
+        for condition in conditions:
+            query = query.pipe(f"where {condition}")
+        return query
+    
+    def extend(self, *assignments):
+        return self.pipe(_column_list("extend", assignments))
+    
+    def project(self, *columns):
+        return self.pipe(_column_list("project", columns))
+    
+    def summarize(self, *aggregations, by=None):
+        operator = _column_list("summarize", aggregations)
+        if by:
+            by = by if isinstance(by, str) else ", ".join(by)
+            operator += f"\n    by {by}" if "\n" in operator else f" by {by}"
+        return self.pipe(operator)
+    
+    def join(self, right, on="IncidentId", kind="inner"):
+        """Join with another query or a let name"""
+        return self.pipe(f"join kind={kind} ({right}) on {on}")
+    
+    def order_by(self, *columns):
+        return self.pipe("order by " + ", ".join(columns))
+    
+    def render(self):
+        return "\n".join([str(self.source)] + [f"| {op}" for op in self.operators])
+    
+    __str__ = render
+    
+    def __repr__(self):
+        return f"KQL({self.render()!r})"
+
+
+def _column_list(operator, columns):
+    """Column lists for project/extend/summarize, one per line when they don't fit on one"""
+    line = f"{operator} " + ", ".join(columns)
+    if len(columns) == 1 or (len(line) <= 100 and not any("\n" in c for c in columns)):
+        return line
+    return f"{operator} \n    " + ",\n    ".join(columns)
+
+
+def pivot_fields(fields, keys_from=None, required=(), table=CUSTOM_FIELDS_TABLE,
+                 key="IncidentId", name_column="Name", value_column="Value"):
+    """
+    Custom field values as columns, from a single scan of a name/value table
+    
+    Replaces one "where Name == ... | project" subquery (and join) per field
+    with "where Name in (...) | summarize make_bag(...)", giving one row per
+    key with a string column per field.
+    
+    Args:
+        fields: {column: custom field name}, e.g. {"FeatureArea": "Feature Area"}
+        keys_from: Single-column table (usually a let name) of the keys to
+            fetch; limits the scan to rows that can match, e.g. incidents
+            inside the caller's time window
+        required: Columns whose field must be present (like an inner join on
+            that field); missing optional fields come back as ""
+    """
+    query = KQL(table)
+    if keys_from is not None:
+        query = query.where(f"{key} in ({keys_from})")
+    names = ", ".join(quote(name) for name in fields.values())
+    query = (query
+             .where(f"{name_column} in ({names})")
+             .summarize(f"Fields = make_bag(bag_pack({name_column}, {value_column}))", by=key))
+    for column in required:
+        query = query.where(f"bag_has_key(Fields, {quote(fields[column])})")
+    columns = [f"{column} = tostring(Fields[{quote(name)}])" for column, name in fields.items()]
+    return query.project(key, *columns)
+
+
+def script(*statements):
+    """
+    Render let statements and a final query as one KQL script
+    
+    Each statement but the last is a (name, query) pair; the last is the
+    query whose result the script returns.
+    """
+    *lets, body = statements
+    parts = [f"let {name} = {query};" for name, query in lets]
+    return "\n".join(parts + [str(body)]) + "\n"
@@ -0,0 +1,355 @@
+"""
+On-disk cache of Kusto query results
+
+Entries are keyed by a hash of the normalised KQL (comments dropped,
+whitespace collapsed) plus cluster and database, so the same query text
+produced by different generators, or re-indented, shares one entry.
+
+Queries with relative time (ago(), now()) are bucketed: a result fetched
+within the current time bucket is fresh, where the bucket size follows the
+smallest ago() window (180d -> 1 day, 14d -> 1 hour, 1h -> 5 minutes). After
+that the entry is stale: it is still served for a while, and refreshed in
+the background (stale-while-revalidate). Queries without relative time use
+a plain TTL.
+
+Results are stored as Parquet, with dynamic (list/dict) columns as JSON text
+so a cache hit returns the same values as a live query; the index (data/query_cache/index.db) tracks
+sizes and last access, and the least recently used entries are evicted once
+the cache grows past max_bytes.
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from .snapshots import PYARROW_AVAILABLE, pq, to_arrow
+
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent / "data" / "query_cache"
+INDEX_NAME = "index.db"
+CACHE_ENV = "PHEPY_QUERY_CACHE"
+
+MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL = 24 * 3600  # Queries with no relative time
+
+# (smallest ago() window at least, bucket seconds)
+TIME_BUCKETS = [
+    (30 * 86400, 86400),
+    (86400, 3600),
+    (3600, 300),
+    (0, 60),
+]
+NOW_BUCKET = 3600  # now() with no ago() window to size the bucket
+
+# Parquet schema metadata listing the columns stored as JSON text
+JSON_COLUMNS_KEY = b"phepy_json_columns"
+
+TIMESPAN_UNITS = {"d": 86400, "h": 3600, "m": 60, "s": 1, "ms": 0.001}
+TIMESPAN = r"(\d+(?:\.\d+)?)\s*(ms|d|h|m|s)?"  # No unit means days, as in time(180)
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    bucket INTEGER,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    query_name TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+"""
+
+_PUNCTUATION = set("|,;()[]{}=<>!+*/%:")
+
+
+def normalize_query(query):
+    """
+    KQL text with comments removed and whitespace collapsed
+    
+    String literals ('...', "...", @"...") are kept verbatim. Whitespace next
+    to punctuation is dropped, so "| where  A==1" and "|where A == 1" match.
+    """
+    out = []
+    i, n = 0, len(query)
+    pending_space = False
+    while i < n:
+        ch = query[i]
+        if ch in "'\"" or (ch == "@" and i + 1 < n and query[i + 1] in "'\""):
+            verbatim = ch == "@"
+            quote = query[i + 1] if verbatim else ch
+            j = i + (2 if verbatim else 1)
+            while j < n and query[j] != quote:
+                j += 2 if query[j] == "\\" and not verbatim else 1
+            token = query[i:j + 1]
+            i = j + 1
+        elif query.startswith("//", i):
+            end = query.find("\n", i)
+            i = n if end == -1 else end
+            pending_space = True
+            continue
+        elif ch.isspace():
+            pending_space = True
+            i += 1
+            continue
+        else:
+            token = ch
+            i += 1
+        
+        if pending_space and out and out[-1][-1] not in _PUNCTUATION and token[0] not in _PUNCTUATION:
+            out.append(" ")
+        pending_space = False
+        out.append(token)
+    return "".join(out).rstrip(";")
+
+
+def _seconds(timespan):
+    match = re.fullmatch(TIMESPAN, timespan.strip())
+    return float(match.group(1)) * TIMESPAN_UNITS[match.group(2) or "d"] if match else None
+
+
+def bucket_seconds(normalized):
+    """Freshness bucket for a normalised query, or None if it has no relative time"""
+    lets = {name: value for name, value in re.findall(r"\blet ?(\w+)=([^;]+);", normalized)}
+    windows = []
+    for argument in re.findall(r"\bago\(([^()]*)\)", normalized):
+        seconds = _seconds(argument)
+        if seconds is None and argument.strip() in lets:
+            seconds = _seconds(lets[argument.strip()])
+        windows.append(seconds)
+    
+    if not windows:
+        return NOW_BUCKET if re.search(r"\bnow\(\)", normalized) else None
+    known = [w for w in windows if w is not None]
+    if not known:
+        return NOW_BUCKET  # ago() of an expression we can't size
+    smallest = min(known)
+    return next(bucket for threshold, bucket in TIME_BUCKETS if smallest >= threshold)
+
+
+def _dynamic_to_json(df):
+    """
+    (DataFrame, column names) with dynamic columns (holding lists or dicts) as JSON text
+    
+    Left to Arrow, lists come back as numpy arrays and dicts as structs with
+    the keys of every row merged in.
+    """
+    columns = [column for column in df.columns[df.dtypes == object]
+               if df[column].map(lambda v: isinstance(v, (list, dict, tuple))).any()]
+    if columns:
+        df = df.copy()
+        for column in columns:
+            df[column] = df[column].map(lambda v: None if v is None or v is pd.NA else json.dumps(v, default=str))
+    return df, columns
+
+
+def _json_to_dynamic(df, columns):
+    """Decode the columns _dynamic_to_json stored as JSON text (in place)"""
+    for column in columns:
+        df[column] = pd.Series([json.loads(v) if isinstance(v, str) else None for v in df[column]],
+                               index=df.index, dtype=object)
+    return df
+
+
+def cache_key(query, cluster="", database=""):
+    """Cache key for a query: hash of its normalised text, cluster and database"""
+    text = "\0".join([cluster.rstrip("/").lower(), database, normalize_query(query)])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Query results on disk with TTL, stale-while-revalidate and LRU eviction
+    
+    lookup() tells fresh from stale entries; QueryExecutor(cache=...) serves
+    fresh ones directly and stale ones while refreshing them in the background.
+    """
+    
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=MAX_BYTES, default_ttl=DEFAULT_TTL, stale_factor=1.0):
+        """
+        Args:
+            max_bytes: Evict least recently used entries beyond this total size
+            default_ttl: Seconds a result of a query without relative time stays fresh
+            stale_factor: How long (as a multiple of the TTL or bucket) an expired
+                entry may still be served while it is refreshed
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("The query cache requires pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.stale_factor = stale_factor
+        self._refreshing = set()
+        self._threads = []
+        self._lock = threading.Lock()
+        with self._index() as conn:
+            conn.executescript(INDEX_SCHEMA)
+    
+    @contextmanager
+    def _index(self):
+        conn = sqlite3.connect(self.root / INDEX_NAME, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.parquet"
+    
+    def _lifetime(self, query, ttl, now):
+        """(bucket index or None, expires_at, fresh period) for a result fetched at now"""
+        if ttl is not None:
+            return None, now + ttl, ttl
+        bucket = bucket_seconds(normalize_query(query))
+        if bucket is None:
+            return None, now + self.default_ttl, self.default_ttl
+        index = int(now // bucket)
+        return index, (index + 1) * bucket, bucket  # Fresh until the bucket rolls over
+    
+    def lookup(self, query, cluster="", database=""):
+        """
+        Cached result for a query as (DataFrame, state), state being
+        "fresh" or "stale"; (None, None) when there is nothing usable
+        """
+        key = cache_key(query, cluster, database)
+        now = time.time()
+        with self._index() as conn:
+            row = conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or now >= row["stale_until"]:
+                return None, None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        try:
+            table = pq.read_table(self._path(key))
+        except OSError:
+            self.invalidate(query, cluster, database)  # File removed behind our back
+            return None, None
+        json_columns = json.loads((table.schema.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))
+        data = _json_to_dynamic(table.to_pandas(), json_columns)
+        return data, "fresh" if now < row["expires_at"] else "stale"
+    
+    def store(self, query, data, cluster="", database="", ttl=None, query_name=None):
+        """Cache a result (anything to_arrow() accepts); ttl overrides time bucketing"""
+        key = cache_key(query, cluster, database)
+        json_columns = []
+        if isinstance(data, pd.DataFrame):
+            data, json_columns = _dynamic_to_json(data)
+        table = to_arrow(data)
+        if json_columns:
+            metadata = {**(table.schema.metadata or {}), JSON_COLUMNS_KEY: json.dumps(json_columns).encode()}
+            table = table.replace_schema_metadata(metadata)
+        now = time.time()
+        bucket, expires_at, period = self._lifetime(query, ttl, now)
+        stale_until = expires_at + period * self.stale_factor
+        
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        temp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, temp_path, compression="zstd")
+        os.replace(temp_path, path)
+        
+        with self._index() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO entries
+                    (key, bucket, fetched_at, expires_at, stale_until, last_access, size_bytes, row_count, query_name)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, bucket, now, expires_at, stale_until, now, path.stat().st_size, table.num_rows, query_name))
+        self.evict()
+        return key
+    
+    def refresh(self, query, fetch, cluster="", database="", ttl=None, query_name=None):
+        """
+        Re-run fetch() in the background and store its result
+        
+        Only one refresh per entry runs at a time; a failed refresh leaves the
+        stale entry in place. The threads are not daemons, so a script waits
+        for its refreshes before exiting (see wait()).
+        """
+        key = cache_key(query, cluster, database)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        
+        def run():
+            try:
+                self.store(query, fetch(), cluster, database, ttl=ttl, query_name=query_name)
+            except Exception as e:
+                print(f"⚠️  Background refresh of {query_name or key[:12]} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        thread = threading.Thread(target=run, name=f"cache-refresh-{key[:8]}")
+        thread.start()
+        self._threads.append(thread)
+        return True
+    
+    def wait(self):
+        """Block until background refreshes have finished"""
+        while self._threads:
+            self._threads.pop().join()
+    
+    def invalidate(self, query, cluster="", database=""):
+        key = cache_key(query, cluster, database)
+        with self._index() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._path(key).unlink(missing_ok=True)
+    
+    def evict(self):
+        """Drop dead entries, then least recently used ones beyond max_bytes; returns how many"""
+        now = time.time()
+        with self._index() as conn:
+            rows = conn.execute("SELECT key, size_bytes, stale_until FROM entries ORDER BY last_access DESC").fetchall()
+            total = 0
+            doomed = []
+            for row in rows:
+                total += row["size_bytes"]
+                if row["stale_until"] <= now or total > self.max_bytes:
+                    doomed.append(row["key"])
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in doomed])
+        for key in doomed:
+            self._path(key).unlink(missing_ok=True)
+        return len(doomed)
+    
+    def clear(self):
+        with self._index() as conn:
+            keys = [row["key"] for row in conn.execute("SELECT key FROM entries")]
+            conn.execute("DELETE FROM entries")
+        for key in keys:
+            self._path(key).unlink(missing_ok=True)
+        return len(keys)
+    
+    def stats(self):
+        now = time.time()
+        with self._index() as conn:
+            row = conn.execute("""
+                SELECT COUNT(*) AS entries,
+                       COALESCE(SUM(size_bytes), 0) AS size_bytes,
+                       COALESCE(SUM(expires_at > ?), 0) AS fresh
+                FROM entries
+            """, (now,)).fetchone()
+        return {"entries": row["entries"], "fresh": row["fresh"], "stale": row["entries"] - row["fresh"],
+                "size_bytes": row["size_bytes"], "max_bytes": self.max_bytes}
+
+
+def default_cache():
+    """Shared ResultCache, or None when pyarrow is missing or $PHEPY_QUERY_CACHE is "off\""""
+    if not PYARROW_AVAILABLE or os.environ.get(CACHE_ENV, "").lower() in ("0", "off", "false", "no"):
+        return None
+    return ResultCache()
+
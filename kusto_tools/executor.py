@@ -0,0 +1,468 @@
+"""
+Concurrent Kusto query execution
+
+Queries run through a backend (anything with execute(query, cluster, database)):
+    
+    KustoBackend  - azure-kusto-data client (pip install azure-kusto-data azure-identity)
+    MCPBackend    - the kusto-mcp server from mcp.json, spoken to over stdio
+    LocalBackend  - offline stand-in answering from the snapshot store
+                    (DuckDB when installed, otherwise SQLite)
+
+QueryExecutor runs many queries at once on a bounded pool, limits how many
+run against each cluster at the same time and retries transient failures
+(throttling, timeouts, dropped connections) with jittered backoff:
+    
+    executor = QueryExecutor(get_backend("kusto"))
+    results = executor.execute_many([QueryRequest(team, kql) for team, kql in queries.items()])
+    results["DLP"].data  # DataFrame (or Arrow table with as_arrow=True)
+
+The backend name can also come from the PHEPY_QUERY_BACKEND environment
+variable (see default_backend()).
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pandas as pd
+
+from .snapshots import PYARROW_AVAILABLE, DEFAULT_ROOT, SnapshotStore, query_hash, to_arrow
+
+try:
+    from azure.kusto.data import KustoClient, KustoConnectionStringBuilder
+    from azure.kusto.data.helpers import dataframe_from_result_table
+    KUSTO_AVAILABLE = True
+except ImportError:
+    KustoClient = KustoConnectionStringBuilder = dataframe_from_result_table = None
+    KUSTO_AVAILABLE = False
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+DEFAULT_CLUSTER = "https://icmcluster.kusto.windows.net"
+DEFAULT_DATABASE = "IcMDataWarehouse"
+BACKEND_ENV = "PHEPY_QUERY_BACKEND"
+
+MAX_WORKERS = 8
+PER_CLUSTER = 4
+RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Error text that marks a failure worth retrying
+TRANSIENT_MARKERS = ("throttl", "timeout", "timed out", "429", "503", "temporarily", "too many requests",
+                     "connection reset", "connection aborted", "service unavailable")
+
+QueryRequest = namedtuple("QueryRequest", "name query cluster database ttl",
+                          defaults=(DEFAULT_CLUSTER, DEFAULT_DATABASE, None))
+QueryResult = namedtuple("QueryResult", "name data error attempts elapsed cached", defaults=(None,))
+
+
+class QueryError(Exception):
+    """A query failed; transient errors are retried by QueryExecutor"""
+    
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
+
+def is_transient(error):
+    """Whether a failed query is worth retrying"""
+    if isinstance(error, QueryError):
+        return error.transient
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if "Throttling" in type(error).__name__:
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in TRANSIENT_MARKERS)
+
+
+def _frame(data):
+    """DataFrame from whatever a backend produced (Arrow, records, Kusto/MCP JSON)"""
+    if isinstance(data, pd.DataFrame):
+        return data
+    if PYARROW_AVAILABLE:
+        return to_arrow(data).to_pandas()
+    if isinstance(data, dict):
+        data = data.get("data", data)
+    return pd.DataFrame(data)
+
+
+class KustoBackend:
+    """Queries a Kusto cluster with the azure-kusto-data SDK (one client per cluster)"""
+    
+    name = "kusto"
+    
+    def __init__(self, client=None, credential=None):
+        """
+        Args:
+            client: Existing KustoClient to use for every cluster (e.g. one an agent was given)
+            credential: azure-identity credential (default: DefaultAzureCredential)
+        """
+        if client is None and not KUSTO_AVAILABLE:
+            raise ImportError("KustoBackend requires azure-kusto-data (pip install azure-kusto-data azure-identity)")
+        self._client = client
+        self._credential = credential
+        self._clients = {}
+        self._lock = threading.Lock()
+    
+    def _client_for(self, cluster):
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if cluster not in self._clients:
+                if self._credential is None:
+                    from azure.identity import DefaultAzureCredential
+                    self._credential = DefaultAzureCredential()
+                kcsb = KustoConnectionStringBuilder.with_azure_token_credential(cluster, self._credential)
+                self._clients[cluster] = KustoClient(kcsb)
+            return self._clients[cluster]
+    
+    def execute(self, query, cluster=DEFAULT_CLUSTER, database=DEFAULT_DATABASE):
+        response = self._client_for(cluster).execute(database, query)
+        return dataframe_from_result_table(response.primary_results[0])
+    
+    def close(self):
+        for client in self._clients.values():
+            client.close()
+        self._clients.clear()
+
+
+class MCPBackend:
+    """
+    Queries through the kusto-mcp server (see mcp.json), over stdio JSON-RPC
+    
+    One server process is shared by all threads; requests are multiplexed by
+    JSON-RPC id, so concurrent queries don't wait on each other here.
+    """
+    
+    name = "mcp"
+    
+    def __init__(self, command=None, tool="execute_query", argument_names=None, timeout=600):
+        """
+        Args:
+            command: Server command line (default: npx @mcp-apps/kusto-mcp@latest)
+            tool: Name of the query tool exposed by the server
+            argument_names: Tool argument names for cluster/database/query, if the
+                server doesn't use {"clusterUrl", "database", "query"}
+            timeout: Seconds to wait for one query
+        """
+        self.command = command or ["npx", "-y", "@mcp-apps/kusto-mcp@latest"]
+        self.tool = tool
+        self.argument_names = {"cluster": "clusterUrl", "database": "database", "query": "query",
+                               **(argument_names or {})}
+        self.timeout = timeout
+        self._process = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+    
+    def _start(self):
+        # Held through the handshake so no query is sent before initialize completes
+        with self._start_lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            command = list(self.command)
+            command[0] = shutil.which(command[0]) or command[0]  # npx is npx.cmd on Windows
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, text=True, encoding="utf-8", bufsize=1)
+            threading.Thread(target=self._read_responses, args=(self._process,), daemon=True).start()
+            self._request("initialize", {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {},
+                "clientInfo": {"name": "phepy-kusto-tools", "version": "1.0"},
+            })
+            self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+    
+    def _send(self, message):
+        with self._lock:
+            self._process.stdin.write(json.dumps(message) + "\n")
+            self._process.stdin.flush()
+    
+    def _read_responses(self, process):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue  # Servers may log to stdout
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+        # Server exited: fail whatever is still waiting
+        for future in list(self._pending.values()):
+            future.set_exception(QueryError("kusto-mcp server exited", transient=True))
+        self._pending.clear()
+    
+    def _request(self, method, params):
+        request_id = next(self._ids)
+        future = self._pending[request_id] = Future()
+        self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        try:
+            message = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._pending.pop(request_id, None)
+            raise QueryError(f"kusto-mcp gave no answer within {self.timeout}s", transient=True)
+        if "error" in message:
+            raise QueryError(f"kusto-mcp: {message['error'].get('message', message['error'])}")
+        return message["result"]
+    
+    def execute(self, query, cluster=DEFAULT_CLUSTER, database=DEFAULT_DATABASE):
+        self._start()
+        names = self.argument_names
+        result = self._request("tools/call", {
+            "name": self.tool,
+            "arguments": {names["cluster"]: cluster, names["database"]: database, names["query"]: query},
+        })
+        text = "".join(part.get("text", "") for part in result.get("content", []) if part.get("type") == "text")
+        if result.get("isError"):
+            raise QueryError(text or "kusto-mcp query failed", transient=is_transient(Exception(text)))
+        try:
+            return json.loads(text)
+        except ValueError:
+            raise QueryError(f"kusto-mcp returned non-JSON output: {text[:200]}")
+    
+    def close(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process = None
+
+
+class LocalBackend:
+    """
+    Offline stand-in that answers from the snapshot store
+    
+    KQL is not evaluated: a KQL query is answered with the newest snapshot
+    recorded for the same query text (see QueryExecutor(record=...)). SQL
+    queries (SELECT/WITH) run against the newest snapshot of every query
+    name, each exposed as a table of that name.
+    """
+    
+    name = "local"
+    
+    def __init__(self, store=None):
+        self.store = store or SnapshotStore(DEFAULT_ROOT)
+    
+    def execute(self, query, cluster=DEFAULT_CLUSTER, database=DEFAULT_DATABASE):
+        if re.match(r"\s*(select|with)\b", query, re.IGNORECASE):
+            return self._run_sql(query)
+        
+        wanted = query_hash(query)
+        recorded = [e for e in self.store.snapshots() if e["query_hash"] == wanted]
+        if not recorded:
+            raise QueryError(f"No snapshot recorded for this query (hash {wanted})")
+        newest = max(recorded, key=lambda e: (e["snapshot_date"], e["created_at"], e["snapshot_id"]))
+        return self.store.read(newest["query_name"], latest=True, start=newest["snapshot_date"],
+                               end=newest["snapshot_date"], as_arrow=True)
+    
+    def _run_sql(self, sql):
+        # Only snapshots the statement mentions are loaded
+        names = {e["query_name"] for e in self.store.snapshots()}
+        tables = {n: self.store.read(n, latest=True, as_arrow=True) for n in names
+                  if re.search(rf"\b{re.escape(n)}\b", sql)}
+        if DUCKDB_AVAILABLE:
+            conn = duckdb.connect()
+            try:
+                for table_name, table in tables.items():
+                    conn.register(table_name, table)
+                return conn.execute(sql).fetch_arrow_table()
+            finally:
+                conn.close()
+        
+        conn = sqlite3.connect(":memory:")
+        try:
+            for table_name, table in tables.items():
+                table.to_pandas().to_sql(table_name, conn, index=False)
+            return pd.read_sql_query(sql, conn)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            raise QueryError(f"Local query failed: {e}")
+        finally:
+            conn.close()
+
+
+BACKENDS = {
+    "kusto": KustoBackend,
+    "mcp": MCPBackend,
+    "local": LocalBackend,
+}
+
+
+def get_backend(name, **options):
+    """Backend instance by name ('kusto', 'mcp' or 'local')"""
+    try:
+        backend_class = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown query backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return backend_class(**options)
+
+
+def default_backend(name=None):
+    """Backend named by name or $PHEPY_QUERY_BACKEND, or None if neither is set"""
+    name = name or os.environ.get(BACKEND_ENV)
+    return get_backend(name) if name else None
+
+
+class QueryExecutor:
+    """
+    Runs queries concurrently against a backend
+    
+    At most max_workers queries run at once, and at most per_cluster against
+    any one cluster (cluster_limits overrides that per cluster URL). Transient
+    failures are retried up to retries times, sleeping a random time up to
+    backoff_base * 2**attempt (capped at backoff_max) between attempts.
+    """
+    
+    def __init__(self, backend, max_workers=MAX_WORKERS, per_cluster=PER_CLUSTER, cluster_limits=None,
+                 retries=RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 as_arrow=False, record=None, cache=None):
+        """
+        Args:
+            backend: Backend instance (see get_backend())
+            as_arrow: Return Arrow tables instead of DataFrames
+            record: SnapshotStore to save every successful result to (under the
+                request name), so LocalBackend can replay it later
+            cache: ResultCache to answer repeated queries from; stale entries are
+                returned at once and refreshed in the background
+        """
+        self.backend = backend
+        self.max_workers = max_workers
+        self.per_cluster = per_cluster
+        self.cluster_limits = cluster_limits or {}
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.as_arrow = as_arrow
+        self.record = record
+        self.cache = cache
+    
+    def _result_data(self, request, data):
+        """Record and cache a fetched result, then convert it; a failure to record or cache only warns"""
+        try:
+            if self.record is not None:
+                self.record.write(request.name, data, query=request.query, source=f"{request.cluster}/{request.database}")
+            if self.cache is not None:
+                self.cache.store(request.query, data, request.cluster, request.database,
+                                 ttl=request.ttl, query_name=request.name)
+        except Exception as e:
+            print(f"⚠️  Could not record/cache {request.name}: {e}")
+        if self.as_arrow:
+            return to_arrow(data)
+        return _frame(data)
+    
+    def _cached(self, request):
+        """(data, state) from the cache, scheduling a refresh when the entry is stale"""
+        data, state = self.cache.lookup(request.query, request.cluster, request.database)
+        if state == "stale":
+            fetch = partial(self.backend.execute, request.query, request.cluster, request.database)
+            self.cache.refresh(request.query, fetch, request.cluster, request.database,
+                               ttl=request.ttl, query_name=request.name)
+        if data is not None and self.as_arrow:
+            data = to_arrow(data)
+        return data, state
+    
+    async def _run_one(self, request, pool, workers, clusters, on_result):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        if self.cache is not None:
+            data, state = await loop.run_in_executor(pool, self._cached, request)
+            if data is not None:
+                result = QueryResult(request.name, data, None, 0, time.perf_counter() - started, state)
+                if on_result is not None:
+                    on_result(result)
+                return result
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            # Cluster slot first, so a query waiting on a busy cluster doesn't hold a worker
+            async with clusters[request.cluster], workers:
+                try:
+                    data = await loop.run_in_executor(pool, self.backend.execute,
+                                                      request.query, request.cluster, request.database)
+                    error = None
+                    break
+                except Exception as e:
+                    error = e
+            if attempt > self.retries or not is_transient(error):
+                break
+            # Full jitter: spreads retries out instead of hitting a throttled cluster in lockstep
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))))
+        
+        # Recording, caching and conversion run once, outside the retries
+        if error is None:
+            try:
+                data = await loop.run_in_executor(pool, self._result_data, request, data)
+            except Exception as e:
+                error = e
+        if error is None:
+            result = QueryResult(request.name, data, None, attempt, time.perf_counter() - started)
+        else:
+            result = QueryResult(request.name, None, error, attempt, time.perf_counter() - started)
+        
+        if on_result is not None:
+            on_result(result)
+        return result
+    
+    async def run(self, requests, on_result=None):
+        """
+        Run requests concurrently; returns {name: QueryResult} in request order
+        
+        on_result(result) is called as each query finishes (or finally fails).
+        """
+        requests = [r if isinstance(r, QueryRequest) else QueryRequest(*r) for r in requests]
+        names = [r.name for r in requests]
+        if len(set(names)) != len(names):
+            raise ValueError("Query request names must be unique")
+        
+        workers = asyncio.Semaphore(self.max_workers)
+        clusters = {r.cluster: asyncio.Semaphore(self.cluster_limits.get(r.cluster, self.per_cluster))
+                    for r in requests}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kusto-query") as pool:
+            results = await asyncio.gather(*(self._run_one(r, pool, workers, clusters, on_result)
+                                             for r in requests))
+        return {result.name: result for result in results}
+    
+    def execute_many(self, requests, on_result=None):
+        """Blocking run(); safe to call whether or not an event loop is already running"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(requests, on_result))
+        # Inside a running loop (e.g. a notebook): run on a separate thread
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.run(requests, on_result)).result()
+    
+    def execute(self, query, cluster=DEFAULT_CLUSTER, database=DEFAULT_DATABASE, name="query", ttl=None):
+        """Run one query with retries; returns its data or raises the final error"""
+        result = self.execute_many([QueryRequest(name, query, cluster, database, ttl)])[name]
+        if result.error is not None:
+            raise result.error
+        return result.data
+
+
+def print_progress(result):
+    """on_result callback printing one line per finished query"""
+    if result.cached:
+        note = "cached" if result.cached == "fresh" else "cached, refreshing in background"
+        print(f"  ✓ {result.name}: {len(result.data)} rows ({note})")
+    elif result.error is None:
+        print(f"  ✓ {result.name}: {len(result.data)} rows ({result.elapsed:.1f}s)")
+    else:
+        print(f"  ✗ {result.name}: {result.error} (after {result.attempts} attempt(s))")
@@ -0,0 +1,477 @@
+"""
+Local snapshot store for Kusto query results
+
+Results are written once as typed, zstd-compressed Parquet, partitioned by
+query name and date:
+    
+    data/snapshots/<query_name>/date=YYYY-MM-DD/<snapshot_id>.parquet
+
+Every snapshot is recorded in a SQLite catalog (data/snapshots/catalog.db),
+so readers find the files for a query and date range without listing
+directories. Reads load only the requested columns and push filters down to
+Parquet row groups instead of re-parsing JSON/CSV exports.
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    PYARROW_AVAILABLE = False
+
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent / "data" / "snapshots"
+CATALOG_NAME = "catalog.db"
+COMPRESSION = "zstd"
+
+# Row groups small enough for filters to skip most of a large snapshot
+ROW_GROUP_SIZE = 64 * 1024
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id TEXT PRIMARY KEY,
+    query_name TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    path TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    query_hash TEXT,
+    source TEXT,
+    metadata TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_snapshots_query_date ON snapshots(query_name, snapshot_date);
+"""
+
+# Kusto column types (as reported in query responses) and how they are stored
+KUSTO_TYPES = {
+    "string": "string",
+    "guid": "string",
+    "timespan": "string",
+    "dynamic": "json",
+    "long": "int64",
+    "int": "int32",
+    "real": "float64",
+    "double": "float64",
+    "decimal": "float64",
+    "bool": "bool",
+    "boolean": "bool",
+    "datetime": "datetime",
+    "date": "datetime",
+}
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ImportError("The snapshot store requires pyarrow (pip install pyarrow)")
+
+
+def query_hash(query):
+    """Short stable hash of KQL text, recorded with each snapshot"""
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def _kusto_table(data):
+    """
+    Columns ({name: kusto type}) and rows from a Kusto response, or None
+    
+    Understands the REST v1 shape ({"Tables": [{"Columns", "Rows"}]}) and the
+    {"columns": [{"name", "type"}], "rows": [...]} shape the MCP tool returns.
+    """
+    if not isinstance(data, dict):
+        return None
+    if "Tables" in data and data["Tables"]:
+        table = data["Tables"][0]
+        columns = {c["ColumnName"]: c.get("ColumnType") or c.get("DataType", "string") for c in table["Columns"]}
+        return columns, table["Rows"]
+    if "columns" in data and "rows" in data:
+        columns = {}
+        for c in data["columns"]:
+            if isinstance(c, dict):
+                columns[c.get("name") or c.get("ColumnName")] = c.get("type") or c.get("ColumnType") or "string"
+            else:
+                columns[c] = "string"
+        return columns, data["rows"]
+    return None
+
+
+def _coerce(df, types):
+    """Apply Kusto column types to a DataFrame (unknown types are left as parsed)"""
+    for column, kusto_type in types.items():
+        if column not in df.columns:
+            continue
+        kind = KUSTO_TYPES.get(str(kusto_type).lower())
+        values = df[column]
+        if kind == "datetime":
+            df[column] = pd.to_datetime(values, utc=True, errors="coerce", format="ISO8601")
+        elif kind in ("int64", "int32"):
+            df[column] = pd.to_numeric(values, errors="coerce").astype("Int64" if kind == "int64" else "Int32")
+        elif kind == "float64":
+            df[column] = pd.to_numeric(values, errors="coerce").astype("float64")
+        elif kind == "bool":
+            df[column] = values.map(lambda v: v if v is None or isinstance(v, bool) else str(v).lower() == "true").astype("boolean")
+        elif kind == "json":
+            df[column] = values.map(lambda v: v if v is None or isinstance(v, str) else json.dumps(v, default=str))
+        elif kind == "string":
+            df[column] = values.map(lambda v: v if v is None or isinstance(v, str) else str(v)).astype("string")
+    return df
+
+
+def to_arrow(data, types=None):
+    """
+    Arrow table from Kusto results in any of the shapes the tree passes around
+    
+    Accepts a DataFrame, an Arrow table, a list of records, a Kusto response
+    dict (typed columns are honoured) or an MCP wrapper ({"data": [...]}).
+    types ({column: kusto type}) overrides the inferred type of columns, e.g.
+    {"CreatedDate": "datetime"} for timestamps exported as strings.
+    """
+    _require_pyarrow()
+    if isinstance(data, pa.Table):
+        if not types:
+            return data
+        data = data.to_pandas()
+    
+    kusto = _kusto_table(data)
+    if kusto is not None:
+        columns, rows = kusto
+        df = pd.DataFrame(rows, columns=list(columns))
+        types = {**columns, **(types or {})}
+    elif isinstance(data, pd.DataFrame):
+        df = data.copy() if types else data
+    elif isinstance(data, dict):
+        df = pd.DataFrame(data.get("data", data))  # Wrapped or column-oriented JSON
+    else:
+        df = pd.DataFrame(list(data))
+    
+    if types:
+        df = _coerce(df, types)
+    # Object columns Arrow can't type (dynamic values, mixed types) are kept as text
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].map(lambda v: v if v is None or isinstance(v, str) else json.dumps(v, default=str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _filters_for(filters, available):
+    """
+    filters limited to what a snapshot with these columns can match
+    
+    A condition on a missing column is never true (the rows would hold null),
+    so OR-ed groups using one are dropped; False when no group is left, i.e.
+    the snapshot has no matching rows at all.
+    """
+    if not filters or not isinstance(filters, list):
+        return filters  # None, or a pyarrow expression
+    groups = [filters] if isinstance(filters[0][0], str) else filters
+    kept = [group for group in groups if all(column in available for column, _, _ in group)]
+    if len(kept) == len(groups):
+        return filters
+    return kept or False
+
+
+def _concat(tables):
+    """
+    Concatenate snapshots whose column types may differ from day to day
+    
+    Types are widened where Arrow can (int64 and double become double, e.g.
+    Severity on a day with a missing value); columns that still disagree
+    (a number one day, text the next) are read as text.
+    """
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        pass
+    
+    fields = {}
+    for table in tables:
+        for field in table.schema:
+            fields.setdefault(field.name, []).append(field)
+    as_text = set()
+    for name, same_name in fields.items():
+        try:
+            pa.unify_schemas([pa.schema([field]) for field in same_name], promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            as_text.add(name)
+    
+    def text_columns(table):
+        for i, field in enumerate(table.schema):
+            if field.name in as_text and field.type != pa.string():
+                table = table.set_column(i, pa.field(field.name, pa.string()), table.column(i).cast(pa.string()))
+        return table
+    
+    return pa.concat_tables([text_columns(table) for table in tables], promote_options="permissive")
+
+
+def load_file(path):
+    """Parse a JSON/JSONL/CSV export into something to_arrow() accepts"""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return pd.read_csv(path)
+    if suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    if suffix == ".parquet":
+        return pq.read_table(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SnapshotStore:
+    """
+    Parquet snapshots of Kusto results with a SQLite catalog
+    
+    write() stores one result set per call; read() returns the rows of every
+    snapshot of a query in a date range (or only the newest one).
+    """
+    
+    def __init__(self, root=DEFAULT_ROOT):
+        _require_pyarrow()
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._catalog() as conn:
+            conn.executescript(CATALOG_SCHEMA)
+    
+    @contextmanager
+    def _catalog(self):
+        conn = sqlite3.connect(self.root / CATALOG_NAME, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def write(self, query_name, data, snapshot_date=None, types=None, query=None, source=None, metadata=None):
+        """
+        Store a result set as a new snapshot; returns its catalog entry
+        
+        Args:
+            query_name: Logical query the rows came from (e.g. "icm", "lqe_14day")
+            data: Rows in any shape to_arrow() accepts
+            snapshot_date: Partition date (default: today, UTC)
+            types: {column: kusto type} overrides, e.g. {"CreatedDate": "datetime"}
+            query: KQL text, hashed into the catalog to tell query versions apart
+            source: Where the rows came from (file, cluster), for the catalog
+            metadata: Extra JSON-serialisable details to keep with the snapshot
+        """
+        if not query_name or "/" in query_name or "\\" in query_name:
+            raise ValueError(f"Invalid query name: {query_name!r}")
+        table = to_arrow(data, types)
+        created = datetime.now(timezone.utc)
+        day = _as_date(snapshot_date) if snapshot_date is not None else created.date()
+        snapshot_id = f"{created:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        
+        relative = Path(query_name) / f"date={day.isoformat()}" / f"{snapshot_id}.parquet"
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        pq.write_table(table, temp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+        temp_path.replace(path)
+        
+        entry = {
+            "snapshot_id": snapshot_id,
+            "query_name": query_name,
+            "snapshot_date": day.isoformat(),
+            "created_at": created.isoformat(timespec="seconds"),
+            "path": relative.as_posix(),
+            "row_count": table.num_rows,
+            "size_bytes": path.stat().st_size,
+            "columns": json.dumps([[field.name, str(field.type)] for field in table.schema]),
+            "query_hash": query_hash(query) if query else None,
+            "source": source,
+            "metadata": json.dumps(metadata, default=str) if metadata else None,
+        }
+        with self._catalog() as conn:
+            conn.execute(f"""
+                INSERT INTO snapshots ({", ".join(entry)})
+                VALUES ({", ".join("?" * len(entry))})
+            """, tuple(entry.values()))
+        return _entry(entry)
+    
+    def import_file(self, query_name, path, snapshot_date=None, types=None):
+        """Snapshot an existing JSON/JSONL/CSV export"""
+        return self.write(query_name, load_file(path), snapshot_date=snapshot_date, types=types,
+                          source=str(Path(path).resolve()))
+    
+    def snapshots(self, query_name=None, start=None, end=None):
+        """Catalog entries (oldest first), optionally for one query and an inclusive date range"""
+        clauses, params = [], []
+        if query_name is not None:
+            clauses.append("query_name = ?")
+            params.append(query_name)
+        if start is not None:
+            clauses.append("snapshot_date >= ?")
+            params.append(_as_date(start).isoformat())
+        if end is not None:
+            clauses.append("snapshot_date <= ?")
+            params.append(_as_date(end).isoformat())
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._catalog() as conn:
+            rows = conn.execute(f"""
+                SELECT * FROM snapshots {where}
+                ORDER BY query_name, snapshot_date, created_at, snapshot_id
+            """, params).fetchall()
+        return [_entry(row) for row in rows]
+    
+    def latest(self, query_name):
+        """Newest catalog entry for a query, or None"""
+        entries = self.snapshots(query_name)
+        return entries[-1] if entries else None
+    
+    def read(self, query_name, columns=None, filters=None, start=None, end=None, latest=False,
+             with_snapshot_date=False, as_arrow=False):
+        """
+        Rows of a query's snapshots as one DataFrame (or Arrow table)
+        
+        Args:
+            columns: Only these columns are read from disk
+            filters: Row filters pushed down to the Parquet reader, in pyarrow's
+                form: [("IcmStatus", "in", ["ACTIVE", "MITIGATED"]), ("Severity", "<=", 2)]
+                (a list of such lists is OR-ed); snapshots older than a
+                filtered column match no rows through that condition
+            start, end: Inclusive snapshot date range
+            latest: Read only the newest snapshot in the range
+            with_snapshot_date: Add a snapshot_date column saying which day each row came from
+        """
+        entries = self.snapshots(query_name, start, end)
+        if latest:
+            entries = entries[-1:]
+        tables = []
+        for entry in entries:
+            path = self.root / entry["path"]
+            wanted = None
+            snapshot_filters = filters
+            if columns is not None or filters:
+                available = set(pq.read_schema(path).names)
+                if columns is not None:
+                    wanted = [c for c in columns if c in available]  # Older snapshots may lack new columns
+                snapshot_filters = _filters_for(filters, available)
+                if snapshot_filters is False:
+                    continue
+            table = pq.read_table(path, columns=wanted, filters=snapshot_filters)
+            if with_snapshot_date:
+                table = table.append_column("snapshot_date", pa.array([entry["snapshot_date"]] * table.num_rows, pa.string()))
+            tables.append(table)
+        
+        if tables:
+            table = _concat(tables)
+        else:
+            table = pa.table({c: pa.array([], pa.string()) for c in (columns or [])})
+        return table if as_arrow else table.to_pandas()
+    
+    def prune(self, query_name=None, keep_days=None, keep_last=None):
+        """
+        Delete old snapshots; returns how many were removed
+        
+        keep_days keeps snapshots dated within the last N days; keep_last keeps
+        the newest N snapshots of each query. A snapshot is kept if either applies.
+        """
+        if keep_days is None and keep_last is None:
+            raise ValueError("Specify keep_days and/or keep_last")
+        today = datetime.now(timezone.utc).date()
+        by_query = {}
+        for entry in self.snapshots(query_name):
+            by_query.setdefault(entry["query_name"], []).append(entry)
+        
+        doomed = []
+        for entries in by_query.values():
+            newest = {e["snapshot_id"] for e in entries[-keep_last:]} if keep_last else set()
+            for entry in entries:
+                recent = keep_days is not None and (today - _as_date(entry["snapshot_date"])).days < keep_days
+                if entry["snapshot_id"] not in newest and not recent:
+                    doomed.append(entry)
+        
+        with self._catalog() as conn:
+            for entry in doomed:
+                (self.root / entry["path"]).unlink(missing_ok=True)
+                conn.execute("DELETE FROM snapshots WHERE snapshot_id = ?", (entry["snapshot_id"],))
+        return len(doomed)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _entry(row):
+    entry = dict(row)
+    entry["columns"] = json.loads(entry["columns"])
+    entry["metadata"] = json.loads(entry["metadata"]) if entry["metadata"] else None
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kusto result snapshots (Parquet + catalog)")
+    parser.add_argument("--root", default=str(DEFAULT_ROOT), help="Snapshot directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    p = subparsers.add_parser("list", help="List snapshots")
+    p.add_argument("query_name", nargs="?")
+    
+    p = subparsers.add_parser("import", help="Snapshot a JSON/JSONL/CSV export")
+    p.add_argument("query_name")
+    p.add_argument("file")
+    p.add_argument("--date", help="Snapshot date (YYYY-MM-DD, default today)")
+    p.add_argument("--type", action="append", default=[], metavar="COLUMN=KUSTOTYPE",
+                   help="Column type override, e.g. CreatedDate=datetime (repeatable)")
+    
+    p = subparsers.add_parser("show", help="Print rows of a query's snapshots")
+    p.add_argument("query_name")
+    p.add_argument("--columns", help="Comma-separated columns to read")
+    p.add_argument("--start")
+    p.add_argument("--end")
+    p.add_argument("--latest", action="store_true", help="Only the newest snapshot")
+    p.add_argument("--limit", type=int, default=20)
+    
+    p = subparsers.add_parser("prune", help="Delete old snapshots")
+    p.add_argument("query_name", nargs="?")
+    p.add_argument("--keep-days", type=int)
+    p.add_argument("--keep-last", type=int)
+    
+    args = parser.parse_args()
+    store = SnapshotStore(args.root)
+    
+    if args.command == "list":
+        for entry in store.snapshots(args.query_name):
+            print(f"{entry['query_name']:<24} {entry['snapshot_date']}  {entry['snapshot_id']}  "
+                  f"{entry['row_count']:>8} rows  {entry['size_bytes'] / 1024:>8.1f} KB")
+    elif args.command == "import":
+        types = dict(t.split("=", 1) for t in args.type)
+        entry = store.import_file(args.query_name, args.file, snapshot_date=args.date, types=types or None)
+        print(f"✓ {entry['row_count']} rows → {entry['path']}")
+    elif args.command == "show":
+        columns = args.columns.split(",") if args.columns else None
+        df = store.read(args.query_name, columns=columns, start=args.start, end=args.end, latest=args.latest)
+        print(df.head(args.limit).to_string())
+        print(f"\n{len(df)} rows")
+    elif args.command == "prune":
+        removed = store.prune(args.query_name, keep_days=args.keep_days, keep_last=args.keep_last)
+        print(f"✓ Removed {removed} snapshot(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
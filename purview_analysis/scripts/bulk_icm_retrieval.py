@@ -5,16 +5,22 @@ Author: PHEPy Agent
 Date: 2026-02-04
 """
 
+import argparse
 import json
-import time
-import requests
+import os
+import sys
 from pathlib import Path
 from typing import Dict, List, Set
 from datetime import datetime
 from collections import defaultdict
 
-# ICM MCP HTTP endpoint
-ICM_API_URL = "https://icm-mcp-prod.azure-api.net/v1/"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from icm_tools import ICMFetcher, get_backend, progress_printer
+from text_tools import KeywordClassifier
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+ICM_IDS_FILE = DATA_DIR / "sensitivity_labels_icm_ids_90days.txt"
+CHECKPOINT_FILE = DATA_DIR / "sensitivity_labels_icm_details.jsonl"
 
 # TSG Gap Detection Keywords (from previous analyzer)
 TSG_GAP_INDICATORS = {
@@ -40,6 +46,8 @@ TSG_GAP_INDICATORS = {
     ]
 }
 
+GAP_CLASSIFIER = KeywordClassifier({"gaps": TSG_GAP_INDICATORS})
+
 # Purview Product Areas
 PURVIEW_PRODUCTS = [
     "Sensitivity Labels", "Classification", "Auto-labeling", "Encryption",
@@ -56,63 +64,26 @@ class ICMBulkRetriever:
         self.retrieved_icms = []
         self.failed_icms = []
         self.tsg_gaps = defaultdict(list)
-        
-    def retrieve_icm_details(self, icm_id: int) -> Dict:
-        """Retrieve full details for a single ICM"""
-        # Note: This would call the ICM MCP endpoint
-        # For now, we'll return a placeholder structure
-        # In production, this would make the actual API call
-        return {
-            "id": icm_id,
-            "retrieved": False,
-            "error": "Placeholder - needs actual MCP call"
-        }
     
     def analyze_for_tsg_gaps(self, icm: Dict) -> List[str]:
         """Analyze ICM for TSG gap indicators"""
-        gaps_found = []
-        
-        title = icm.get("title", "").lower()
-        summary = icm.get("summary", "").lower()
-        combined_text = f"{title} {summary}"
-        
-        # Check each gap category
-        for category, keywords in TSG_GAP_INDICATORS.items():
-            for keyword in keywords:
-                if keyword in combined_text:
-                    gaps_found.append(category)
-                    break  # Only count category once
-        
-        return gaps_found
+        combined_text = f"{icm.get('title', '')} {icm.get('summary', '')}"
+        return GAP_CLASSIFIER.classify(combined_text)["gaps"]
     
-    def process_batch(self, batch_size: int = 50):
-        """Process ICMs in batches"""
-        total = len(self.icm_ids)
+    def retrieve_all(self, fetcher: ICMFetcher):
+        """Fetch every ICM concurrently and analyze each one for TSG gaps"""
+        results = fetcher.fetch_all(self.icm_ids, on_result=progress_printer(len(self.icm_ids), every=50))
         
-        for i in range(0, total, batch_size):
-            batch = self.icm_ids[i:i+batch_size]
-            print(f"Processing batch {i//batch_size + 1} ({i+1}-{min(i+batch_size, total)} of {total})")
-            
-            for icm_id in batch:
-                try:
-                    details = self.retrieve_icm_details(icm_id)
-                    if details.get("retrieved"):
-                        self.retrieved_icms.append(details)
-                        
-                        # Analyze for TSG gaps
-                        gaps = self.analyze_for_tsg_gaps(details)
-                        if gaps:
-                            self.tsg_gaps[icm_id] = gaps
-                    else:
-                        self.failed_icms.append(icm_id)
-                except Exception as e:
-                    print(f"  Error retrieving ICM {icm_id}: {e}")
-                    self.failed_icms.append(icm_id)
+        for icm_id, result in results.items():
+            if result.error is None:
+                self.retrieved_icms.append(result.data)
                 
-                # Rate limiting - pause between requests
-                time.sleep(0.1)
-            
-            print(f"  Batch complete. Retrieved: {len(self.retrieved_icms)}, Failed: {len(self.failed_icms)}")
+                # Analyze for TSG gaps
+                gaps = self.analyze_for_tsg_gaps(result.data)
+                if gaps:
+                    self.tsg_gaps[icm_id] = gaps
+            else:
+                self.failed_icms.append(icm_id)
     
     def generate_gap_report(self) -> str:
         """Generate TSG gap analysis report"""
@@ -175,29 +146,46 @@ class ICMBulkRetriever:
         print(f"\nResults saved to {output_dir}")
 
 
+def load_icm_ids(path: Path) -> List[int]:
+    """ICM IDs from the first column of a Kusto export (lines starting with # are skipped)"""
+    icm_ids = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            first = line.split("\t", 1)[0].strip()
+            if first.isdigit():
+                icm_ids.append(int(first))
+    return icm_ids
+
+
 def main():
     """Main execution"""
+    parser = argparse.ArgumentParser(description="Bulk retrieve ICM details and analyze them for TSG gaps")
+    parser.add_argument("--ids-file", type=Path, default=ICM_IDS_FILE, help="ICM IDs, one per line (first column)")
+    parser.add_argument("--backend", choices=["http", "file"], default="http",
+                        help="http: ICM MCP endpoint ($ICM_MCP_TOKEN); file: saved details (--source)")
+    parser.add_argument("--source", help="Saved details for --backend file (folder, JSON or JSONL)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests per second")
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_FILE,
+                        help="JSONL file details are saved to as they arrive; reruns resume from it")
+    args = parser.parse_args()
+    if args.backend == "file" and not args.source:
+        parser.error("--backend file needs --source")
+    
     print("="*80)
     print("Purview Sensitivity Labels - ICM Bulk Retrieval & TSG Gap Analysis")
     print("="*80)
     
-    # This will be populated from Kusto query results
-    # For now, using placeholder - will be updated with actual ICM IDs
-    icm_ids = [
-        21000000887894, 21000000887192, 21000000887231, 51000000886131,
-        21000000886974, 51000000885589, 21000000884499, 21000000884661,
-        51000000883429, 51000000883110
-        # ... remaining 610 ICMs from Kusto query
-    ]
+    icm_ids = load_icm_ids(args.ids_file)
     
     print(f"\nTotal ICMs to retrieve: {len(icm_ids)}")
     print(f"Starting bulk retrieval...\n")
     
-    # Initialize retriever
-    retriever = ICMBulkRetriever(icm_ids)
+    backend = get_backend("file", source=args.source) if args.backend == "file" else get_backend("http")
+    fetcher = ICMFetcher(backend, concurrency=args.concurrency, rate=args.rate, checkpoint=args.checkpoint)
     
-    # Process in batches
-    retriever.process_batch(batch_size=50)
+    retriever = ICMBulkRetriever(icm_ids)
+    retriever.retrieve_all(fetcher)
     
     # Generate and save report
     output_dir = Path(__file__).parent.parent / "reports"
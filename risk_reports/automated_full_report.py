@@ -50,7 +50,8 @@ def execute_complete_workflow():
         os.path.join(os.path.dirname(__file__), "ic_mcs_risk_report_generator.py"),
         csv_file,
         output_file,
-        icm_file
+        icm_file,
+        "--incremental"  # Only re-render customers whose cases/ICMs changed
     ], capture_output=True, text=True)
     
     if result.returncode == 0:
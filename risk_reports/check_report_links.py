@@ -0,0 +1,67 @@
+"""
+Check that the risk report renders ICM and bug links as HTML
+
+Builds a two-case report from sample data in a temp folder and fails if the
+ICM or bug cells come out as escaped text (&lt;a href=...) instead of links,
+e.g. after a pandas upgrade changes what Series.map returns.
+
+Usage: python check_report_links.py
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from ic_mcs_risk_report_generator import generate_risk_report_html
+
+
+def check_report_links():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        pd.DataFrame({
+            'CaseUrl': ['https://example.com/case/1', 'https://example.com/case/2'],
+            'ServiceRequestNumber': [1001, 1002],
+            'TopParentName': ['Contoso', 'Fabrikam'],
+            'ServiceRequestStatus': ['Open', 'Open'],
+            'DaysOpen': [12, 30],
+            'AgentAlias': ['alias1', 'alias2'],
+            'ManagerEmail': ['mgr1@example.com', 'mgr2@example.com'],
+            'RiskScore': [85, 45],
+            'RiskLevel': ['Critical', 'Medium'],
+            'Summary': ['Labels not applied', 'DLP <policy> tip missing'],
+            'RelatedICM_Id': ['693849812', '693543577; 693849812'],
+            'Program': ['IC', 'MCS'],
+            'PHE': ['phe1', 'phe2'],
+            'CLE': ['cle1', 'cle2'],
+        }).to_csv(tmp / 'cases.csv', index=False)
+        pd.DataFrame({
+            'IncidentId': [693849812],
+            'IcmOwner': ['owner1'],
+            'IcmSeverity': [3],
+            'IcmStatus': ['ACTIVE'],
+            'BugExternalIds': ['4242'],
+            'BugDescriptions': ['Label fix'],
+            'BugStatuses': ['Active'],
+        }).to_csv(tmp / 'icm.csv', index=False)
+        
+        report = tmp / 'report.htm'
+        generate_risk_report_html(str(tmp / 'cases.csv'), str(tmp / 'icm.csv'), str(report))
+        html = report.read_text(encoding='utf-8')
+    
+    checks = {
+        'ICM link': '>693849812 (ACTIVE)</a>' in html and '<a href=' in html,
+        'Bug link': '>4242</a> (Active)' in html,
+        'No escaped links': '&lt;a href' not in html,
+        'Summary still escaped': 'DLP &lt;policy&gt; tip' in html,
+    }
+    print('\nReport link checks:')
+    for name, passed in checks.items():
+        print(f"  {'✓' if passed else '✗'} {name}")
+    return all(checks.values())
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check_report_links() else 1)
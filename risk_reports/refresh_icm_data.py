@@ -4,6 +4,13 @@ Run after executing GET_ALL_135_ICMS.kql and saving results to data/icm_fresh.cs
 """
 import pandas as pd
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+try:
+    from kusto_tools import PYARROW_AVAILABLE, SnapshotStore
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 print("=" * 70)
 print("ICM DATA REFRESH")
@@ -28,6 +35,13 @@ try:
     icm_fresh.to_csv('data/icm.csv', index=False)
     print(f"✓ Saved to data/icm.csv")
     
+    if PYARROW_AVAILABLE:
+        # Explicit types, so a day with a blank Severity doesn't store it as double
+        entry = SnapshotStore().write('icm', icm_fresh, source='data/icm_fresh.csv',
+                                      types={'IncidentId': 'long', 'IcmSeverity': 'int',
+                                             'IcmOwner': 'string', 'IcmStatus': 'string'})
+        print(f"✓ Snapshot saved: {entry['path']}")
+    
     print(f"\nStatus breakdown:")
     print(icm_fresh['IcmStatus'].value_counts())
     
@@ -47,7 +47,8 @@ def main():
             'scripts/ic_mcs_risk_report_generator.py',
             str(csv_file),
             'IC_Report_Final.htm',
-            'data/icm.csv'
+            'data/icm.csv',
+            '--incremental'  # Only re-render customers whose cases/ICMs changed
         ], capture_output=True, text=True)
         
         print(result.stdout)
@@ -47,7 +47,8 @@ def main():
             'ic_mcs_risk_report_generator.py',
             str(csv_file),
             'MCS_Report_Final.htm',
-            'data/icm.csv'
+            'data/icm.csv',
+            '--incremental'  # Only re-render customers whose cases/ICMs changed
         ], capture_output=True, text=True)
         
         print(result.stdout)
@@ -2,8 +2,17 @@
 Extract ICM IDs from fresh case data and save case data and ICM list for querying
 """
 import json
+import sys
+from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+try:
+    from kusto_tools import PYARROW_AVAILABLE, SnapshotStore
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Read the Kusto result from the MCP tool (we'll pass this as argument)
 def extract_icm_ids(cases_data):
     """Extract unique ICM IDs from case data"""
@@ -31,6 +40,12 @@ def save_case_data(cases_data, output_file):
     df_unique.to_csv(output_file, index=False)
     print(f"Saved {len(df_unique)} unique cases to {output_file}")
     
+    # Keep a typed Parquet snapshot too, so trend analysis can read history quickly
+    if PYARROW_AVAILABLE:
+        entry = SnapshotStore().write('ic_mcs_cases', df_unique, source=str(output_file),
+                                      types={'CreatedTime': 'datetime', 'ModifiedDate': 'datetime'})
+        print(f"Snapshot saved: {entry['path']}")
+    
     return df_unique
 
 # This will be called with the data from Kusto
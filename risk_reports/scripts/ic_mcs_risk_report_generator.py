@@ -3,13 +3,236 @@
 # Author: Jacques (Kusto Expert)
 # Date: February 4, 2026
 
+import numpy as np
 import pandas as pd
+from collections import namedtuple
 from datetime import datetime
 import sys
 import json
 import os
+from pathlib import Path
 
-def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_html="IC_MCS_Risk_Report.htm"):
+from report_renderer import FragmentCache, Markup, escape, render_to_file, template_macros
+
+REPORT_TEMPLATE = 'ic_mcs_risk_report.html.j2'
+SECTIONS_TEMPLATE = 'ic_mcs_risk_report_sections.html.j2'
+ICM_URL_TEMPLATE = "https://portal.microsofticm.com/imp/v5/incidents/details/{icm_id}/home"
+BUG_URL_TEMPLATE = "https://o365exchange.visualstudio.com/IP%20Engineering/_workitems/edit/{bug_id}"
+
+# ICM status precedence for the owner/status shown per case (lower wins)
+ICM_STATUS_RANK = {'ACTIVE': 0, 'MITIGATED': 1}
+FIRST_ICM_RANK = 2
+
+# Row shape the report template receives; rows are built ROW_BATCH at a time as it consumes a table
+CaseRow = namedtuple('CaseRow', ['url', 'number', 'customer', 'status', 'days_open', 'owner', 'manager',
+                                 'risk_score', 'risk_class', 'summary', 'bugs', 'icms', 'icm_owner', 'unassigned'])
+ROW_BATCH = 5000
+
+
+def resolve_icm_columns(df, icm_df):
+    """
+    Derive IcmOwner, IcmStatus, BugInfo and BugInfoLinked for every case in one pass
+    
+    RelatedICM_Id (comma or semicolon separated) is exploded to one row per ICM
+    and joined to icm_df on IncidentId. Owner/status come from the case's first
+    ACTIVE ICM, else its first MITIGATED ICM, else its first listed ICM. Bugs
+    are collected across all of the case's ICMs, de-duplicated in order.
+    
+    Returns a DataFrame aligned row-for-row with df (NaN where nothing matched).
+    """
+    result = pd.DataFrame(index=pd.RangeIndex(len(df)), columns=['IcmOwner', 'IcmStatus', 'BugInfo', 'BugInfoLinked'], dtype=object)
+    
+    # One row per (case, ICM ID), in the order the IDs are listed
+    related = pd.Series(df['RelatedICM_Id'].to_numpy(), index=result.index).dropna()
+    tokens = related.astype(str).str.replace(',', ';').str.split(';').explode().str.strip()
+    tokens = tokens[tokens.notna() & (tokens != '')]
+    if tokens.empty:
+        return result
+    links = pd.DataFrame({
+        'case': tokens.index,
+        'position': tokens.groupby(level=0).cumcount().to_numpy(),
+        'IncidentId': pd.to_numeric(tokens.where(tokens.str.isdecimal()), errors='coerce').astype('Int64').to_numpy(),
+    })
+    
+    has_bugs = 'BugExternalIds' in icm_df.columns
+    icm_columns = ['IcmOwner', 'IcmStatus'] + (['BugExternalIds', 'BugStatuses'] if has_bugs else [])
+    icms = icm_df[['IncidentId'] + icm_columns].copy()
+    icms['IncidentId'] = pd.to_numeric(icms['IncidentId'], errors='coerce').astype('Int64')
+    icms = icms.dropna(subset=['IncidentId']).drop_duplicates('IncidentId', keep='last')
+    matched = links.merge(icms[['IncidentId', 'IcmOwner', 'IcmStatus']], on='IncidentId', how='inner')
+    if matched.empty:
+        return result
+    
+    # Owner/status: ACTIVE > MITIGATED > first listed ICM (ties go to the earlier ID)
+    matched['rank'] = matched['IcmStatus'].map(ICM_STATUS_RANK)
+    matched.loc[matched['rank'].isna() & (matched['position'] == 0), 'rank'] = FIRST_ICM_RANK
+    picked = (matched.dropna(subset=['rank'])
+              .sort_values(['case', 'rank', 'position'])
+              .drop_duplicates('case')
+              .set_index('case'))
+    result['IcmOwner'] = picked['IcmOwner']
+    result['IcmStatus'] = picked['IcmStatus']
+    
+    if not has_bugs:
+        return result
+    
+    # Bugs belong to ICMs: split each ICM's bug list once, pairing IDs with statuses by index
+    icm_bugs = icms[icms['BugExternalIds'].notna()]
+    icm_bugs = icm_bugs[icm_bugs['BugExternalIds'].astype(str).str.strip() != '']
+    bug_ids = icm_bugs['BugExternalIds'].astype(str).str.split(',').explode().str.strip()
+    bug_statuses = icm_bugs['BugStatuses'].dropna().astype(str).str.split(',').explode().str.strip()
+    bugs = pd.DataFrame({
+        'icm': bug_ids.index,
+        'ordinal': bug_ids.groupby(level=0).cumcount().to_numpy(),
+        'bug_id': bug_ids.to_numpy(),
+    })
+    statuses = pd.DataFrame({
+        'icm': bug_statuses.index,
+        'ordinal': bug_statuses.groupby(level=0).cumcount().to_numpy(),
+        'status': bug_statuses.to_numpy(),
+    })
+    bugs = bugs.merge(statuses, on=['icm', 'ordinal'], how='left')
+    bugs = bugs[bugs['bug_id'] != '']
+    if bugs.empty:
+        return result
+    bugs['IncidentId'] = icm_bugs['IncidentId'].reindex(bugs['icm']).to_numpy()
+    status = bugs['status'].fillna('Unknown')
+    url_prefix, url_suffix = BUG_URL_TEMPLATE.split('{bug_id}')
+    bugs['info'] = bugs['bug_id'] + ' (' + status + '); '
+    bugs['linked'] = ('<a href="' + url_prefix + bugs['bug_id'] + url_suffix + '" target="_blank">'
+                      + bugs['bug_id'] + '</a> (' + status + '); ')
+    
+    # Every case's bugs in ICM order, first occurrence of each bug ID only
+    case_bugs = (matched[['case', 'position', 'IncidentId']]
+                 .merge(bugs[['IncidentId', 'ordinal', 'bug_id', 'info', 'linked']], on='IncidentId')
+                 .sort_values(['case', 'position', 'ordinal'])
+                 .drop_duplicates(['case', 'bug_id']))
+    
+    # Grouped string sum concatenates in row order; drop the trailing separator
+    joined = case_bugs.groupby('case', sort=False)[['info', 'linked']].sum()
+    result['BugInfo'] = joined['info'].str[:-2]
+    result['BugInfoLinked'] = joined['linked'].str[:-2]
+    return result
+
+
+def risk_class(risk_score):
+    """CSS class for a case's risk score"""
+    if risk_score >= 80:
+        return 'critical'
+    elif risk_score >= 60:
+        return 'high'
+    elif risk_score >= 40:
+        return 'medium'
+    return 'low'
+
+
+def icm_link(icm_id, icm_dict):
+    """(status rank, link HTML) for one ICM ID; status is shown when the ICM is in icm_dict"""
+    try:
+        icm = icm_dict.get(int(icm_id))
+    except ValueError:
+        icm = None
+    status = icm.get('IcmStatus', '') if icm is not None else None
+    status_class = 'icm-active' if status == 'ACTIVE' else ''
+    status_text = f' ({escape(status)})' if status else ''
+    link = f'<a href="{ICM_URL_TEMPLATE.format(icm_id=escape(icm_id))}" class="{status_class}">{escape(icm_id)}{status_text}</a>'
+    return ICM_STATUS_RANK.get(status, FIRST_ICM_RANK), link
+
+
+def icm_cell(related_icm_id, icm_dict, icm_links=None):
+    """
+    ICM IDs cell for a RelatedICM_Id value: ACTIVE first, then MITIGATED, then the rest
+    
+    IDs may be comma or semicolon separated. Pass the same icm_links dict
+    across calls to build each ICM's link only once.
+    """
+    if pd.isna(related_icm_id) or not str(related_icm_id).strip():
+        return 'None'
+    if icm_links is None:
+        icm_links = {}
+    links = []
+    for icm_id in str(related_icm_id).strip().replace(',', ';').split(';'):
+        icm_id = icm_id.strip()
+        if not icm_id:
+            continue
+        if icm_id not in icm_links:
+            icm_links[icm_id] = icm_link(icm_id, icm_dict)
+        links.append(icm_links[icm_id])
+    links.sort(key=lambda link: link[0])  # Stable: listed order within each status
+    return Markup('<br>'.join(link for _, link in links))
+
+
+def case_columns(df, icm_cells, has_icm_data):
+    """
+    Template values for every case: one object array per CaseRow field, aligned by position with df
+    
+    Display values are derived column by column once for the whole report;
+    icm_cells maps each RelatedICM_Id value to its rendered ICM IDs cell.
+    """
+    def present(column, default):
+        values = df[column].astype(object)
+        return values.where(values.notna(), default)
+    
+    # ICM Owner - show only for ACTIVE or MITIGATED, flag ACTIVE with no owner as UNASSIGNED
+    icm_owner = pd.Series('', index=df.index, dtype=object)
+    unassigned = pd.Series(False, index=df.index)
+    if has_icm_data:
+        icm_status = present('IcmStatus', 'N/A').map(str)
+        owner = present('IcmOwner', '').map(str).str.strip()
+        icm_owner = owner.where(icm_status.isin(['ACTIVE', 'MITIGATED']), '')
+        unassigned = (icm_status == 'ACTIVE') & (icm_owner == '')
+        icm_owner = icm_owner.mask(unassigned, 'UNASSIGNED')
+    
+    columns = {
+        'url': df['CaseUrl'],
+        'number': df['ServiceRequestNumber'],
+        'customer': df['TopParentName'],
+        'status': df['ServiceRequestStatus'],
+        'days_open': df['DaysOpen'],
+        'owner': present('AgentAlias', 'N/A'),
+        'manager': present('ManagerEmail', 'N/A'),
+        'risk_score': df['RiskScore'],
+        'risk_class': df['RiskScore'].map(risk_class),
+        'summary': df['Summary'],
+        # Bug links are built by resolve_icm_columns, so they are trusted HTML. Built as
+        # lists: Series.map may return a str-dtype Series (pandas 3), which drops Markup
+        'bugs': [Markup(bugs) for bugs in present('BugInfoLinked', '')],
+        'icms': [icm_cells.get(related, 'None') for related in present('RelatedICM_Id', None)],
+        'icm_owner': icm_owner,
+        'unassigned': unassigned,
+    }
+    return [np.asarray(columns[field], dtype=object) for field in CaseRow._fields]
+
+
+def iter_rows(rows, positions):
+    """CaseRow namedtuples for the given row positions, built ROW_BATCH at a time"""
+    for start in range(0, len(positions), ROW_BATCH):
+        batch = positions[start:start + ROW_BATCH]
+        yield from map(CaseRow._make, zip(*(column[batch] for column in rows)))
+
+
+def fragment_dir(output_html):
+    """Where incremental runs keep the customer sections of output_html"""
+    return Path(output_html).with_suffix('.fragments')
+
+
+def risk_summary_rows(risk_summary):
+    """Template rows for the risk level summary table (levels with no cases are skipped)"""
+    rows = []
+    for risk_level in ['Critical', 'High', 'Medium', 'Low']:
+        if risk_level in risk_summary.index and not pd.isna(risk_summary.loc[risk_level, 'ServiceRequestNumber']):
+            rows.append({
+                'name': risk_level,
+                'risk_class': risk_level.lower(),
+                'count': int(risk_summary.loc[risk_level, 'ServiceRequestNumber']),
+                'avg_days': risk_summary.loc[risk_level, 'DaysOpen'],
+                'avg_score': risk_summary.loc[risk_level, 'RiskScore'],
+            })
+    return rows
+
+
+def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_html="IC_MCS_Risk_Report.htm",
+                              incremental=False):
     """
     Generate HTML risk report from Kusto query results
     Organized by customer (highest risk first)
@@ -18,6 +241,8 @@ def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_
         kusto_results_input: CSV or JSON file with support case data
         icm_results_csv: Optional CSV file with ICM incident data to join
         output_html: Output HTML file path
+        incremental: Reuse customer sections cached by the previous run
+            (in <output>.fragments/) when their cases and ICMs are unchanged
     """
     
     # Auto-detect input format (CSV or JSON) and read accordingly
@@ -42,93 +267,10 @@ def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_
                 icm_columns.extend(['BugExternalIds', 'BugDescriptions', 'BugStatuses'])
             icm_dict = icm_df.set_index('IncidentId')[icm_columns].to_dict('index')
             
-            # Function to look up ICM data (handles multiple ICM IDs - comma or semicolon separated)
-            # Prioritizes ACTIVE, then MITIGATED, then others for owner/status display
-            def get_icm_data(icm_ids_str, field):
-                if pd.isna(icm_ids_str) or not str(icm_ids_str).strip():
-                    return None
-                # Split by both comma and semicolon to handle different formats
-                icm_ids_str = str(icm_ids_str).replace(',', ';')
-                icm_ids = [id.strip() for id in icm_ids_str.split(';') if id.strip()]
-                if icm_ids:
-                    # First, look for an ACTIVE ICM
-                    for icm_id_str in icm_ids:
-                        try:
-                            icm_id = int(icm_id_str)
-                            if icm_id in icm_dict:
-                                if icm_dict[icm_id].get('IcmStatus') == 'ACTIVE':
-                                    return icm_dict[icm_id].get(field)
-                        except ValueError:
-                            pass
-                    # If no ACTIVE, look for MITIGATED
-                    for icm_id_str in icm_ids:
-                        try:
-                            icm_id = int(icm_id_str)
-                            if icm_id in icm_dict:
-                                if icm_dict[icm_id].get('IcmStatus') == 'MITIGATED':
-                                    return icm_dict[icm_id].get(field)
-                        except ValueError:
-                            pass
-                    # If no ACTIVE or MITIGATED, return first available
-                    try:
-                        first_icm_id = int(icm_ids[0])
-                        if first_icm_id in icm_dict:
-                            return icm_dict[first_icm_id].get(field)
-                    except ValueError:
-                        pass
-                return None
-            
-            # Function to get all bugs for all ICMs (not just ACTIVE)
-            def get_all_bugs(icm_ids_str):
-                if pd.isna(icm_ids_str) or not str(icm_ids_str).strip():
-                    return None
-                icm_ids_str = str(icm_ids_str).replace(',', ';')
-                icm_ids = [id.strip() for id in icm_ids_str.split(';') if id.strip()]
-                all_bugs = set()
-                bug_info = []
-                for icm_id_str in icm_ids:
-                    try:
-                        icm_id = int(icm_id_str)
-                        if icm_id in icm_dict:
-                            bug_ids = icm_dict[icm_id].get('BugExternalIds')
-                            bug_statuses = icm_dict[icm_id].get('BugStatuses')
-                            if bug_ids and not pd.isna(bug_ids) and str(bug_ids).strip():
-                                bug_id_list = str(bug_ids).split(',')
-                                status_list = str(bug_statuses).split(',') if bug_statuses and not pd.isna(bug_statuses) else []
-                                for i, bug_id in enumerate(bug_id_list):
-                                    bug_id = bug_id.strip()
-                                    if bug_id and bug_id not in all_bugs:
-                                        all_bugs.add(bug_id)
-                                        status = status_list[i].strip() if i < len(status_list) else 'Unknown'
-                                        bug_info.append(f"{bug_id} ({status})")
-                    except ValueError:
-                        pass
-                return '; '.join(bug_info) if bug_info else None
-            
-            # Function to convert bug info to HTML links
-            def format_bug_links(bug_info_str):
-                if not bug_info_str or pd.isna(bug_info_str):
-                    return None
-                bug_links = []
-                # Parse "bug_id (status); bug_id (status)" format
-                bug_entries = bug_info_str.split(';')
-                for entry in bug_entries:
-                    entry = entry.strip()
-                    if entry:
-                        # Extract bug ID and status
-                        if '(' in entry and ')' in entry:
-                            bug_id = entry.split('(')[0].strip()
-                            status = entry.split('(')[1].split(')')[0].strip()
-                            bug_url = f"https://o365exchange.visualstudio.com/IP%20Engineering/_workitems/edit/{bug_id}"
-                            bug_links.append(f'<a href="{bug_url}" target="_blank">{bug_id}</a> ({status})')
-                        else:
-                            bug_links.append(entry)
-                return '; '.join(bug_links) if bug_links else None
-            
-            df['IcmOwner'] = df['RelatedICM_Id'].apply(lambda x: get_icm_data(x, 'IcmOwner'))
-            df['IcmStatus'] = df['RelatedICM_Id'].apply(lambda x: get_icm_data(x, 'IcmStatus'))
-            df['BugInfo'] = df['RelatedICM_Id'].apply(get_all_bugs)
-            df['BugInfoLinked'] = df['BugInfo'].apply(format_bug_links)
+            # Resolve owner/status/bugs for every case in one exploded join
+            icm_columns_df = resolve_icm_columns(df, icm_df)
+            for column in icm_columns_df.columns:
+                df[column] = icm_columns_df[column].to_numpy()
             has_icm_data = True
         except Exception as e:
             print(f"Warning: Could not load ICM data: {e}")
@@ -144,7 +286,7 @@ def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_
         df['BugInfoLinked'] = None
     
     # Sort by TopParentName (customer) and RiskScore (highest first)
-    df = df.sort_values(['TopParentName', 'RiskScore'], ascending=[True, False])
+    df = df.sort_values(['TopParentName', 'RiskScore'], ascending=[True, False]).reset_index(drop=True)
     
     # Group by customer and calculate max risk score per customer
     customer_max_risk = df.groupby('TopParentName')['RiskScore'].max().sort_values(ascending=False)
@@ -156,383 +298,63 @@ def generate_risk_report_html(kusto_results_input, icm_results_csv=None, output_
         'RiskScore': 'mean'
     }).reindex(['Critical', 'High', 'Medium', 'Low'])
     
-    # Generate HTML
-    html_parts = []
+    # Render the report, streaming rows into the file as the template reaches them
+    if not has_icm_data:
+        icm_dict = {}
+    icm_links = {}
+    icm_cells = {related: icm_cell(related, icm_dict, icm_links) for related in df['RelatedICM_Id'].dropna().unique()}
+    rows = case_columns(df, icm_cells, has_icm_data)
+    critical_cases = df[df['RiskLevel'] == 'Critical'].sort_values('RiskScore', ascending=False)
     
-    # Header
-    html_parts.append('''<html xmlns:o="urn:schemas-microsoft-com:office:office"
-xmlns:w="urn:schemas-microsoft-com:office:word"
-xmlns="http://www.w3.org/TR/REC-html40">
-
-<head>
-<meta http-equiv=Content-Type content="text/html; charset=unicode">
-<meta name=ProgId content=Word.Document>
-<meta name=Generator content="Microsoft Word 15">
-<title>IC/MCS Case Risk Report - ''' + datetime.now().strftime('%Y-%m-%d') + '''</title>
-<style>
-body { font-family: Segoe UI, sans-serif; margin: 20px; }
-h1 { font-size: 18pt; color: #1F4E78; font-weight: bold; margin-top: 20px; }
-h2 { font-size: 14pt; color: #2E75B5; font-weight: bold; margin-top: 15px; margin-bottom: 10px; }
-table { width: 100%; background: white; border-collapse: collapse; margin-bottom: 20px; table-layout: fixed; }
-thead td { background: #B7D9F7; border: solid #7EA8F8 1.0pt; padding: 4pt 6pt; font-weight: bold; font-size: 10pt; text-align: center; vertical-align: middle; }
-tbody td { border: solid #7EA8F8 1.0pt; padding: 4pt 6pt; font-size: 9pt; text-align: center; vertical-align: middle; word-wrap: break-word; }
-tbody td.left-align { text-align: left; }
-tbody td.nowrap { white-space: nowrap; }
-a { color: #0563C1; text-decoration: underline; }
-.critical { background: #FFC7CE; color: #9C0006; font-weight: bold; }
-.high { background: #FFF2CC; color: #9C6500; font-weight: bold; }
-.medium { background: #C6EFCE; color: #006100; }
-.low { background: #F0F0F0; color: #3F3F76; }
-/* Column widths for summary table */
-table.summary-table { table-layout: auto; }
-table.summary-table td:nth-child(1) { width: 15%; }
-table.summary-table td:nth-child(2) { width: 15%; }
-table.summary-table td:nth-child(3) { width: 20%; }
-table.summary-table td:nth-child(4) { width: 20%; }
-/* Column widths for case tables - equal widths */
-table.case-table td:nth-child(1) { width: 11%; } /* Case ID */
-table.case-table td:nth-child(2) { width: 11%; } /* Status */
-table.case-table td:nth-child(3) { width: 11%; } /* Age */
-table.case-table td:nth-child(4) { width: 11%; } /* Owner */
-table.case-table td:nth-child(5) { width: 11%; } /* Manager */
-table.case-table td:nth-child(6) { width: 11%; } /* Risk */
-table.case-table td:nth-child(7) { width: 12%; } /* Summary (with bugs) */
-table.case-table td:nth-child(8) { width: 11%; } /* ICM (with status) */
-table.case-table td:nth-child(9) { width: 11%; } /* ICM Owner */
-/* Critical cases table has 10 columns (includes Customer) */
-table.critical-cases-table td:nth-child(1) { width: 10%; } /* Case ID */
-table.critical-cases-table td:nth-child(2) { width: 10%; } /* Customer */
-table.critical-cases-table td:nth-child(3) { width: 10%; } /* Status */
-table.critical-cases-table td:nth-child(4) { width: 10%; } /* Age */
-table.critical-cases-table td:nth-child(5) { width: 10%; } /* Owner */
-table.critical-cases-table td:nth-child(6) { width: 10%; } /* Manager */
-table.critical-cases-table td:nth-child(7) { width: 10%; } /* Risk */
-table.critical-cases-table td:nth-child(8) { width: 10%; } /* Summary */
-table.critical-cases-table td:nth-child(9) { width: 10%; } /* ICM IDs */
-table.critical-cases-table td:nth-child(10) { width: 10%; } /* ICM Owner */
-.bug-info { font-size: 8pt; color: #d32f2f; font-weight: bold; }
-/* ICM Status color coding */
-.icm-active { color: #f57c00; font-weight: bold; }
-.icm-unassigned { background: #FFC7CE; color: #9C0006; font-weight: bold; }
-</style>
-</head>
-
-<body>
-
-<h1>IC/MCS Case Risk Report - ''' + datetime.now().strftime('%B %d, %Y') + '''</h1>
-
-<p><strong>Report Generated:</strong> ''' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '''</p>
-<p><strong>Total Cases:</strong> ''' + str(len(df)) + ''' | <strong>Customers:</strong> ''' + str(len(customer_max_risk)) + '''</p>
-
-<h2>Risk Level Summary</h2>
-<table class="summary-table" style="width: 60%;">
-<thead>
-<tr>
-<td>Risk Level</td>
-<td>Case Count</td>
-<td>Avg Days Open</td>
-<td>Avg Risk Score</td>
-</tr>
-</thead>
-<tbody>
-''')
+    # PHE, CLE and Program come from each customer's first case (same for all its cases)
+    customer_positions = df.groupby('TopParentName', sort=False).indices
+    customer_info = df.drop_duplicates('TopParentName').set_index('TopParentName')[['Program', 'PHE', 'CLE']].to_dict('index')
     
-    # Add risk summary rows
-    for risk_level in ['Critical', 'High', 'Medium', 'Low']:
-        if risk_level in risk_summary.index and not pd.isna(risk_summary.loc[risk_level, 'ServiceRequestNumber']):
-            count = int(risk_summary.loc[risk_level, 'ServiceRequestNumber'])
-            avg_days = risk_summary.loc[risk_level, 'DaysOpen']
-            avg_score = risk_summary.loc[risk_level, 'RiskScore']
-            risk_class = risk_level.lower()
-            html_parts.append(f'''<tr>
-<td class="{risk_class}">{risk_level}</td>
-<td>{count}</td>
-<td>{avg_days:.1f}</td>
-<td>{avg_score:.1f}</td>
-</tr>
-''')
+    def customers():
+        for customer_name, max_risk in customer_max_risk.items():
+            info = customer_info[customer_name]
+            positions = customer_positions[customer_name]
+            yield {
+                'name': customer_name,
+                'program': info['Program'],
+                'case_count': len(positions),
+                'max_risk': max_risk,
+                'phe': info['PHE'] if not pd.isna(info['PHE']) else 'N/A',
+                'cle': info['CLE'] if not pd.isna(info['CLE']) else 'N/A',
+                'cases': iter_rows(rows, positions),
+            }
     
-    html_parts.append('''</tbody>
-</table>
-
-''')
+    sections = template_macros(SECTIONS_TEMPLATE)
+    cache = FragmentCache(fragment_dir(output_html), SECTIONS_TEMPLATE) if incremental else None
+    if cache is not None:
+        # One hash per case over everything its row displays, ICM owner/status/bugs included
+        row_hashes = pd.util.hash_pandas_object(pd.DataFrame(dict(zip(CaseRow._fields, rows))), index=False).to_numpy()
     
-    # Add Critical Cases section at the top
-    critical_cases = df[df['RiskLevel'] == 'Critical'].sort_values('RiskScore', ascending=False)
-    if len(critical_cases) > 0:
-        html_parts.append(f'''
-<h2>🚨 Critical Cases ({len(critical_cases)} cases - ALL cases over 90 days old)</h2>
-<table class="critical-cases-table">
-<thead>
-<tr>
-<td>Case ID</td>
-<td>Customer</td>
-<td>Status</td>
-<td>Age (Days)</td>
-<td>Owner</td>
-<td>Manager</td>
-<td>Risk</td>
-<td>Summary</td>
-<td>ICM IDs</td>
-<td>ICM Owner</td>
-</tr>
-</thead>
-<tbody>
-''')
-        
-        for _, row in critical_cases.iterrows():
-            case_owner = row['AgentAlias'] if not pd.isna(row['AgentAlias']) else 'N/A'
-            owner_manager = row['ManagerEmail'] if not pd.isna(row['ManagerEmail']) else 'N/A'
-            
-            # Format ICM ID with link if present
-            if not pd.isna(row['RelatedICM_Id']) and str(row['RelatedICM_Id']).strip():
-                icm_id_value = str(row['RelatedICM_Id']).strip()
-                icm_id_value = icm_id_value.replace(',', ';')
-                icm_ids = [id.strip() for id in icm_id_value.split(';') if id.strip()]
-                
-                # Sort ICMs: ACTIVE first, then MITIGATED, then RESOLVED
-                active_icms = []
-                mitigated_icms = []
-                other_icms = []
-                for icm_id in icm_ids:
-                    if has_icm_data:
-                        try:
-                            icm_id_int = int(icm_id)
-                            if icm_id_int in icm_dict:
-                                status = icm_dict[icm_id_int].get('IcmStatus')
-                                if status == 'ACTIVE':
-                                    active_icms.append(icm_id)
-                                elif status == 'MITIGATED':
-                                    mitigated_icms.append(icm_id)
-                                else:
-                                    other_icms.append(icm_id)
-                            else:
-                                other_icms.append(icm_id)
-                        except ValueError:
-                            other_icms.append(icm_id)
-                    else:
-                        other_icms.append(icm_id)
-                
-                sorted_icm_ids = active_icms + mitigated_icms + other_icms
-                
-                icm_links = []
-                for icm_id in sorted_icm_ids:
-                    icm_url = f"https://portal.microsofticm.com/imp/v5/incidents/details/{icm_id}/home"
-                    status_class = ''
-                    status_text = ''
-                    if has_icm_data:
-                        try:
-                            icm_id_int = int(icm_id)
-                            if icm_id_int in icm_dict:
-                                icm_status_check = icm_dict[icm_id_int].get('IcmStatus', '')
-                                if icm_status_check:
-                                    status_text = f' ({icm_status_check})'
-                                    if icm_status_check == 'ACTIVE':
-                                        status_class = 'icm-active'
-                        except ValueError:
-                            pass
-                    icm_links.append(f'<a href="{icm_url}" class="{status_class}">{icm_id}{status_text}</a>')
-                icm_display = '<br>'.join(icm_links)
-            else:
-                icm_display = 'None'
-            
-            # ICM Owner - show only for ACTIVE or MITIGATED
-            icm_owner = ''
-            icm_status = 'N/A'
-            icm_owner_class = ''
-            if has_icm_data:
-                if 'IcmStatus' in df.columns and not pd.isna(row['IcmStatus']):
-                    icm_status = str(row['IcmStatus'])
-                # Only show owner for ACTIVE or MITIGATED ICMs
-                if icm_status in ['ACTIVE', 'MITIGATED']:
-                    if 'IcmOwner' in df.columns and not pd.isna(row['IcmOwner']):
-                        icm_owner = str(row['IcmOwner']).strip()
-                    # Flag ACTIVE ICMs with no owner as UNASSIGNED
-                    if icm_status == 'ACTIVE' and not icm_owner:
-                        icm_owner = 'UNASSIGNED'
-                        icm_owner_class = ' class="icm-unassigned"'
-            
-            # Bug information - from ICM data, add to summary only
-            summary_with_bugs = row['Summary']
-            if 'BugInfoLinked' in df.columns and not pd.isna(row['BugInfoLinked']):
-                summary_with_bugs = f'{row["Summary"]} <strong>Linked Bugs:</strong> {row["BugInfoLinked"]}'
-            
-            html_parts.append(f'''
-<tr>
-<td class="nowrap"><a href="{row['CaseUrl']}">{row['ServiceRequestNumber']}</a></td>
-<td>{row['TopParentName']}</td>
-<td>{row['ServiceRequestStatus']}</td>
-<td>{row['DaysOpen']:.0f}</td>
-<td>{case_owner}</td>
-<td>{owner_manager}</td>
-<td class="critical">{row['RiskScore']:.0f}</td>
-<td class="left-align">{summary_with_bugs}</td>
-<td>{icm_display}</td>
-<td{icm_owner_class}>{icm_owner}</td>
-</tr>
-''')
-        
-        html_parts.append('''
-</tbody>
-</table>
-
-''')
+    def customer_sections():
+        for customer in customers():
+            if cache is None:
+                yield sections.customer_section(customer)
+                continue
+            header = repr([customer[field] for field in ('name', 'program', 'case_count', 'max_risk', 'phe', 'cle')])
+            key = cache.key(header, row_hashes[customer_positions[customer['name']]].tobytes())
+            yield cache.get_or_render(key, lambda: sections.customer_section(customer))
     
-    # For each customer (sorted by max risk score)
-    for customer_name in customer_max_risk.index:
-        customer_cases = df[df['TopParentName'] == customer_name]
-        max_risk = customer_cases['RiskScore'].max()
-        case_count = len(customer_cases)
-        
-        # Get PHE and CLE from first row (should be same for all cases of this customer)
-        phe = customer_cases.iloc[0]['PHE'] if not pd.isna(customer_cases.iloc[0]['PHE']) else 'N/A'
-        cle = customer_cases.iloc[0]['CLE'] if not pd.isna(customer_cases.iloc[0]['CLE']) else 'N/A'
-        program = customer_cases.iloc[0]['Program']
-        
-        # Customer header
-        html_parts.append(f'''
-<h2>{customer_name} ({program}) - {case_count} Case(s) - Max Risk: {max_risk:.0f}</h2>
-<p><strong>PHE:</strong> {phe} | <strong>CLE:</strong> {cle}</p>
-
-<table class="case-table">
-<thead>
-<tr>
-<td>Case ID</td>
-<td>Status</td>
-<td>Age (Days)</td>
-<td>Owner</td>
-<td>Manager</td>
-<td>Risk</td>
-<td>Summary</td>
-<td>ICM IDs</td>
-<td>ICM Owner</td>
-</tr>
-</thead>
-<tbody>
-''')
-        
-        # Cases for this customer
-        for _, row in customer_cases.iterrows():
-            risk_class = ''
-            if row['RiskScore'] >= 80:
-                risk_class = 'critical'
-            elif row['RiskScore'] >= 60:
-                risk_class = 'high'
-            elif row['RiskScore'] >= 40:
-                risk_class = 'medium'
-            else:
-                risk_class = 'low'
-            
-            case_url = f"https://servicedesk.microsoft.com/incidents/{row['ServiceRequestNumber']}"
-            case_owner = row['AgentAlias'] if not pd.isna(row['AgentAlias']) else 'N/A'
-            owner_manager = row['ManagerEmail'] if not pd.isna(row['ManagerEmail']) else 'N/A'
-            
-            # Format ICM ID with link if present - handle both comma and semicolon separated IDs
-            if not pd.isna(row['RelatedICM_Id']) and str(row['RelatedICM_Id']).strip():
-                icm_id_value = str(row['RelatedICM_Id']).strip()
-                # Normalize to semicolon separator and split
-                icm_id_value = icm_id_value.replace(',', ';')
-                icm_ids = [id.strip() for id in icm_id_value.split(';') if id.strip()]
-                
-                # Sort ICMs: ACTIVE first, then MITIGATED, then RESOLVED
-                active_icms = []
-                mitigated_icms = []
-                other_icms = []
-                for icm_id in icm_ids:
-                    if has_icm_data:
-                        try:
-                            icm_id_int = int(icm_id)
-                            if icm_id_int in icm_dict:
-                                status = icm_dict[icm_id_int].get('IcmStatus')
-                                if status == 'ACTIVE':
-                                    active_icms.append(icm_id)
-                                elif status == 'MITIGATED':
-                                    mitigated_icms.append(icm_id)
-                                else:
-                                    other_icms.append(icm_id)
-                            else:
-                                other_icms.append(icm_id)
-                        except ValueError:
-                            other_icms.append(icm_id)
-                    else:
-                        other_icms.append(icm_id)
-                
-                # Combine: ACTIVE, MITIGATED, then others
-                sorted_icm_ids = active_icms + mitigated_icms + other_icms
-                
-                icm_links = []
-                for icm_id in sorted_icm_ids:
-                    icm_url = f"https://portal.microsofticm.com/imp/v5/incidents/details/{icm_id}/home"
-                    # Show status inline for all ICMs, highlight ACTIVE in orange
-                    status_class = ''
-                    status_text = ''
-                    if has_icm_data:
-                        try:
-                            icm_id_int = int(icm_id)
-                            if icm_id_int in icm_dict:
-                                icm_status = icm_dict[icm_id_int].get('IcmStatus', '')
-                                if icm_status:
-                                    status_text = f' ({icm_status})'
-                                    if icm_status == 'ACTIVE':
-                                        status_class = 'icm-active'
-                        except ValueError:
-                            pass
-                    icm_links.append(f'<a href="{icm_url}" class="{status_class}">{icm_id}{status_text}</a>')
-                icm_display = '<br>'.join(icm_links)  # Use line break for multiple IDs
-            else:
-                icm_display = 'None'
-            
-            # ICM Owner - show only for ACTIVE or MITIGATED
-            icm_owner = ''
-            icm_status = 'N/A'
-            icm_owner_class = ''
-            if has_icm_data:
-                if 'IcmStatus' in df.columns and not pd.isna(row['IcmStatus']):
-                    icm_status = str(row['IcmStatus'])
-                # Only show owner for ACTIVE or MITIGATED ICMs
-                if icm_status in ['ACTIVE', 'MITIGATED']:
-                    if 'IcmOwner' in df.columns and not pd.isna(row['IcmOwner']):
-                        icm_owner = str(row['IcmOwner']).strip()
-                    # Flag ACTIVE ICMs with no owner as UNASSIGNED
-                    if icm_status == 'ACTIVE' and not icm_owner:
-                        icm_owner = 'UNASSIGNED'
-                        icm_owner_class = ' class="icm-unassigned"'
-            
-            # Bug information - from ICM data, add to summary only
-            summary_with_bugs = row['Summary']
-            if 'BugInfoLinked' in df.columns and not pd.isna(row['BugInfoLinked']):
-                summary_with_bugs = f'{row["Summary"]} <strong>Linked Bugs:</strong> {row["BugInfoLinked"]}'
-            
-            html_parts.append(f'''
-<tr>
-<td class="nowrap"><a href="{row['CaseUrl']}">{row['ServiceRequestNumber']}</a></td>
-<td>{row['ServiceRequestStatus']}</td>
-<td>{row['DaysOpen']:.0f}</td>
-<td>{case_owner}</td>
-<td>{owner_manager}</td>
-<td class="{risk_class}">{row['RiskScore']:.0f}</td>
-<td class="left-align">{summary_with_bugs}</td>
-<td>{icm_display}</td>
-<td{icm_owner_class}>{icm_owner}</td>
-</tr>
-''')
-        
-        html_parts.append('''
-</tbody>
-</table>
-''')
-    
-    # Footer
-    html_parts.append('''
-</body>
-</html>
-''')
-    
-    # Write to file
-    with open(output_html, 'w', encoding='utf-8') as f:
-        f.write(''.join(html_parts))
+    render_to_file(
+        REPORT_TEMPLATE,
+        output_html,
+        generated=datetime.now(),
+        total_cases=len(df),
+        customer_count=len(customer_max_risk),
+        risk_summary=risk_summary_rows(risk_summary),
+        critical_count=len(critical_cases),
+        critical_cases=iter_rows(rows, critical_cases.index.to_numpy()),
+        customer_sections=customer_sections(),
+    )
     
     print(f"Report generated: {output_html}")
+    if cache is not None:
+        cache.prune()
+        print(f"♻️ Incremental: {cache.hits} customer section(s) reused, {cache.misses} re-rendered")
     print(f"Total customers: {len(customer_max_risk)}")
     print(f"Total cases: {len(df)}")
     print(f"\\nTop 5 Highest Risk Customers:")
@@ -547,24 +369,28 @@ if __name__ == "__main__":
     # 2. Optionally run the ICM query and export to CSV
     # 3. Run this script with the file(s)
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]  # Can be CSV or JSON
+    args = [arg for arg in sys.argv[1:] if arg != '--incremental']
+    incremental = len(args) < len(sys.argv) - 1
+    
+    if len(args) > 0:
+        input_file = args[0]  # Can be CSV or JSON
         icm_file = None
         output_file = "IC_MCS_Risk_Report.htm"
         
         # Check if second arg is ICM data or output file
-        if len(sys.argv) > 2:
-            if sys.argv[2].endswith('.csv') or sys.argv[2].endswith('.json'):
-                icm_file = sys.argv[2]
-                output_file = sys.argv[3] if len(sys.argv) > 3 else "IC_MCS_Risk_Report.htm"
+        if len(args) > 1:
+            if args[1].endswith('.csv') or args[1].endswith('.json'):
+                icm_file = args[1]
+                output_file = args[2] if len(args) > 2 else "IC_MCS_Risk_Report.htm"
             else:
-                output_file = sys.argv[2]
+                output_file = args[1]
         
-        generate_risk_report_html(input_file, icm_file, output_file)
+        generate_risk_report_html(input_file, icm_file, output_file, incremental=incremental)
     else:
-        print("Usage: python ic_mcs_risk_report_generator.py <cases.csv|cases.json> [icm.csv] [output.htm]")
+        print("Usage: python ic_mcs_risk_report_generator.py <cases.csv|cases.json> [icm.csv] [output.htm] [--incremental]")
         print("\\nExamples:")
         print("  python ic_mcs_risk_report_generator.py cases.csv report.htm")
         print("  python ic_mcs_risk_report_generator.py cases.json icm.csv report.htm")
         print("  python ic_mcs_risk_report_generator.py query_results.json report.htm")
+        print("  python ic_mcs_risk_report_generator.py cases.csv icm.csv report.htm --incremental")
 
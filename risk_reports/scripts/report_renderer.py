@@ -0,0 +1,112 @@
+"""
+Streaming HTML renderer for report generators
+
+Templates are Jinja2 files (autoescaped) compiled once per process. Output is
+written to the file chunk by chunk while the template consumes its row
+iterators, so a report is never held in memory as one string.
+
+Used by ic_mcs_risk_report_generator.py; other HTML generators (LQE, ICM) can
+render their own templates by passing template_dir. FragmentCache keeps
+rendered sections on disk so incremental runs only re-render what changed.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup, escape  # Re-exported for callers building trusted HTML fragments
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / 'templates'
+
+# Template output pieces collected per write to the file
+STREAM_BUFFER = 256
+
+
+@lru_cache(maxsize=None)
+def get_environment(template_dir=TEMPLATE_DIR):
+    """Shared Jinja2 environment (and compiled template cache) for a template directory"""
+    return Environment(
+        loader=FileSystemLoader(str(template_dir)),
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+    )
+
+
+def render_to_file(template_name, output_path, template_dir=TEMPLATE_DIR, **context):
+    """
+    Render a template straight into output_path (UTF-8)
+    
+    Context values may be generators; they are consumed as the template
+    reaches them. Mark pre-built HTML fragments with Markup so they are
+    not escaped.
+    """
+    template = get_environment(Path(template_dir)).get_template(template_name)
+    stream = template.stream(**context)
+    stream.enable_buffering(STREAM_BUFFER)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        stream.dump(f)
+
+
+def template_macros(template_name, template_dir=TEMPLATE_DIR):
+    """Macros of a template, callable from Python (each returns Markup)"""
+    return get_environment(Path(template_dir)).get_template(template_name).module
+
+
+class FragmentCache:
+    """
+    Rendered HTML fragments on disk, keyed by a fingerprint of their inputs
+    
+    Keys also cover the source of template_name, so editing the template
+    invalidates every fragment rendered from it. prune() removes fragments
+    the current run did not use.
+    """
+    
+    def __init__(self, cache_dir, template_name, template_dir=TEMPLATE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        env = get_environment(Path(template_dir))
+        source = env.loader.get_source(env, template_name)[0]
+        self._salt = hashlib.sha1(source.encode('utf-8')).digest()
+        self._used = set()
+        self.hits = 0
+        self.misses = 0
+    
+    def key(self, *parts):
+        """Fingerprint for a fragment from bytes/str parts describing its inputs"""
+        digest = hashlib.sha1(self._salt)
+        for part in parts:
+            digest.update(part.encode('utf-8') if isinstance(part, str) else bytes(part))
+            digest.update(b'\0')
+        return digest.hexdigest()
+    
+    def get_or_render(self, key, render):
+        """Cached fragment for key, or render() it and store it"""
+        path = self.cache_dir / f"{key}.htm"
+        self._used.add(path.name)
+        try:
+            html = path.read_text(encoding='utf-8')
+            self.hits += 1
+            return Markup(html)
+        except FileNotFoundError:
+            pass
+        
+        html = render()
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(html)
+        os.replace(temp_path, path)  # Never leave a half-written fragment behind
+        self.misses += 1
+        return Markup(html)
+    
+    def prune(self):
+        """Delete fragments not used since this cache was opened; returns how many"""
+        removed = 0
+        for path in self.cache_dir.glob('*.htm'):
+            if path.name not in self._used:
+                path.unlink()
+                removed += 1
+        return removed
@@ -0,0 +1,267 @@
+"""
+PHEPy Semantic Routing Fallback
+TF-IDF nearest-neighbour lookup used when no routing pattern matches a query
+
+The index is built from each domain's routing patterns, the direct-map keys and
+the example prompts in every sub-agent's EXAMPLE_PROMPTS.md, then written as a
+single binary file that is memory-mapped at startup (no parsing, no vectors in
+the Python heap). Queries are scored against an inverted index, so lookup cost
+depends on the query's terms rather than on the number of indexed phrases.
+
+Usage:
+    python semantic_router.py build
+    python semantic_router.py query "what's driving the low health score for contoso"
+"""
+
+import argparse
+import bisect
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+INDEX_MAGIC = b"PHSI"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sIIII")  # magic, version, terms, postings, docs
+
+DEFAULT_INDEX_PATH = "data/routing_semantic.idx"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9\-']*")
+STOPWORDS = frozenset("""
+    a an and are as at be by can could do does for from has have how i in is it
+    its me my of on or our please show that the their there this to us was we
+    what when where which who why will with you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased unigrams plus adjacent bigrams, stopwords removed"""
+    words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def term_hash(term: str) -> int:
+    """Stable 32-bit term id (must match between build and query time)"""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def extract_example_prompts(markdown_path: Path) -> List[str]:
+    """Pull prompts out of an EXAMPLE_PROMPTS.md / TEST_SCENARIOS.md file"""
+    prompts = []
+    in_fence = False
+    after_prompt_label = False
+    
+    for line in markdown_path.read_text(encoding="utf-8").splitlines():
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            if stripped:
+                prompts.append(stripped)
+            continue
+        if stripped.startswith("**Prompt:**"):
+            after_prompt_label = True
+            stripped = stripped[len("**Prompt:**"):].strip()
+        if after_prompt_label and stripped:
+            prompts.append(stripped.strip('"'))
+            after_prompt_label = False
+    
+    return prompts
+
+
+def collect_documents(router_index, root: Path) -> List[Tuple[str, str]]:
+    """(domain, phrase) pairs from the routing map and sub-agent example prompts"""
+    documents = []
+    
+    for domain, config in router_index.patterns.items():
+        documents.extend((domain, pattern) for pattern in config.get("patterns", []))
+    
+    for scripts in router_index.direct_map.values():
+        for script_key, script_path in scripts.items():
+            if "/" not in script_path:
+                continue
+            domain = router_index.agent_index.get(script_path.split("/")[0])
+            if domain:
+                documents.append((domain, script_key.replace("_", " ")))
+    
+    for domain, config in router_index.patterns.items():
+        agent_dir = root / config.get("sub_agent_path", "")
+        prompts_file = agent_dir / "EXAMPLE_PROMPTS.md"
+        if config.get("sub_agent_path") and prompts_file.exists():
+            documents.extend((domain, prompt) for prompt in extract_example_prompts(prompts_file))
+    
+    return documents
+
+
+def build_index(documents: List[Tuple[str, str]], output_path: Path,
+                map_digest: str = "") -> Path:
+    """Compute L2-normalised TF-IDF vectors and write the memory-mappable index"""
+    domains = sorted({domain for domain, _ in documents})
+    domain_ids = {domain: i for i, domain in enumerate(domains)}
+    
+    doc_terms: List[Dict[int, float]] = []
+    doc_domains = array("H")
+    for domain, text in documents:
+        counts: Dict[int, int] = {}
+        for term in tokenize(text):
+            h = term_hash(term)
+            counts[h] = counts.get(h, 0) + 1
+        if counts:
+            doc_terms.append({h: 1.0 + math.log(c) for h, c in counts.items()})
+            doc_domains.append(domain_ids[domain])
+    
+    doc_count = len(doc_terms)
+    document_frequency: Dict[int, int] = {}
+    for terms in doc_terms:
+        for h in terms:
+            document_frequency[h] = document_frequency.get(h, 0) + 1
+    idf = {h: math.log((1 + doc_count) / (1 + df)) + 1.0 for h, df in document_frequency.items()}
+    
+    postings: Dict[int, List[Tuple[int, float]]] = {h: [] for h in idf}
+    for doc_id, terms in enumerate(doc_terms):
+        weights = {h: tf * idf[h] for h, tf in terms.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        for h, w in weights.items():
+            postings[h].append((doc_id, w / norm))
+    
+    term_ids = array("I", sorted(postings))
+    idf_values = array("f", (idf[h] for h in term_ids))
+    offsets = array("I", [0])
+    posting_docs = array("I")
+    posting_weights = array("f")
+    for h in term_ids:
+        for doc_id, weight in postings[h]:
+            posting_docs.append(doc_id)
+            posting_weights.append(weight)
+        offsets.append(len(posting_docs))
+    
+    metadata = json.dumps({"domains": domains, "map_digest": map_digest}).encode("utf-8")
+    
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and swapped in: processes with the old index memory-mapped keep reading it intact
+    temp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(term_ids), len(posting_docs), doc_count))
+        for block in (term_ids, idf_values, offsets, posting_docs, posting_weights, doc_domains):
+            f.write(block.tobytes())
+        f.write(metadata)
+    os.replace(temp_path, output_path)
+    
+    return output_path
+
+
+class SemanticIndex:
+    """Read-only, memory-mapped TF-IDF index of routing phrases"""
+    
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = Path(index_path)
+        with open(self.index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, term_count, posting_count, doc_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"Not a semantic routing index (v{INDEX_VERSION}): {self.index_path}")
+        
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        
+        def take(typecode: str, count: int, itemsize: int = 4) -> memoryview:
+            nonlocal offset
+            block = view[offset:offset + count * itemsize].cast(typecode)
+            offset += count * itemsize
+            return block
+        
+        self._terms = take("I", term_count)
+        self._idf = take("f", term_count)
+        self._offsets = take("I", term_count + 1)
+        self._posting_docs = take("I", posting_count)
+        self._posting_weights = take("f", posting_count)
+        self._doc_domains = take("H", doc_count, itemsize=2)
+        
+        metadata = json.loads(bytes(view[offset:]).decode("utf-8"))
+        self.domains: List[str] = metadata["domains"]
+        self.map_digest: str = metadata.get("map_digest", "")
+    
+    def nearest(self, query: str) -> Optional[Tuple[str, float]]:
+        """Best-matching domain and its cosine similarity, or None if no term overlaps"""
+        counts: Dict[int, int] = {}
+        for term in tokenize(query):
+            h = term_hash(term)
+            counts[h] = counts.get(h, 0) + 1
+        
+        query_weights = []
+        unknown_norm = 0.0
+        for h, count in counts.items():
+            tf = 1.0 + math.log(count)
+            position = bisect.bisect_left(self._terms, h)
+            if position < len(self._terms) and self._terms[position] == h:
+                query_weights.append((position, tf * self._idf[position]))
+            else:
+                # Unseen terms still count towards the norm (idf of a never-seen term)
+                unknown_norm += (tf * (math.log(1 + len(self._doc_domains)) + 1.0)) ** 2
+        if not query_weights:
+            return None
+        
+        norm = math.sqrt(sum(w * w for _, w in query_weights) + unknown_norm)
+        
+        scores: Dict[int, float] = {}
+        for position, weight in query_weights:
+            for p in range(self._offsets[position], self._offsets[position + 1]):
+                doc_id = self._posting_docs[p]
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * self._posting_weights[p]
+        
+        best_doc = max(scores, key=lambda doc_id: (scores[doc_id], -doc_id))
+        return self.domains[self._doc_domains[best_doc]], scores[best_doc] / norm
+
+
+def load_or_build_index(router_index, root: Path,
+                        index_path: Optional[Path] = None) -> SemanticIndex:
+    """Open the semantic index, (re)building it if missing or built from another routing map"""
+    index_path = Path(index_path) if index_path else root / DEFAULT_INDEX_PATH
+    if index_path.exists():
+        index = SemanticIndex(index_path)
+        if index.map_digest == router_index.digest:
+            return index
+    build_index(collect_documents(router_index, root), index_path, router_index.digest)
+    return SemanticIndex(index_path)
+
+
+def main():
+    from agent_router import RoutingMapLoader
+    
+    parser = argparse.ArgumentParser(description="PHEPy semantic routing index")
+    parser.add_argument("--map", default="agent_routing_map.json", help="Routing map path")
+    parser.add_argument("--index", default=None, help=f"Index path (default: {DEFAULT_INDEX_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Rebuild the index from the routing map and example prompts")
+    query_parser = subparsers.add_parser("query", help="Look up the nearest domain for a query")
+    query_parser.add_argument("text")
+    args = parser.parse_args()
+    
+    map_path = Path(args.map)
+    root = map_path.resolve().parent
+    router_index = RoutingMapLoader.for_path(map_path).index
+    index_path = Path(args.index) if args.index else root / DEFAULT_INDEX_PATH
+    
+    if args.command == "build":
+        documents = collect_documents(router_index, root)
+        build_index(documents, index_path, router_index.digest)
+        print(f"✅ Indexed {len(documents)} phrases into {index_path}")
+    else:
+        hit = load_or_build_index(router_index, root, index_path).nearest(args.text)
+        if hit:
+            print(f"🎯 {hit[0]} (similarity {hit[1]:.2f})")
+        else:
+            print("❓ No similar routing phrases")
+
+
+if __name__ == "__main__":
+    main()
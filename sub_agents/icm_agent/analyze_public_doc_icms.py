@@ -10,152 +10,131 @@ Created: February 11, 2026
 
 import json
 import os
+import sys
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
-import re
 
-def extract_keywords(text):
-    """Extract key technical terms from incident descriptions"""
-    if not text:
-        return []
-    
-    # Common MIP/DLP technical keywords
-    keywords_patterns = [
-        r'sensitivity label[s]?',
-        r'DLP',
-        r'data loss prevention',
-        r'encryption',
-        r'decryption',
-        r'rights management',
-        r'RMS',
-        r'Azure Information Protection',
-        r'AIP',
-        r'policy[ies]?',
-        r'classifier[s]?',
-        r'EDM',
-        r'exact data match',
-        r'file explorer',
-        r'office app[s]?',
-        r'outlook',
-        r'teams',
-        r'sharepoint',
-        r'onedrive',
-        r'exchange',
-        r'auto-label[ing]?',
-        r'manual label[ing]?',
-        r'default label[s]?',
-        r'mandatory label[ing]?',
-        r'downgrade[ing]?',
-        r'removal',
-        r'protection',
-        r'unprotect',
-        r'metadata',
-        r'custom permission[s]?',
-        r'co-author[ing]?',
-        r'inheritance',
-        r'container label[s]?',
-        r'parent label[s]?',
-        r'sub-label[s]?',
-        r'scope[d]?',
-        r'advanced classifier[s]?',
-        r'trainable classifier[s]?',
-        r'sensitive info type[s]?',
-        r'SIT[s]?',
-        r'confidence level[s]?',
-        r'threshold[s]?',
-        r'override[s]?',
-        r'justification[s]?',
-        r'audit[ing]?',
-        r'activity explorer',
-        r'content explorer',
-        r'endpoint DLP',
-        r'device[s]?',
-        r'mac',
-        r'windows',
-        r'mobile',
-        r'PDF',
-        r'double key encryption',
-        r'DKE',
-        r'HYOK',
-        r'tenant key',
-        r'customer managed key[s]?',
-        r'CMK',
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from text_tools import KeywordClassifier
+
+# Common MIP/DLP technical keywords: {keyword: [terms]}. Terms match anywhere
+# in the text, except all-capital acronyms, which match whole words only.
+KEYWORDS = {
+    'sensitivity label': ['sensitivity label'],
+    'dlp': ['DLP'],
+    'data loss prevention': ['data loss prevention'],
+    'encryption': ['encryption'],
+    'decryption': ['decryption'],
+    'rights management': ['rights management'],
+    'rms': ['RMS'],
+    'azure information protection': ['azure information protection'],
+    'aip': ['AIP'],
+    'policy': ['policy', 'policies'],
+    'classifier': ['classifier'],
+    'edm': ['EDM'],
+    'exact data match': ['exact data match'],
+    'file explorer': ['file explorer'],
+    'office app': ['office app'],
+    'outlook': ['outlook'],
+    'teams': ['teams'],
+    'sharepoint': ['sharepoint'],
+    'onedrive': ['onedrive'],
+    'exchange': ['exchange'],
+    'auto-label': ['auto-label'],
+    'manual label': ['manual label'],
+    'default label': ['default label'],
+    'mandatory label': ['mandatory label'],
+    'downgrade': ['downgrade'],
+    'removal': ['removal'],
+    'protection': ['protection'],
+    'unprotect': ['unprotect'],
+    'metadata': ['metadata'],
+    'custom permission': ['custom permission'],
+    'co-author': ['co-author'],
+    'inheritance': ['inheritance'],
+    'container label': ['container label'],
+    'parent label': ['parent label'],
+    'sub-label': ['sub-label'],
+    'scope': ['scope'],
+    'advanced classifier': ['advanced classifier'],
+    'trainable classifier': ['trainable classifier'],
+    'sensitive info type': ['sensitive info type'],
+    'sit': ['SIT', 'SITs'],
+    'confidence level': ['confidence level'],
+    'threshold': ['threshold'],
+    'override': ['override'],
+    'justification': ['justification'],
+    'audit': ['audit'],
+    'activity explorer': ['activity explorer'],
+    'content explorer': ['content explorer'],
+    'endpoint dlp': ['endpoint DLP'],
+    'device': ['device'],
+    'mac': ['mac'],
+    'windows': ['windows'],
+    'mobile': ['mobile'],
+    'pdf': ['PDF'],
+    'double key encryption': ['double key encryption'],
+    'dke': ['DKE'],
+    'hyok': ['HYOK'],
+    'tenant key': ['tenant key'],
+    'customer managed key': ['customer managed key'],
+    'cmk': ['CMK'],
+}
+
+# Theme definitions: {theme: [indicators]}
+THEMES = {
+    "Label Visibility & Display": [
+        "not visible", "not showing", "not appear", "not display", 
+        "missing label", "label missing", "disappeared", "cannot see",
+        "file explorer", "explorer", "right-click"
+    ],
+    "Encryption & Decryption": [
+        "encrypt", "decrypt", "protection", "unprotect", "rights",
+        "RMS", "rights management", "unable to open", "access denied",
+        "permission", "co-author"
+    ],
+    "Auto-labeling & Classification": [
+        "auto-label", "automatic", "classification", "classifier",
+        "trainable", "EDM", "exact data match", "sensitive info type",
+        "SIT", "not applied automatically", "not triggering"
+    ],
+    "Label Policy & Configuration": [
+        "policy", "default label", "mandatory", "scope", "setting",
+        "configuration", "applied to", "inheritance", "parent label",
+        "sub-label", "container"
+    ],
+    "Label Modification & Downgrade": [
+        "downgrade", "removal", "remove label", "change label",
+        "override", "justification", "cannot remove", "cannot change",
+        "cannot downgrade"
+    ],
+    "Application-specific Issues": [
+        "outlook", "teams", "sharepoint", "onedrive", "office",
+        "word", "excel", "powerpoint", "PDF", "app"
+    ],
+    "Endpoint DLP": [
+        "endpoint", "device", "windows", "mac", "mobile",
+        "upload", "copy", "print", "USB"
+    ],
+    "Audit & Reporting": [
+        "audit", "activity explorer", "content explorer", "report",
+        "log", "tracking", "monitor"
+    ],
+    "Key Management": [
+        "double key", "DKE", "HYOK", "tenant key", "customer managed",
+        "CMK", "key"
     ]
-    
-    found_keywords = []
-    text_lower = text.lower()
-    
-    for pattern in keywords_patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        found_keywords.extend([m.lower() for m in matches])
-    
-    return list(set(found_keywords))
+}
 
+# Keywords and themes are tagged together in one pass over each incident
+CLASSIFIER = KeywordClassifier({'keywords': KEYWORDS, 'themes': THEMES})
 
-def categorize_incident(title, description, keywords):
-    """Categorize incident into themes based on content analysis"""
-    
-    text = f"{title} {description}".lower()
-    
-    # Theme definitions
-    themes = {
-        "Label Visibility & Display": [
-            "not visible", "not showing", "not appear", "not display", 
-            "missing label", "label missing", "disappeared", "cannot see",
-            "file explorer", "explorer", "right-click"
-        ],
-        "Encryption & Decryption": [
-            "encrypt", "decrypt", "protection", "unprotect", "rights",
-            "RMS", "rights management", "unable to open", "access denied",
-            "permission", "co-author"
-        ],
-        "Auto-labeling & Classification": [
-            "auto-label", "automatic", "classification", "classifier",
-            "trainable", "EDM", "exact data match", "sensitive info type",
-            "SIT", "not applied automatically", "not triggering"
-        ],
-        "Label Policy & Configuration": [
-            "policy", "default label", "mandatory", "scope", "setting",
-            "configuration", "applied to", "inheritance", "parent label",
-            "sub-label", "container"
-        ],
-        "Label Modification & Downgrade": [
-            "downgrade", "removal", "remove label", "change label",
-            "override", "justification", "cannot remove", "cannot change",
-            "cannot downgrade"
-        ],
-        "Application-specific Issues": [
-            "outlook", "teams", "sharepoint", "onedrive", "office",
-            "word", "excel", "powerpoint", "PDF", "app"
-        ],
-        "Endpoint DLP": [
-            "endpoint", "device", "windows", "mac", "mobile",
-            "upload", "copy", "print", "USB"
-        ],
-        "Audit & Reporting": [
-            "audit", "activity explorer", "content explorer", "report",
-            "log", "tracking", "monitor"
-        ],
-        "Key Management": [
-            "double key", "DKE", "HYOK", "tenant key", "customer managed",
-            "CMK", "key"
-        ]
-    }
-    
-    categorized_themes = []
-    
-    for theme, indicators in themes.items():
-        for indicator in indicators:
-            if indicator in text:
-                categorized_themes.append(theme)
-                break
-    
-    # If no theme found, mark as "Other"
-    if not categorized_themes:
-        categorized_themes.append("Other/Uncategorized")
-    
-    return categorized_themes
+
+def classify_incident(title, description):
+    """Key technical terms and themes of an incident, as (keywords, themes)"""
+    tags = CLASSIFIER.classify(f"{title} {description}")
+    return tags['keywords'], tags['themes'] or ["Other/Uncategorized"]
 
 
 def analyze_icm_data():
@@ -249,12 +228,9 @@ def analyze_icm_data():
                     'customer': data.get('impactedCustomers', [{}])[0].get('customerName', '') if data.get('impactedCustomers') else '',
                 }
                 
-                # Extract keywords
-                keywords = extract_keywords(f"{icm_info['title']} {icm_info['description']}")
+                # Extract keywords and categorize into themes
+                keywords, themes = classify_incident(icm_info['title'], icm_info['description'])
                 icm_info['keywords'] = keywords
-                
-                # Categorize into themes
-                themes = categorize_incident(icm_info['title'], icm_info['description'], keywords)
                 icm_info['themes'] = themes
                 
                 icm_data.append(icm_info)
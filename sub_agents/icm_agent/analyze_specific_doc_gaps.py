@@ -7,11 +7,31 @@ Created: February 11, 2026
 """
 
 import json
-import re
+import os
+import sys
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from text_tools import KeywordClassifier
+
+# Every term the gap rules below look for, matched in one pass per incident
+GAP_TERMS = KeywordClassifier({'gap_terms': {'terms': [
+    'license', 'licensing', 'add-on', 'e5', 'e3', 'which license', 'teams', 'chat', 'coverage', 'cover',
+    'metric', 'portal', 'dashboard', 'activity explorer', 'content explorer',
+    'files labeled', 'files to', 'value', '0', 'zero', 'delay', 'update',
+    'pending', 'distribution', 'policy', 'not detect', 'not block', 'not work',
+    'file size', 'large file', 'thousands of records', 'volume', 'size limit',
+    'example', 'sample', 'xml', 'rule package', 'regex', 'pattern', 'checksum', 'regular expression',
+    'url', 'whitelist', 'domain', 'query parameter', 'auth=', 'copilot',
+    'scope', 'in-transit', 'at-rest', 'exchange', 'auto',
+    'condition', 'dlp', 'document created by', 'what conditions do',
+    'dke', 'option', 'configure', 'maximum number', 'sharepoint',
+    'multiple notification', 'email', 'sent',
+]}})
+
+
 def extract_specific_gaps(icms):
     """Extract specific documentation gaps from ICM descriptions"""
     
@@ -32,10 +52,11 @@ def extract_specific_gaps(icms):
         desc = icm.get('description', '').lower()
         title = icm.get('title', '').lower()
         combined = f"{title} {desc}"
+        found = GAP_TERMS.matched_terms(combined)
         
         # Licensing gaps
-        if any(x in combined for x in ['license', 'licensing', 'add-on', 'e5', 'e3', 'which license']):
-            if 'teams' in combined and 'chat' in combined:
+        if any(x in found for x in ['license', 'licensing', 'add-on', 'e5', 'e3', 'which license']):
+            if 'teams' in found and 'chat' in found:
                 gaps["Licensing & Feature Coverage"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -43,7 +64,7 @@ def extract_specific_gaps(icms):
                     'current_state': 'No clear documentation on DLP coverage differences between E5 base and E5 Information Protection add-on for Teams chat messages',
                     'needed': 'License comparison table showing Teams chat, Teams files, and channel message coverage by license type'
                 })
-            elif 'coverage' in combined or 'cover' in combined:
+            elif 'coverage' in found or 'cover' in found:
                 gaps["Licensing & Feature Coverage"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -53,8 +74,8 @@ def extract_specific_gaps(icms):
                 })
         
         # Metrics and portal data
-        if any(x in combined for x in ['metric', 'portal', 'dashboard', 'activity explorer', 'content explorer']):
-            if 'files labeled' in combined or 'files to' in combined or 'value' in combined and ('0' in combined or 'zero' in combined):
+        if any(x in found for x in ['metric', 'portal', 'dashboard', 'activity explorer', 'content explorer']):
+            if 'files labeled' in found or 'files to' in found or 'value' in found and ('0' in found or 'zero' in found):
                 gaps["Metrics & Portal Data"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -62,7 +83,7 @@ def extract_specific_gaps(icms):
                     'current_state': 'No documentation on metric update frequency, accuracy, or known limitations',
                     'needed': 'Clear documentation on: 1) How often metrics refresh 2) Why counts may show 0 temporarily 3) Difference between portal metrics vs Activity Explorer 4) Known delays/limitations'
                 })
-            elif 'delay' in combined or 'update' in combined:
+            elif 'delay' in found or 'update' in found:
                 gaps["Metrics & Portal Data"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -72,7 +93,7 @@ def extract_specific_gaps(icms):
                 })
         
         # Policy distribution and status
-        if 'pending' in combined and ('distribution' in combined or 'policy' in combined):
+        if 'pending' in found and ('distribution' in found or 'policy' in found):
             gaps["Policy Distribution & Status"].append({
                 'icm': icm['id'],
                 'title': icm['title'][:100],
@@ -82,8 +103,8 @@ def extract_specific_gaps(icms):
             })
         
         # Size limits
-        if any(x in combined for x in ['file size', 'large file', 'thousands of records', 'volume', 'size limit']):
-            if 'not detect' in combined or 'not block' in combined or 'not work' in combined:
+        if any(x in found for x in ['file size', 'large file', 'thousands of records', 'volume', 'size limit']):
+            if 'not detect' in found or 'not block' in found or 'not work' in found:
                 gaps["Size Limits & Performance"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -93,8 +114,8 @@ def extract_specific_gaps(icms):
                 })
         
         # Configuration examples
-        if any(x in combined for x in ['example', 'sample', 'xml', 'rule package', 'regex', 'pattern']):
-            if 'checksum' in combined:
+        if any(x in found for x in ['example', 'sample', 'xml', 'rule package', 'regex', 'pattern']):
+            if 'checksum' in found:
                 gaps["Configuration Examples"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -102,7 +123,7 @@ def extract_specific_gaps(icms):
                     'current_state': 'Documentation explains concepts but lacks working XML examples',
                     'needed': 'Complete working XML examples for: 1) Lead digit replacement 2) Two-digit number handling 3) Post-computation replacement 4) Common checksum algorithms'
                 })
-            elif 'regex' in combined or 'regular expression' in combined:
+            elif 'regex' in found or 'regular expression' in found:
                 gaps["Configuration Examples"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -112,8 +133,8 @@ def extract_specific_gaps(icms):
                 })
         
         # URL and pattern matching
-        if 'url' in combined or 'whitelist' in combined or 'domain' in combined:
-            if 'query parameter' in combined or '?' in desc or 'auth=' in combined or 'copilot' in combined:
+        if 'url' in found or 'whitelist' in found or 'domain' in found:
+            if 'query parameter' in found or '?' in desc or 'auth=' in found or 'copilot' in found:
                 gaps["URL & Pattern Matching"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -123,8 +144,8 @@ def extract_specific_gaps(icms):
                 })
         
         # Feature scope and behavior
-        if 'scope' in combined or 'in-transit' in combined or 'at-rest' in combined:
-            if 'exchange' in combined and 'auto' in combined:
+        if 'scope' in found or 'in-transit' in found or 'at-rest' in found:
+            if 'exchange' in found and 'auto' in found:
                 gaps["Feature Scope & Behavior"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -134,8 +155,8 @@ def extract_specific_gaps(icms):
                 })
         
         # DLP conditions
-        if 'condition' in combined and 'dlp' in combined:
-            if 'document created by' in combined or 'what conditions do' in combined:
+        if 'condition' in found and 'dlp' in found:
+            if 'document created by' in found or 'what conditions do' in found:
                 gaps["Feature Scope & Behavior"].append({
                     'icm': icm['id'],
                     'title': icm['title'][:100],
@@ -145,7 +166,7 @@ def extract_specific_gaps(icms):
                 })
         
         # UI/UX clarity
-        if 'dke' in combined and ('option' in combined or 'configure' in combined):
+        if 'dke' in found and ('option' in found or 'configure' in found):
             gaps["UI/UX Clarity"].append({
                 'icm': icm['id'],
                 'title': icm['title'][:100],
@@ -155,7 +176,7 @@ def extract_specific_gaps(icms):
             })
         
         # Site/URL limits
-        if 'maximum number' in combined and 'sharepoint' in combined:
+        if 'maximum number' in found and 'sharepoint' in found:
             gaps["Configuration Examples"].append({
                 'icm': icm['id'],
                 'title': icm['title'][:100],
@@ -165,7 +186,7 @@ def extract_specific_gaps(icms):
             })
         
         # Notification behavior
-        if 'multiple notification' in combined or 'email' in combined and 'sent' in combined:
+        if 'multiple notification' in found or 'email' in found and 'sent' in found:
             gaps["Feature Scope & Behavior"].append({
                 'icm': icm['id'],
                 'title': icm['title'][:100],
@@ -1,16 +1,24 @@
 """
 Fetch ICM Details for Expanded By-Design Analysis
 
-Batch fetches ICM details via MCP for 180-day By-Design dataset
+Batch fetches ICM details via MCP for 180-day By-Design dataset. Details are
+fetched concurrently (see icm_tools.ICMFetcher) and checkpointed as they
+arrive, so an interrupted run picks up where it stopped.
 
 Author: Carter Ryan
 Created: February 11, 2026
 """
 
+import argparse
 import json
-import time
+import os
+import sys
 from pathlib import Path
-from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from icm_tools import ICMFetcher, get_backend, progress_printer
+
+CHECKPOINT_FILE = Path(__file__).parent / "data" / "expanded_by_design_icm_details.jsonl"
 
 
 def load_icm_ids():
@@ -43,7 +51,29 @@ def save_icm_details(all_details):
     return output_file
 
 
+def write_fetch_list(icm_ids_to_fetch):
+    """Save the IDs still to fetch, for fetching by hand through the ICM MCP"""
+    fetch_list_file = Path(__file__).parent / "data" / "icms_to_fetch.txt"
+    with open(fetch_list_file, 'w') as f:
+        for icm_id in icm_ids_to_fetch:
+            f.write(f"{icm_id}\n")
+    
+    return fetch_list_file
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Fetch ICM details for the expanded By-Design dataset")
+    parser.add_argument('--backend', choices=['http', 'file'], default='http',
+                        help="http: ICM MCP endpoint ($ICM_MCP_TOKEN); file: saved details (--source)")
+    parser.add_argument('--source', help="Saved details for --backend file (folder, JSON or JSONL)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight")
+    parser.add_argument('--rate', type=float, default=20.0, help="Requests per second")
+    parser.add_argument('--list-only', action='store_true',
+                        help="Only write data/icms_to_fetch.txt for fetching by hand (process_batch_results.py)")
+    args = parser.parse_args()
+    if args.backend == 'file' and not args.source:
+        parser.error("--backend file needs --source")
+    
     print("="*80)
     print("FETCHING ICM DETAILS - EXPANDED BY-DESIGN DATASET")
     print("="*80)
@@ -70,22 +100,30 @@ def main():
     print(f"🔍 Need to fetch {len(icm_ids_to_fetch)} new ICMs")
     print()
     
-    # Save the list for MCP fetching
-    fetch_list_file = Path(__file__).parent / "data" / "icms_to_fetch.txt"
-    with open(fetch_list_file, 'w') as f:
-        for icm_id in icm_ids_to_fetch:
-            f.write(f"{icm_id}\n")
+    if args.list_only:
+        print(f"💾 Saved fetch list to: {write_fetch_list(icm_ids_to_fetch)}")
+        return
     
-    print(f"💾 Saved fetch list to: {fetch_list_file}")
-    print()
-    print("="*80)
-    print("NEXT STEPS")
-    print("="*80)
-    print()
-    print("The agent will now fetch details for each ICM using the ICM MCP.")
-    print(f"This will require {len(icm_ids_to_fetch)} individual MCP calls.")
+    backend = get_backend('file', source=args.source) if args.backend == 'file' else get_backend('http')
+    fetcher = ICMFetcher(backend, concurrency=args.concurrency, rate=args.rate, checkpoint=CHECKPOINT_FILE)
+    results = fetcher.fetch_all(icm_ids_to_fetch, on_result=progress_printer(len(icm_ids_to_fetch)))
+    
+    failed = []
+    for icm_id, result in results.items():
+        if result.error is None:
+            existing_details[str(icm_id)] = result.data
+        else:
+            failed.append(icm_id)
+    
+    output_file = save_icm_details(existing_details)
     print()
-    print("Progress will be shown as details are fetched.")
+    print(f"💾 Saved {len(existing_details)} ICM details to: {output_file}")
+    
+    if failed:
+        print(f"❌ {len(failed)} ICMs failed; rerun to retry them")
+        write_fetch_list(failed)
+    else:
+        print("🎉 All ICMs fetched successfully!")
     print()
 
 
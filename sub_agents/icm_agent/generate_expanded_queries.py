@@ -8,15 +8,40 @@ Created: February 11, 2026
 
 import sys
 import os
+import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import pandas as pd
+
 # Add the icm_agent directory to path
 sys.path.insert(0, r'c:\Users\carterryan\OneDrive - Microsoft\PHEPy\sub_agents\icm_agent')
+sys.path.insert(0, str(Path(__file__).parent))
 from icm_agent import ICMAgent
 
 
+def execute_all(agent, all_queries, output_file):
+    """Run every team query concurrently and save the combined results"""
+    print(f"\n🚀 Executing {len(all_queries)} queries in parallel ({agent.query_backend or 'default'} backend)")
+    print("-"*80)
+    results = agent.execute_queries(all_queries)
+    
+    frames = [df.assign(QueryTeam=team) for team, df in results.items() if not df.empty]
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    combined.to_json(output_file, orient='records', indent=2, date_format='iso')
+    
+    print(f"\n✅ {len(results)}/{len(all_queries)} queries succeeded, {len(combined)} ICMs")
+    print(f"📁 Results: {output_file}")
+    return len(results) == len(all_queries)
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Generate (and optionally execute) expanded By-Design queries')
+    parser.add_argument('--backend', choices=['kusto', 'mcp', 'local'],
+                        help='Execute all team queries in parallel with this backend')
+    args = parser.parse_args()
+    
     print("="*80)
     print("EXPANDED BY-DESIGN ANALYSIS - MIP/DLP/ENCRYPTION")
     print("="*80)
@@ -52,7 +77,7 @@ def main():
     ]
     
     # Initialize agent
-    agent = ICMAgent()
+    agent = ICMAgent(query_backend=args.backend)
     
     print("\n📋 Generating ICM Queries for MIP/DLP/Encryption Teams")
     print("-"*80)
@@ -78,6 +103,12 @@ def main():
         print(f"✓ Generated query for {team}")
         print(f"  File: {query_file.name}")
     
+    if agent.get_executor() is not None:
+        output_file = Path(__file__).parent / "data" / "expanded_by_design_180days_results.json"
+        ok = execute_all(agent, all_queries, output_file)
+        print("\nNext step: python analyze_expanded_by_design.py")
+        return 0 if ok else 1
+    
     print("\n" + "="*80)
     print("📊 QUERY EXECUTION INSTRUCTIONS")
     print("="*80)
@@ -243,4 +274,4 @@ This will generate:
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
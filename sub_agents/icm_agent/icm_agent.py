@@ -9,27 +9,42 @@ Created: February 5, 2026
 """
 
 import os
+import sys
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
-from collections import defaultdict
 import pandas as pd
 
+# Shared query execution lives in <repo>/kusto_tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+try:
+    from kusto_tools import QueryExecutor, QueryRequest, default_backend, default_cache, print_progress
+    QUERY_EXECUTION_AVAILABLE = True
+except ImportError:
+    QUERY_EXECUTION_AVAILABLE = False
+
+from theme_clustering import assign_themes
+
 
 class ICMAgent:
     """Agent for analyzing ICM incidents and identifying patterns."""
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, query_backend: str = None):
         """
         Initialize the ICM Agent.
         
         Args:
             config_path: Path to configuration file
+            query_backend: Query backend ('kusto', 'mcp' or 'local'); defaults to the
+                config's "query_backend" or $PHEPY_QUERY_BACKEND. Without one,
+                queries are printed for manual execution.
         """
         self.config_path = config_path or os.path.join(
             os.path.dirname(__file__), 'icm_config.json'
         )
         self.config = self._load_config()
+        self.query_backend = query_backend or self.config.get('query_backend')
+        self._executor = None
         self.incidents_data = None
         self.analysis_results = {}
         
@@ -157,12 +172,40 @@ Incidents
 """
         return query
     
+    def get_executor(self):
+        """Shared query executor (with result cache) for the configured backend, or None if none is configured"""
+        if self._executor is None and QUERY_EXECUTION_AVAILABLE:
+            backend = default_backend(self.query_backend)
+            if backend is not None:
+                self._executor = QueryExecutor(backend, cache=default_cache())
+        return self._executor
+    
+    def execute_queries(self, queries: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+        """
+        Execute several queries concurrently on the configured backend.
+        
+        Args:
+            queries: {name: KQL query}
+        
+        Returns:
+            {name: DataFrame} for the queries that succeeded (failures are reported)
+        """
+        executor = self.get_executor()
+        if executor is None:
+            raise RuntimeError("No query backend configured (use --backend or set PHEPY_QUERY_BACKEND)")
+        
+        cluster = self.config.get('cluster_url')
+        database = self.config.get('database')
+        requests = [QueryRequest(name, query, cluster, database) for name, query in queries.items()]
+        results = executor.execute_many(requests, on_result=print_progress)
+        return {name: result.data for name, result in results.items() if result.error is None}
+    
     def execute_query_mcp(self, query: str, max_rows: int = 1000) -> pd.DataFrame:
         """
-        Execute query via MCP Kusto tool.
+        Execute query via the configured query backend (Kusto, MCP or local).
         
-        Note: This requires the MCP Kusto server to be available.
-        For standalone execution, save query results to file first.
+        Without a backend the query is printed for execution with the MCP
+        Kusto tool; save the results to file and load them with load_from_file().
         
         Args:
             query: KQL query to execute
@@ -171,6 +214,12 @@ Incidents
         Returns:
             DataFrame with results
         """
+        executor = self.get_executor()
+        if executor is not None:
+            df = executor.execute(query, self.config.get('cluster_url'), self.config.get('database'))
+            print(f"Query returned {len(df)} rows")
+            return df.head(max_rows)
+        
         print("\n" + "="*70)
         print("KUSTO QUERY READY FOR EXECUTION")
         print("="*70)
@@ -214,22 +263,6 @@ Incidents
             print(f"Error loading from file: {e}")
             return pd.DataFrame()
     
-    def _extract_keywords(self, text: str) -> List[str]:
-        """Extract key terms from title for theme clustering."""
-        if not text or not isinstance(text, str):
-            return []
-        
-        # Common words to exclude
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-                     'of', 'with', 'by', 'from', 'not', 'is', 'are', 'was', 'were', 'be',
-                     'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-                     'would', 'should', 'could', 'may', 'might', 'must', 'can', 'cannot'}
-        
-        # Extract words, remove common terms
-        words = text.lower().split()
-        keywords = [w for w in words if len(w) > 3 and w not in stop_words]
-        return keywords[:5]  # Top 5 keywords
-    
     def _get_deep_insights_from_icm(self, df: pd.DataFrame) -> Dict[str, Any]:
         """
         Use ICM MCP to get deeper insights on sample incidents.
@@ -469,88 +502,38 @@ Format your response with clear sections for Documentation, UI/UX, and Product C
             return {"error": "No data loaded"}
         
         df = self.incidents_data
+        themes = assign_themes(df)
+        
+        incidents = pd.DataFrame({
+            'theme': themes,
+            'title': df['Title'],
+            'count': df['Count'].astype(int),
+            'customers': df['AffectedCustomers'].astype(int),
+            'sample_incidents': df['SampleIncidents'] if 'SampleIncidents' in df else [[]] * len(df),
+            'is_recurring': df['IsRecurring'] if 'IsRecurring' in df else 'No',
+        }).dropna(subset=['theme'])
+        incidents = incidents.sort_values(['theme', 'count', 'title'], ascending=[True, False, True], kind='stable')
+        
+        records = incidents.drop(columns='theme').to_dict('records')
+        totals = incidents.groupby('theme', sort=False).agg(
+            total_incidents=('count', 'sum'), total_customers=('customers', 'sum'), size=('title', 'size'))
         
-        # Extract keywords from each title
-        df['Keywords'] = df['Title'].apply(self._extract_keywords)
-        
-        # Group incidents by common keywords
-        theme_groups = defaultdict(lambda: {
-            'incidents': [],
-            'total_count': 0,
-            'total_customers': 0,
-            'sample_titles': []
-        })
-        
-        # Build themes based on keyword overlap
-        keyword_to_theme = {}
-        theme_id = 0
-        
-        for idx, row in df.iterrows():
-            keywords = row['Keywords']
-            if not keywords:
-                continue
-            
-            # Find existing theme with overlapping keywords
-            matched_theme = None
-            for kw in keywords:
-                if kw in keyword_to_theme:
-                    matched_theme = keyword_to_theme[kw]
-                    break
-            
-            # Create new theme if no match
-            if matched_theme is None:
-                matched_theme = f"Theme_{theme_id}"
-                theme_id += 1
-                # Register all keywords to this theme
-                for kw in keywords:
-                    keyword_to_theme[kw] = matched_theme
-            
-            # Add incident to theme
-            theme_groups[matched_theme]['incidents'].append({
-                'title': row['Title'],
-                'count': int(row['Count']),
-                'customers': int(row['AffectedCustomers']),
-                'sample_incidents': row.get('SampleIncidents', []),
-                'is_recurring': row.get('IsRecurring', 'No')
-            })
-            theme_groups[matched_theme]['total_count'] += int(row['Count'])
-            theme_groups[matched_theme]['total_customers'] += int(row['AffectedCustomers'])
-            
-            if len(theme_groups[matched_theme]['sample_titles']) < 3:
-                theme_groups[matched_theme]['sample_titles'].append(row['Title'])
-        
-        # Generate human-readable theme names
         themes_with_names = {}
-        for theme_id, theme_data in theme_groups.items():
-            # Get most common keywords across incidents in theme
-            all_keywords = []
-            for incident in theme_data['incidents']:
-                title = incident['title']
-                all_keywords.extend(self._extract_keywords(title))
-            
-            # Count keyword frequency
-            keyword_counts = defaultdict(int)
-            for kw in all_keywords:
-                keyword_counts[kw] += 1
-            
-            # Top 3 keywords form the theme name
-            top_keywords = sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            theme_name = " / ".join([kw.title() for kw, _ in top_keywords])
-            
+        start = 0
+        for theme_name, total in totals.iterrows():
+            members = records[start:start + total['size']]
+            start += total['size']
             themes_with_names[theme_name] = {
-                'total_incidents': theme_data['total_count'],
-                'unique_issue_types': len(theme_data['incidents']),
-                'total_customers_affected': theme_data['total_customers'],
-                'incidents': sorted(theme_data['incidents'], 
-                                  key=lambda x: x['count'], 
-                                  reverse=True),
-                'sample_titles': theme_data['sample_titles'][:3]
+                'total_incidents': int(total['total_incidents']),
+                'unique_issue_types': len(members),
+                'total_customers_affected': int(total['total_customers']),
+                'incidents': members,
+                'sample_titles': [m['title'] for m in members[:3]]
             }
         
         # Sort themes by total incident count
         sorted_themes = dict(sorted(themes_with_names.items(), 
-                                   key=lambda x: x[1]['total_incidents'], 
-                                   reverse=True))
+                                   key=lambda x: (-x[1]['total_incidents'], x[0])))
         
         return {
             'total_themes': len(sorted_themes),
@@ -1198,6 +1181,9 @@ td {{
         if from_file:
             # Load from file
             self.load_from_file(from_file)
+        elif self.get_executor() is not None:
+            query = self.get_by_design_query(team_name, days_back)
+            self.incidents_data = self.execute_query_mcp(query, max_rows=100000)
         else:
             # Generate query for manual execution
             query = self.get_by_design_query(team_name, days_back)
@@ -1276,11 +1262,16 @@ def main():
         type=str,
         help='Path to configuration file'
     )
+    parser.add_argument(
+        '--backend',
+        choices=['kusto', 'mcp', 'local'],
+        help='Execute queries with this backend instead of printing them'
+    )
     
     args = parser.parse_args()
     
     # Initialize agent
-    agent = ICMAgent(config_path=args.config)
+    agent = ICMAgent(config_path=args.config, query_backend=args.backend)
     
     try:
         results = agent.run_by_design_analysis(
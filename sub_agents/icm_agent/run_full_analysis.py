@@ -8,13 +8,70 @@ Created: February 11, 2026
 
 import sys
 import os
+import json
+import argparse
 from pathlib import Path
 from datetime import datetime
 
 # Add icm_agent to path
 sys.path.insert(0, str(Path(__file__).parent))
 
+
+def id_query(query):
+    """
+    The team query cut before its summarize, listing every IncidentId
+    
+    The saved queries summarize by Title and keep only 3 IDs per title in
+    SampleIncidents; the full analysis needs all of them.
+    """
+    head, found, _ = query.partition("| summarize")
+    return f"{head.rstrip()}\n| distinct IncidentId\n" if found else query
+
+
+def result_icm_ids(df):
+    """IncidentIds from a result: its IncidentId column, else the SampleIncidents lists"""
+    if 'IncidentId' in df.columns:
+        return {str(i) for i in df['IncidentId'].dropna().astype('int64')}
+    icm_ids = set()
+    if 'SampleIncidents' in df.columns:
+        for sample in df['SampleIncidents'].dropna():
+            if isinstance(sample, str):
+                sample = json.loads(sample)  # Dynamic column exported as JSON text
+            icm_ids.update(str(int(i)) for i in sample)
+    return icm_ids
+
+
+def fetch_icm_ids(query_files, backend, icm_ids_file):
+    """Run the team queries in parallel and save the IncidentIds they return"""
+    from icm_agent import ICMAgent
+    agent = ICMAgent(query_backend=backend)
+    queries = {f.stem: id_query(f.read_text()) for f in query_files}
+    
+    print(f"🚀 Executing {len(queries)} queries in parallel ({backend} backend)")
+    results = agent.execute_queries(queries)
+    
+    icm_ids = set()
+    for df in results.values():
+        icm_ids.update(result_icm_ids(df))
+    
+    if not icm_ids:
+        print(f"⚠️  {len(results)}/{len(queries)} queries succeeded but returned no ICM IDs; "
+              f"keeping {icm_ids_file.name} as it was")
+        print()
+        return
+    icm_ids_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(icm_ids_file, 'w') as f:
+        f.write("".join(f"{i}\n" for i in sorted(icm_ids, key=int)))
+    print(f"✓ {len(results)}/{len(queries)} queries succeeded, {len(icm_ids)} unique ICM IDs saved")
+    print()
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Full end-to-end By-Design ICM analysis')
+    parser.add_argument('--backend', choices=['kusto', 'mcp', 'local'],
+                        help='Execute the team queries in parallel with this backend')
+    args = parser.parse_args()
+    
     print("="*80)
     print("FULL END-TO-END BY-DESIGN ICM ANALYSIS")
     print("="*80)
@@ -80,30 +137,33 @@ def main():
     print(f"✓ Found {len(query_files)} query files")
     print()
     
-    print("="*80)
-    print("⚠️  MANUAL STEP REQUIRED - EXECUTE KUSTO QUERIES")
-    print("="*80)
-    print()
-    print("To continue, you need to execute the KQL queries to get ICM IDs:")
-    print()
-    print("OPTION 1: Use Kusto MCP Tool")
-    print("-" * 40)
-    print("Execute queries in: queries/expanded_by_design_180days/")
-    print("Against: https://icmcluster.kusto.windows.net")
-    print("Database: IcMDataWarehouse")
-    print()
-    print("OPTION 2: Provide ICM IDs Directly")
-    print("-" * 40)
-    print("If you have ICM IDs from another source, save them to:")
-    print("  data/expanded_by_design_icm_ids.txt")
-    print("  (One ICM ID per line)")
-    print()
-    print("="*80)
-    print()
-    
-    # Check if we have ICM IDs
     icm_ids_file = Path(__file__).parent / "data" / "expanded_by_design_icm_ids.txt"
     
+    if args.backend:
+        fetch_icm_ids(query_files, args.backend, icm_ids_file)
+    else:
+        print("="*80)
+        print("⚠️  MANUAL STEP REQUIRED - EXECUTE KUSTO QUERIES")
+        print("="*80)
+        print()
+        print("To continue, you need to execute the KQL queries to get ICM IDs:")
+        print()
+        print("OPTION 1: Use Kusto MCP Tool")
+        print("-" * 40)
+        print("Execute queries in: queries/expanded_by_design_180days/")
+        print("Against: https://icmcluster.kusto.windows.net")
+        print("Database: IcMDataWarehouse")
+        print()
+        print("OPTION 2: Provide ICM IDs Directly")
+        print("-" * 40)
+        print("If you have ICM IDs from another source, save them to:")
+        print("  data/expanded_by_design_icm_ids.txt")
+        print("  (One ICM ID per line)")
+        print()
+        print("="*80)
+        print()
+    
+    # Check if we have ICM IDs
     if icm_ids_file.exists():
         print("✓ Found ICM IDs file!")
         with open(icm_ids_file, 'r') as f:
@@ -0,0 +1,228 @@
+"""
+Theme clustering for by-design incidents
+
+Groups incidents with similar titles (and descriptions, when the data has
+them) into themes using MinHash signatures and locality-sensitive hashing:
+
+1. Each incident becomes a set of keywords (stop words and short words dropped)
+2. A MinHash signature per incident estimates keyword-set similarity (Jaccard)
+3. Incidents that share a band of their signature are candidates, kept when
+   at least THRESHOLD similar
+4. Greedy star clustering: the best-connected incident not yet in a theme
+   starts one and takes its similar neighbours. Every member is directly
+   similar to its theme's centre, so themes can't drift through chains of
+   near matches the way connected components do
+
+All steps are vectorised with numpy/pandas and run in near-linear time
+(100k incidents cluster in seconds). Hashes are seeded and incidents are put
+in a canonical order first, so the same incidents always give the same
+themes, whatever order the query returned them in.
+
+Author: Carter Ryan
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'not', 'is', 'are', 'was', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'should', 'could', 'may', 'might', 'must', 'can', 'cannot',
+    'this', 'that', 'when', 'after', 'into', 'than', 'then', 'there', 'their',
+    'they', 'what', 'which', 'while', 'also', 'only', 'some', 'such', 'able',
+})
+WORD_PATTERN = r"[a-z0-9]+(?:['\-][a-z0-9]+)*"
+MIN_WORD_LENGTH = 4
+
+DESCRIPTION_COLUMNS = ['Description', 'Summary']
+MAX_DESCRIPTION_WORDS = 40  # Keep long descriptions from drowning out the title
+
+NUM_PERM = 63
+BANDS = 21          # 21 bands of 3 rows: 40% similar pairs become candidates 75% of the time, 60% similar 99%
+THRESHOLD = 0.4     # Estimated Jaccard similarity needed to join a theme
+SEED = 20260205
+
+
+def extract_keywords(texts: pd.Series, max_words: int = None) -> pd.DataFrame:
+    """
+    Keywords of each text as (row, keyword, position) rows, one per distinct
+    keyword, position being where it first appears among the text's keywords
+    
+    Args:
+        texts: Text per incident (index ignored; row is the position)
+        max_words: Only use the first max_words keywords of each text
+    """
+    words = (texts.reset_index(drop=True).fillna('').astype(str)
+             .str.lower().str.findall(WORD_PATTERN).explode().dropna())
+    words = words[(words.str.len() >= MIN_WORD_LENGTH) & ~words.isin(STOP_WORDS) & ~words.str.isdigit()]
+    pairs = pd.DataFrame({'row': words.index.to_numpy(dtype=np.int64), 'keyword': words.to_numpy(dtype=object)})
+    pairs['position'] = pairs.groupby('row').cumcount()
+    if max_words is not None:
+        pairs = pairs[pairs['position'] < max_words]
+    return pairs.drop_duplicates(['row', 'keyword'], ignore_index=True)
+
+
+def minhash_signatures(pairs: pd.DataFrame, n_rows: int, num_perm: int = NUM_PERM,
+                       seed: int = SEED) -> np.ndarray:
+    """
+    MinHash signature (n_rows x num_perm, uint32) of each row's keyword set
+    
+    Rows without keywords get an all-max signature; leave them out of clustering.
+    """
+    codes, vocabulary = pd.factorize(pairs['keyword'])
+    keyword_hash = pd.util.hash_array(np.asarray(vocabulary, dtype=object))  # Stable across runs
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        # Multiply-shift hashing, one function (row) per permutation
+        table = ((a[:, None] * keyword_hash + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+    
+    signatures = np.full((n_rows, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    if pairs.empty:
+        return signatures
+    rows = pairs['row'].to_numpy()
+    order = np.argsort(rows, kind='stable')
+    rows, codes = rows[order], codes[order]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    for k in range(num_perm):
+        signatures[rows[starts], k] = np.minimum.reduceat(table[k][codes], starts)
+    return signatures
+
+
+def _band_keys(block: np.ndarray) -> np.ndarray:
+    """One uint64 key per row of a signature band"""
+    keys = np.zeros(len(block), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in block.T:
+            keys = keys * np.uint64(0x100000001B3) ^ column.astype(np.uint64)
+    return keys
+
+
+def _star_clusters(n: int, src: np.ndarray, dst: np.ndarray, similarity: np.ndarray) -> np.ndarray:
+    """
+    Centre index per node: nodes in order of degree (then index) become a
+    centre unless already covered; each other node joins its most similar
+    adjacent centre
+    """
+    a = np.concatenate([src, dst])
+    b = np.concatenate([dst, src])
+    s = np.concatenate([similarity, similarity])
+    order = np.argsort(a, kind='stable')
+    a, b, s = a[order], b[order], s[order]
+    offsets = np.searchsorted(a, np.arange(n + 1))
+    
+    ranking = np.lexsort((np.arange(n), -np.diff(offsets)))
+    covered = np.zeros(n, dtype=bool)
+    is_centre = np.zeros(n, dtype=bool)
+    for node in ranking:
+        if covered[node]:
+            continue
+        is_centre[node] = True
+        covered[node] = True
+        covered[b[offsets[node]:offsets[node + 1]]] = True
+    
+    rank = np.empty(n, dtype=np.int64)
+    rank[ranking] = np.arange(n)
+    labels = np.where(is_centre, np.arange(n), -1)
+    member = is_centre[b] & ~is_centre[a]
+    a, b, s = a[member], b[member], s[member]
+    best = np.lexsort((rank[b], -s, a))
+    a, b = a[best], b[best]
+    first = np.r_[True, a[1:] != a[:-1]] if len(a) else np.array([], dtype=bool)
+    labels[a[first]] = b[first]
+    return labels
+
+
+def lsh_clusters(signatures: np.ndarray, bands: int = BANDS, threshold: float = THRESHOLD) -> np.ndarray:
+    """
+    Cluster label per signature row
+    
+    Within each band bucket every member is compared with the bucket's first
+    member only, so the work is linear in the number of rows. The pairs that
+    pass the threshold are grouped by star clustering.
+    """
+    n, num_perm = signatures.shape
+    width = num_perm // bands
+    index = np.arange(n, dtype=np.int64)
+    candidates = []
+    for band in range(bands):
+        codes, _ = pd.factorize(_band_keys(signatures[:, band * width:(band + 1) * width]))
+        _, first = np.unique(codes, return_index=True)
+        representative = first[codes]
+        candidate = representative != index
+        candidates.append(index[candidate] * n + representative[candidate])
+    
+    src, dst = np.divmod(np.unique(np.concatenate(candidates)), n)
+    similarity = (signatures[src] == signatures[dst]).mean(axis=1)
+    keep = similarity >= threshold
+    return _star_clusters(n, src[keep], dst[keep], similarity[keep])
+
+
+def _theme_names(pairs: pd.DataFrame, labels: np.ndarray, top_n: int = 3) -> dict:
+    """
+    Name per cluster: its top_n most common keywords ("Sensitivity / Label / Visible"),
+    ties going to keywords nearer the start of the titles
+    """
+    counts = (pairs.assign(cluster=labels[pairs['row'].to_numpy()])
+              .groupby(['cluster', 'keyword'])['position'].agg(['size', 'mean']).reset_index()
+              .sort_values(['cluster', 'size', 'mean', 'keyword'], ascending=[True, False, True, True]))
+    top = counts.groupby('cluster').head(top_n)
+    names = top.groupby('cluster', sort=False)['keyword'].agg(lambda kws: " / ".join(kw.title() for kw in kws))
+    return names.to_dict()
+
+
+def assign_themes(df: pd.DataFrame, title_column: str = 'Title',
+                  description_columns: List[str] = None, threshold: float = THRESHOLD) -> pd.Series:
+    """
+    Theme name for each incident (NaN where it has no keywords)
+    
+    Args:
+        df: Incidents, one row per title (as returned by the by-design query)
+        title_column: Column clustered on and used to name themes
+        description_columns: Extra text columns to cluster on; defaults to
+            whichever of Description/Summary the data has
+        threshold: Estimated keyword similarity needed to join a theme
+    
+    Returns:
+        Series aligned with df.index; names are unique per theme
+    """
+    if description_columns is None:
+        description_columns = [c for c in DESCRIPTION_COLUMNS if c in df.columns]
+    if df.empty:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+    
+    # Cluster each distinct text once, in sorted order, so themes don't depend
+    # on row order or on duplicate titles (e.g. the same title from two teams)
+    text_columns = [title_column] + description_columns
+    texts = df[text_columns].fillna('').astype(str)
+    distinct = texts.drop_duplicates().sort_values(text_columns, kind='stable', ignore_index=True)
+    text_row = pd.MultiIndex.from_frame(distinct).get_indexer(pd.MultiIndex.from_frame(texts))
+    
+    title_pairs = extract_keywords(distinct[title_column])
+    pairs = [title_pairs] + [extract_keywords(distinct[c], MAX_DESCRIPTION_WORDS) for c in description_columns]
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates(['row', 'keyword'], ignore_index=True)
+    
+    # Only texts with keywords are clustered
+    rows = np.unique(pairs['row'].to_numpy())
+    position = np.full(len(distinct), -1)
+    position[rows] = np.arange(len(rows))
+    pairs = pairs.assign(row=position[pairs['row'].to_numpy()])
+    title_pairs = title_pairs.assign(row=position[title_pairs['row'].to_numpy()])
+    labels = lsh_clusters(minhash_signatures(pairs, len(rows)), threshold=threshold)
+    
+    names = _theme_names(title_pairs, labels)
+    # Unique names: larger themes keep the plain name
+    sizes = pd.Series(labels).value_counts()
+    seen = {}
+    for cluster in sorted(sizes.index, key=lambda c: (-sizes[c], c)):
+        name = names.get(cluster, "Untitled")
+        seen[name] = seen.get(name, 0) + 1
+        names[cluster] = name if seen[name] == 1 else f"{name} ({seen[name]})"
+    
+    themes = np.full(len(distinct), np.nan, dtype=object)
+    themes[rows] = [names[cluster] for cluster in labels]
+    return pd.Series(themes[text_row], index=df.index, dtype=object)
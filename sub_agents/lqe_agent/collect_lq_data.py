@@ -13,6 +13,8 @@ Usage:
 import json
 from pathlib import Path
 
+from lqe_queries import detailed_escalation_query
+
 # Instructions for manual data collection
 INSTRUCTIONS = """
 =============================================================================
@@ -26,47 +28,7 @@ Database: IcMDataWarehouse
 
 Query:
 ------
-let escalationInformation = IncidentsDedupView
-| where OwningTenantName == "Purview"
-| where ResolveDate > ago(30d)
-| where IncidentType == "CustomerReported"
-| extend FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)
-| project ResolveDate, FiscalWeek, IncidentId, SourceCreatedBy, OwningTeamName, 
-    Title, Severity, RoutingId, IcMId, CustomerSegment;
-let qualityInformation =
-IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Quality"
-| project IncidentId, EscalationQuality = Value;
-let supportReviews = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation quality standards"
-| project IncidentId, QualityReviewFalsePositive = Value;
-let qualityReasons = IncidentCustomFieldEntriesDedupView
-| where Name == "Low Quality Reason"
-| project IncidentId, LowQualityReason = Value;
-escalationInformation
-| join kind=inner (qualityInformation) on IncidentId
-| join kind=leftouter (supportReviews) on IncidentId
-| join kind=leftouter (qualityReasons) on IncidentId
-| where EscalationQuality != "All Data Provided"
-| where QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive)
-| extend IsTrueLowQuality = true
-| project 
-    IncidentId,
-    IcMId,
-    RoutingId,
-    Title,
-    Severity,
-    CreatedBy = SourceCreatedBy,
-    OwningTeam = OwningTeamName,
-    ResolveDate,
-    FiscalWeek,
-    EscalationQuality,
-    LowQualityReason,
-    QualityReviewFalsePositive,
-    CustomerSegment,
-    IsTrueLowQuality
-| order by ResolveDate desc, OwningTeam asc
-------
+""" + detailed_escalation_query(days_back=30) + """------
 
 Step 2: Export the results to JSON format
 
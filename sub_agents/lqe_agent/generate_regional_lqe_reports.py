@@ -18,6 +18,14 @@ import pandas as pd
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+try:
+    from kusto_tools import QueryExecutor, default_backend, default_cache
+    QUERY_EXECUTION_AVAILABLE = True
+except ImportError:
+    QUERY_EXECUTION_AVAILABLE = False
+
+from lqe_queries import unassigned_query
 
 # Not importing LowQualityEscalationAgent - self-contained generator
 
@@ -25,13 +33,32 @@ sys.path.insert(0, str(Path(__file__).parent))
 class RegionalLQEReportGenerator:
     """Generate region-specific LQE reports."""
     
-    def __init__(self, config_path: str = None):
+    def __init__(self, config_path: str = None, query_backend: str = None):
         """Initialize the regional report generator."""
         self.config_path = config_path or os.path.join(
             os.path.dirname(__file__), 'config', 'regional_reviewers_config.json'
         )
         self.regional_config = self._load_regional_config()
+        self.query_backend = query_backend
+    
+    def fetch_14day_data(self) -> List[Dict]:
+        """
+        Run the 14-day query on the configured backend (results are cached).
+        
+        Returns:
+            Escalation records, or None if no query backend is configured
+        """
+        if not QUERY_EXECUTION_AVAILABLE:
+            return None
+        backend = default_backend(self.query_backend)
+        if backend is None:
+            return None
         
+        print(f"Executing 14-day query via {backend.name}...")
+        df = QueryExecutor(backend, cache=default_cache()).execute(self.get_14day_kusto_query())
+        # Same shape as a saved JSON export
+        return json.loads(df.to_json(orient='records', date_format='iso'))
+    
     def _load_regional_config(self) -> Dict:
         """Load regional reviewer configuration."""
         if not os.path.exists(self.config_path):
@@ -49,87 +76,12 @@ class RegionalLQEReportGenerator:
     
     def get_14day_kusto_query(self) -> str:
         """
-        Get the Kusto query for last 7 days of unassigned low quality escalations.
+        Get the Kusto query for last 14 days of unassigned low quality escalations.
         
         Returns:
             Kusto query string
         """
-        return """
-let escalationInformation = IncidentsDedupView
-| where OwningTenantName == "Purview"
-| where ResolveDate > ago(14d)
-| where IncidentType == "CustomerReported"
-| extend FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)
-| project ResolveDate, FiscalWeek, IncidentId, SourceCreatedBy, OwningTeamName, 
-    Title, Severity, RoutingId, IcMId, CustomerSegment, SourceOrigin, ImpactStartDate;
-let qualityInformation =
-IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Quality"
-| project IncidentId, EscalationQuality = Value;
-let supportReviews = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation quality standards"
-| project IncidentId, QualityReviewFalsePositive = Value;
-let qualityReasons = IncidentCustomFieldEntriesDedupView
-| where Name == "Low Quality Reason"
-| project IncidentId, LowQualityReason = Value;
-let reviewerAssignment = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Reviewer"
-| project IncidentId, ReviewerName = Value;
-let featureArea = IncidentCustomFieldEntriesDedupView
-| where Name == "Feature Area"
-| project IncidentId, FeatureArea = Value;
-escalationInformation
-| join kind=inner (qualityInformation) on IncidentId
-| join kind=leftouter (supportReviews) on IncidentId
-| join kind=leftouter (qualityReasons) on IncidentId
-| join kind=leftouter (reviewerAssignment) on IncidentId
-| join kind=leftouter (featureArea) on IncidentId
-| where EscalationQuality != "All Data Provided"
-| where QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive)
-| where isempty(ReviewerName) or ReviewerName == ""
-| extend OriginRegion = case(
-    SourceOrigin contains "EMEA" or SourceOrigin contains "Europe", "EMEA",
-    SourceOrigin contains "APAC" or SourceOrigin contains "Asia", "APAC",
-    SourceOrigin contains "LATAM" or SourceOrigin contains "Latin", "LATAM",
-    SourceOrigin contains "Americas" or SourceOrigin contains "US" or SourceOrigin contains "NA", "Americas",
-    "Unknown"
-)
-| extend FeatureAreaCategory = case(
-    FeatureArea contains "MIP" or FeatureArea contains "DLP" or FeatureArea contains "Information Protection", "MIP/DLP",
-    FeatureArea contains "DLM" or FeatureArea contains "Lifecycle" or FeatureArea contains "Retention", "DLM",
-    FeatureArea contains "eDiscovery" or FeatureArea contains "eDisc" or FeatureArea contains "Discovery", "eDiscovery",
-    FeatureArea contains "Compliance" or FeatureArea contains "Records", "Compliance",
-    isempty(FeatureArea), "Other",
-    "Other"
-)
-| extend FeatureAreaDetail = case(
-   FeatureAreaCategory == "Other" and OwningTeamName contains @"\", extract(@"Purview\\(.*)", 1, OwningTeamName),
-    FeatureAreaCategory == "Other", OwningTeamName,
-    ""
-)
-| extend IsTrueLowQuality = true
-| project 
-    IncidentId,
-    IcMId,
-    RoutingId,
-    Title,
-    Severity,
-    CreatedBy = SourceCreatedBy,
-    OwningTeam = OwningTeamName,
-    ResolveDate,
-    FiscalWeek,
-    EscalationQuality,
-    LowQualityReason,
-    QualityReviewFalsePositive,
-    CustomerSegment,
-    IsTrueLowQuality,
-    ReviewerName,
-    OriginRegion,
-    FeatureArea = FeatureAreaCategory,
-    FeatureAreaDetail,
-    SourceOrigin
-| order by OriginRegion asc, FeatureArea asc, ResolveDate desc
-"""
+        return unassigned_query(days_back=14, feature_detail=True)
     
     def filter_data_by_region(self, data: List[Dict], region: str) -> List[Dict]:
         """Filter escalations by region."""
@@ -378,6 +330,10 @@ escalationInformation
             print(f"Loading data from: {data_file}")
             with open(data_file, 'r') as f:
                 all_data = json.load(f)
+        else:
+            all_data = self.fetch_14day_data()
+        
+        if all_data is not None:
             print(f"Loaded {len(all_data)} escalations")
         else:
             print("No data file provided. Here's the 14-day Kusto query:")
@@ -443,9 +399,11 @@ def main():
     
     parser = argparse.ArgumentParser(description='Generate regional LQE reports')
     parser.add_argument('data_file', nargs='?', help='Path to JSON data file')
+    parser.add_argument('--backend', choices=['kusto', 'mcp', 'local'],
+                        help='Run the 14-day query with this backend when no data file is given')
     args = parser.parse_args()
     
-    generator = RegionalLQEReportGenerator()
+    generator = RegionalLQEReportGenerator(query_backend=args.backend)
     generator.run_regional_analysis(data_file=args.data_file)
 
 
@@ -9,25 +9,41 @@ Created: February 4, 2026
 """
 
 import os
+import sys
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from collections import defaultdict
 import pandas as pd
 
+# Shared query execution lives in <repo>/kusto_tools
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+try:
+    from kusto_tools import QueryExecutor, default_backend, default_cache
+    from kusto_tools.executor import KustoBackend
+    QUERY_EXECUTION_AVAILABLE = True
+except ImportError:
+    QUERY_EXECUTION_AVAILABLE = False
+
+from lqe_queries import detailed_escalation_query, team_metrics_query, unassigned_query
+
 
 class LowQualityEscalationAgent:
     """Agent for analyzing and reporting on low quality escalations."""
     
-    def __init__(self, kusto_client=None, config_path: str = None):
+    def __init__(self, kusto_client=None, config_path: str = None, query_backend: str = None):
         """
         Initialize the Low Quality Escalation Agent.
         
         Args:
             kusto_client: Kusto client instance for running queries
             config_path: Path to reviewer configuration file
+            query_backend: Query backend ('kusto', 'mcp' or 'local') when no client is
+                given; defaults to $PHEPY_QUERY_BACKEND
         """
         self.kusto_client = kusto_client
+        self.query_backend = query_backend
+        self._executor = None
         self.config_path = config_path or os.path.join(
             os.path.dirname(__file__), 'lq_escalation_config.json'
         )
@@ -62,48 +78,7 @@ class LowQualityEscalationAgent:
         Returns:
             Kusto query string
         """
-        return f"""
-let escalationInformation = IncidentsDedupView
-| where OwningTenantName == "Purview"
-| where ResolveDate > ago({days_back}d)
-| where IncidentType == "CustomerReported"
-| extend FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)
-| project ResolveDate, FiscalWeek, IncidentId, SourceCreatedBy, OwningTeamName, 
-    Title, Severity, RoutingId, IcMId, CustomerSegment;
-let qualityInformation =
-IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Quality"
-| project IncidentId, EscalationQuality = Value;
-let supportReviews = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation quality standards"
-| project IncidentId, QualityReviewFalsePositive = Value;
-let qualityReasons = IncidentCustomFieldEntriesDedupView
-| where Name == "Low Quality Reason"
-| project IncidentId, LowQualityReason = Value;
-escalationInformation
-| join kind=inner (qualityInformation) on IncidentId
-| join kind=leftouter (supportReviews) on IncidentId
-| join kind=leftouter (qualityReasons) on IncidentId
-| where EscalationQuality != "All Data Provided"
-| where QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive)
-| extend IsTrueLowQuality = (QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive))
-| project 
-    IncidentId,
-    IcMId,
-    RoutingId,
-    Title,
-    Severity,
-    CreatedBy = SourceCreatedBy,
-    OwningTeam = OwningTeamName,
-    ResolveDate,
-    FiscalWeek,
-    EscalationQuality,
-    LowQualityReason,
-    QualityReviewFalsePositive,
-    CustomerSegment,
-    IsTrueLowQuality
-| order by ResolveDate desc, OwningTeam asc
-"""
+        return detailed_escalation_query(days_back)
     
     def get_weekly_unassigned_query(self, days_back: int = 7) -> str:
         """
@@ -119,76 +94,7 @@ escalationInformation
         Returns:
             Kusto query string with region and feature area
         """
-        return f"""
-let escalationInformation = IncidentsDedupView
-| where OwningTenantName == "Purview"
-| where ResolveDate > ago({days_back}d)
-| where IncidentType == "CustomerReported"
-| extend FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)
-| project ResolveDate, FiscalWeek, IncidentId, SourceCreatedBy, OwningTeamName, 
-    Title, Severity, RoutingId, IcMId, CustomerSegment, SourceOrigin, ImpactStartDate;
-let qualityInformation =
-IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Quality"
-| project IncidentId, EscalationQuality = Value;
-let supportReviews = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation quality standards"
-| project IncidentId, QualityReviewFalsePositive = Value;
-let qualityReasons = IncidentCustomFieldEntriesDedupView
-| where Name == "Low Quality Reason"
-| project IncidentId, LowQualityReason = Value;
-let reviewerAssignment = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Reviewer"
-| project IncidentId, ReviewerName = Value;
-let featureArea = IncidentCustomFieldEntriesDedupView
-| where Name == "Feature Area"
-| project IncidentId, FeatureArea = Value;
-escalationInformation
-| join kind=inner (qualityInformation) on IncidentId
-| join kind=leftouter (supportReviews) on IncidentId
-| join kind=leftouter (qualityReasons) on IncidentId
-| join kind=leftouter (reviewerAssignment) on IncidentId
-| join kind=leftouter (featureArea) on IncidentId
-| where EscalationQuality != "All Data Provided"
-| where QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive)
-| where isempty(ReviewerName) or ReviewerName == ""
-| extend OriginRegion = case(
-    SourceOrigin contains "EMEA" or SourceOrigin contains "Europe", "EMEA",
-    SourceOrigin contains "APAC" or SourceOrigin contains "Asia", "APAC",
-    SourceOrigin contains "LATAM" or SourceOrigin contains "Latin", "LATAM",
-    SourceOrigin contains "Americas" or SourceOrigin contains "US" or SourceOrigin contains "NA", "Americas",
-    "Unknown"
-)
-| extend FeatureAreaCategory = case(
-    FeatureArea contains "MIP" or FeatureArea contains "DLP" or FeatureArea contains "Information Protection", "MIP/DLP",
-    FeatureArea contains "DLM" or FeatureArea contains "Lifecycle" or FeatureArea contains "Retention", "DLM",
-    FeatureArea contains "eDiscovery" or FeatureArea contains "eDisc" or FeatureArea contains "Discovery", "eDiscovery",
-    FeatureArea contains "Compliance" or FeatureArea contains "Records", "Compliance",
-    isempty(FeatureArea), "Unknown",
-    "Other"
-)
-| extend IsTrueLowQuality = true
-| project 
-    IncidentId,
-    IcMId,
-    RoutingId,
-    Title,
-    Severity,
-    CreatedBy = SourceCreatedBy,
-    OwningTeam = OwningTeamName,
-    ResolveDate,
-    FiscalWeek,
-    EscalationQuality,
-    LowQualityReason,
-    QualityReviewFalsePositive,
-    CustomerSegment,
-    IsTrueLowQuality,
-    ReviewerName,
-    OriginRegion,
-    FeatureArea = FeatureAreaCategory,
-    SourceOrigin
-| order by OriginRegion asc, FeatureArea asc, ResolveDate desc
-"""
+        return unassigned_query(days_back)
     
     def get_team_metrics_query(self, days_back: int = 30) -> str:
         """
@@ -200,54 +106,26 @@ escalationInformation
         Returns:
             Kusto query string
         """
-        return f"""
-let escalationInformation = IncidentsDedupView
-| where OwningTenantName == "Purview"
-| where ResolveDate > ago({days_back}d)
-| where IncidentType == "CustomerReported"
-| extend FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)
-| project ResolveDate, FiscalWeek, IncidentId, SourceCreatedBy, OwningTeamName;
-let qualityInformation =
-IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation Quality"
-| project IncidentId, EscalationQuality = Value;
-let supportReviews = IncidentCustomFieldEntriesDedupView
-| where Name == "Escalation quality standards"
-| project IncidentId, QualityReviewFalsePositive = Value;
-let teamMetrics = escalationInformation
-| join kind=inner (qualityInformation) on IncidentId
-| join kind=leftouter (supportReviews) on IncidentId
-| summarize
-    AllEsc = count(),
-    LQMarked = countif(EscalationQuality != "All Data Provided"),
-    FP = countif(EscalationQuality != "All Data Provided" and QualityReviewFalsePositive == "Yes"),
-    TrueLQ = countif(EscalationQuality != "All Data Provided" and QualityReviewFalsePositive != "Yes")
-    by OwningTeam = OwningTeamName
-| extend 
-    LQMarkedPct = strcat(round(todouble(LQMarked) / todouble(AllEsc) * 100, 1), "%"),
-    TrueLQPct = strcat(round(todouble(TrueLQ) / todouble(AllEsc) * 100, 1), "%"),
-    FPPct = strcat(round(todouble(FP) / todouble(LQMarked) * 100, 1), "%");
-let allUpRow = teamMetrics
-| summarize
-    AllEsc = sum(AllEsc),
-    LQMarked = sum(LQMarked),
-    FP = sum(FP),
-    TrueLQ = sum(TrueLQ)
-| extend OwningTeam = "All Up"
-| extend 
-    LQMarkedPct = strcat(round(todouble(LQMarked) / todouble(AllEsc) * 100, 1), "%"),
-    TrueLQPct = strcat(round(todouble(TrueLQ) / todouble(AllEsc) * 100, 1), "%"),
-    FPPct = strcat(round(todouble(FP) / todouble(LQMarked) * 100, 1), "%");
-union teamMetrics, allUpRow
-| order by OwningTeam asc
-"""
+        return team_metrics_query(days_back)
+    
+    def get_executor(self):
+        """Query executor (with result cache) for the agent's Kusto client or configured backend, or None"""
+        if self._executor is None and QUERY_EXECUTION_AVAILABLE:
+            if self.kusto_client is not None:
+                backend = KustoBackend(client=self.kusto_client)
+            else:
+                backend = default_backend(self.query_backend)
+            if backend is not None:
+                self._executor = QueryExecutor(backend, cache=default_cache())
+        return self._executor
     
     def execute_query_mcp(self, query: str, cluster_url: str = "https://icmcluster.kusto.windows.net", 
                           database: str = "IcMDataWarehouse", max_rows: int = 10000) -> pd.DataFrame:
         """
-        Execute Kusto query using MCP Kusto tool and return results as DataFrame.
+        Execute Kusto query and return results as DataFrame.
         
-        This method calls the MCP Kusto execute_query tool which handles authentication.
+        Runs on the agent's Kusto client, or the backend named by query_backend /
+        $PHEPY_QUERY_BACKEND (kusto, mcp or local). Transient failures are retried.
         
         Args:
             query: Kusto query string
@@ -258,11 +136,13 @@ union teamMetrics, allUpRow
         Returns:
             DataFrame with query results
         """
-        print(f"\nExecuting query via MCP Kusto on {cluster_url}/{database}...")
-        print(f"Max rows: {max_rows}")
+        executor = self.get_executor()
+        if executor is not None:
+            print(f"\nExecuting query via {executor.backend.name} on {cluster_url}/{database}...")
+            df = executor.execute(query, cluster_url, database)
+            return df.head(max_rows)
         
-        # Note: This is a placeholder - actual MCP call would be made by GitHub Copilot
-        # For now, we'll raise an error directing to use the MCP tool directly
+        # No backend configured: the query has to be run with the MCP tool directly
         raise NotImplementedError(
             "Please use the mcp_kusto-mcp-ser_execute_query tool directly from GitHub Copilot.\n"
             f"Query to execute:\n{query}\n\n"
@@ -642,14 +522,14 @@ union teamMetrics, allUpRow
         print("Loading unassigned low quality escalations from last 7 days...")
         query = self.get_weekly_unassigned_query(days_back=7)
         
-        # For now, indicate MCP usage needed
-        print("\nQuery ready for execution via MCP Kusto tool:")
-        print(f"Cluster: https://icmcluster.kusto.windows.net")
-        print(f"Database: IcMDataWarehouse")
-        print(f"\nQuery:\n{query}")
-        
-        # Note: Actual execution would happen via MCP tool
-        # self.escalations_data = execute via MCP
+        if self.escalations_data is None and self.get_executor() is not None:
+            self.escalations_data = self.execute_query_mcp(query)
+        elif self.escalations_data is None:
+            # No backend configured: indicate MCP usage needed
+            print("\nQuery ready for execution via MCP Kusto tool:")
+            print(f"Cluster: https://icmcluster.kusto.windows.net")
+            print(f"Database: IcMDataWarehouse")
+            print(f"\nQuery:\n{query}")
         
         results = {
             'report_type': 'weekly_friday_unassigned',
@@ -0,0 +1,189 @@
+"""
+Low quality escalation KQL, assembled from shared fragments
+
+Every LQE query starts from the same Purview escalations in a time window
+and reads its escalation-quality custom fields with one pivoted scan of
+IncidentCustomFieldEntriesDedupView (limited to those escalations), instead
+of one scan and join per field. Each query projects only the incident
+columns it uses before joining.
+
+Run this file to regenerate queries/friday_lq_unassigned.kql.
+
+Author: Carter Ryan
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from kusto_tools.builder import KQL, pivot_fields, script
+
+# Custom fields read by the LQE queries: {column: custom field name}
+LQE_FIELDS = {
+    'EscalationQuality': 'Escalation Quality',
+    'QualityReviewFalsePositive': 'Escalation quality standards',
+    'LowQualityReason': 'Low Quality Reason',
+    'ReviewerName': 'Escalation Reviewer',
+    'FeatureArea': 'Feature Area',
+}
+
+# Incident columns every escalation listing returns
+ESCALATION_COLUMNS = [
+    'ResolveDate', 'FiscalWeek', 'IncidentId', 'SourceCreatedBy', 'OwningTeamName',
+    'Title', 'Severity', 'RoutingId', 'IcMId', 'CustomerSegment',
+]
+REGION_COLUMNS = ['SourceOrigin', 'ImpactStartDate']
+
+NOT_ALL_DATA_PROVIDED = 'EscalationQuality != "All Data Provided"'
+NOT_FALSE_POSITIVE = 'QualityReviewFalsePositive != "Yes" or isempty(QualityReviewFalsePositive)'
+UNASSIGNED = 'isempty(ReviewerName) or ReviewerName == ""'
+
+ORIGIN_REGION = '''OriginRegion = case(
+    SourceOrigin contains "EMEA" or SourceOrigin contains "Europe", "EMEA",
+    SourceOrigin contains "APAC" or SourceOrigin contains "Asia", "APAC",
+    SourceOrigin contains "LATAM" or SourceOrigin contains "Latin", "LATAM",
+    SourceOrigin contains "Americas" or SourceOrigin contains "US" or SourceOrigin contains "NA", "Americas",
+    "Unknown"
+)'''
+
+
+def feature_area_category(empty_label='Unknown'):
+    """FeatureAreaCategory from the Feature Area custom field"""
+    return f'''FeatureAreaCategory = case(
+    FeatureArea contains "MIP" or FeatureArea contains "DLP" or FeatureArea contains "Information Protection", "MIP/DLP",
+    FeatureArea contains "DLM" or FeatureArea contains "Lifecycle" or FeatureArea contains "Retention", "DLM",
+    FeatureArea contains "eDiscovery" or FeatureArea contains "eDisc" or FeatureArea contains "Discovery", "eDiscovery",
+    FeatureArea contains "Compliance" or FeatureArea contains "Records", "Compliance",
+    isempty(FeatureArea), "{empty_label}",
+    "Other"
+)'''
+
+
+FEATURE_AREA_DETAIL = r'''FeatureAreaDetail = case(
+    FeatureAreaCategory == "Other" and OwningTeamName contains @"\", extract(@"Purview\\(.*)", 1, OwningTeamName),
+    FeatureAreaCategory == "Other", OwningTeamName,
+    ""
+)'''
+
+LISTING_COLUMNS = [
+    'IncidentId', 'IcMId', 'RoutingId', 'Title', 'Severity',
+    'CreatedBy = SourceCreatedBy', 'OwningTeam = OwningTeamName', 'ResolveDate', 'FiscalWeek',
+    'EscalationQuality', 'LowQualityReason', 'QualityReviewFalsePositive', 'CustomerSegment',
+    'IsTrueLowQuality',
+]
+
+
+def escalations(days_back, columns=ESCALATION_COLUMNS):
+    """Customer-reported Purview escalations resolved in the last days_back days"""
+    return (KQL('IncidentsDedupView')
+            .where('OwningTenantName == "Purview"',
+                   f'ResolveDate > ago({days_back}d)',
+                   'IncidentType == "CustomerReported"')
+            .extend('FiscalWeek = 24 - toint((fw24EndDate - ResolveDate) / 7d)')
+            .project(*columns))
+
+
+def escalation_script(days_back, columns, fields, body):
+    """
+    let statements shared by every LQE query, followed by body
+    
+    body is built on 'escalationInformation' joined with 'customFields'
+    (which holds the requested fields; EscalationQuality is required).
+    """
+    field_map = {column: LQE_FIELDS[column] for column in fields}
+    return script(
+        ('escalationInformation', escalations(days_back, columns)),
+        ('escalationIds', KQL('escalationInformation').project('IncidentId')),
+        ('customFields', pivot_fields(field_map, keys_from='escalationIds', required=['EscalationQuality'])),
+        body(KQL('escalationInformation').join('customFields')),
+    )
+
+
+def detailed_escalation_query(days_back=30):
+    """Every true low quality escalation in the window"""
+    fields = ['EscalationQuality', 'QualityReviewFalsePositive', 'LowQualityReason']
+    
+    def body(q):
+        return (q.where(NOT_ALL_DATA_PROVIDED, NOT_FALSE_POSITIVE)
+                 .extend(f'IsTrueLowQuality = ({NOT_FALSE_POSITIVE})')
+                 .project(*LISTING_COLUMNS)
+                 .order_by('ResolveDate desc', 'OwningTeam asc'))
+    
+    return escalation_script(days_back, ESCALATION_COLUMNS, fields, body)
+
+
+def unassigned_query(days_back=7, feature_detail=False):
+    """
+    Low quality escalations with no reviewer, with region and feature area
+    
+    feature_detail adds FeatureAreaDetail (team name for "Other" feature
+    areas) and labels a missing feature area "Other" instead of "Unknown",
+    as the regional reports expect.
+    """
+    fields = ['EscalationQuality', 'QualityReviewFalsePositive', 'LowQualityReason', 'ReviewerName', 'FeatureArea']
+    columns = LISTING_COLUMNS + ['ReviewerName', 'OriginRegion', 'FeatureArea = FeatureAreaCategory']
+    columns += ['FeatureAreaDetail', 'SourceOrigin'] if feature_detail else ['SourceOrigin']
+    
+    def body(q):
+        q = (q.where(NOT_ALL_DATA_PROVIDED, NOT_FALSE_POSITIVE, UNASSIGNED)
+              .extend(ORIGIN_REGION)
+              .extend(feature_area_category('Other' if feature_detail else 'Unknown')))
+        if feature_detail:
+            q = q.extend(FEATURE_AREA_DETAIL)
+        return (q.extend('IsTrueLowQuality = true')
+                 .project(*columns)
+                 .order_by('OriginRegion asc', 'FeatureArea asc', 'ResolveDate desc'))
+    
+    return escalation_script(days_back, ESCALATION_COLUMNS + REGION_COLUMNS, fields, body)
+
+
+TEAM_RATES = [
+    'LQMarkedPct = strcat(round(todouble(LQMarked) / todouble(AllEsc) * 100, 1), "%")',
+    'TrueLQPct = strcat(round(todouble(TrueLQ) / todouble(AllEsc) * 100, 1), "%")',
+    'FPPct = strcat(round(todouble(FP) / todouble(LQMarked) * 100, 1), "%")',
+]
+
+
+def team_metrics_query(days_back=30):
+    """Escalation, low quality and false positive counts and rates per owning team, plus an All Up row"""
+    columns = ['ResolveDate', 'FiscalWeek', 'IncidentId', 'SourceCreatedBy', 'OwningTeamName']
+    counts = [
+        'AllEsc = count()',
+        'LQMarked = countif(EscalationQuality != "All Data Provided")',
+        'FP = countif(EscalationQuality != "All Data Provided" and QualityReviewFalsePositive == "Yes")',
+        'TrueLQ = countif(EscalationQuality != "All Data Provided" and QualityReviewFalsePositive != "Yes")',
+    ]
+    totals = ['AllEsc = sum(AllEsc)', 'LQMarked = sum(LQMarked)', 'FP = sum(FP)', 'TrueLQ = sum(TrueLQ)']
+    field_map = {column: LQE_FIELDS[column] for column in ['EscalationQuality', 'QualityReviewFalsePositive']}
+    return script(
+        ('escalationInformation', escalations(days_back, columns)),
+        ('escalationIds', KQL('escalationInformation').project('IncidentId')),
+        ('customFields', pivot_fields(field_map, keys_from='escalationIds', required=['EscalationQuality'])),
+        ('teamMetrics', KQL('escalationInformation').join('customFields')
+                        .summarize(*counts, by='OwningTeam = OwningTeamName')
+                        .extend(*TEAM_RATES)),
+        ('allUpRow', KQL('teamMetrics').summarize(*totals)
+                     .extend('OwningTeam = "All Up"')
+                     .extend(*TEAM_RATES)),
+        KQL('union teamMetrics, allUpRow').order_by('OwningTeam asc'),
+    )
+
+
+def write_friday_query_file(path=None):
+    """Regenerate queries/friday_lq_unassigned.kql for manual runs"""
+    path = path or os.path.join(os.path.dirname(__file__), 'queries', 'friday_lq_unassigned.kql')
+    header = (
+        "// Friday Night Low Quality Escalation Analysis Query\n"
+        "// Purpose: Find unassigned low quality escalations from the last 7 days\n"
+        "// Organized by: Region and Feature Area\n"
+        f"// Generated by lqe_queries.py on {datetime.now().strftime('%B %d, %Y').replace(' 0', ' ')} - edit the fragments there, not this file\n"
+        "\n"
+    )
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(header + unassigned_query(days_back=7))
+    return path
+
+
+if __name__ == '__main__':
+    print(f"✓ Wrote {write_friday_query_file()}")
@@ -57,9 +57,10 @@ def test_routing():
     success_count = 0
     high_confidence_count = 0
     
-    for i, query in enumerate(test_queries, 1):
+    results = router.route_many(test_queries)
+    
+    for i, (query, result) in enumerate(zip(test_queries, results), 1):
         print(f"{i}. Query: {query}")
-        result = router.route(query)
         confidence = result.get('confidence', 0)
         
         print(f"   Route Type: {result.get('routing_type').upper()}")
@@ -0,0 +1,9 @@
+"""
+Shared text analysis helpers for the PHEPy agents and analyzers
+
+Add the repository root to sys.path and import from here, e.g.:
+    
+    from text_tools import KeywordClassifier
+"""
+
+from .classifier import KeywordClassifier
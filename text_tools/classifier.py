@@ -0,0 +1,116 @@
+"""
+Keyword classification for incident text
+
+A KeywordClassifier compiles any number of keyword tables into one regex (plus
+one for acronyms), so tagging an incident takes a fixed number of scans of its
+text, however many tables and terms there are:
+    
+    classifier = KeywordClassifier({
+        "themes": {"Encryption": ["encrypt", "decrypt", "RMS"], ...},
+        "products": {"DLP": ["DLP", "data loss prevention"], ...},
+    })
+    classifier.classify("Cannot decrypt RMS-protected mail")
+    # {"themes": ["Encryption"], "products": []}
+
+Matching is case-insensitive. A term matches anywhere in the text, like
+`term in text.lower()`, except acronyms (all-capital terms such as DLP, or
+SITs), which only match whole words, so "SIT" doesn't fire on "site".
+
+Terms are stored in a trie and the regex is generated from it, so at each
+text position the regex engine follows one branch instead of trying every
+term. The substring regex sits in a lookahead to find overlapping terms
+("auto-label" and "label" in "auto-labeling") in the same scan.
+"""
+
+import re
+from typing import Dict, Iterable, List, Set
+
+
+def is_acronym(term: str) -> bool:
+    """All-capital terms (DLP, SIT, SITs) match whole words only"""
+    letters = term[:-1] if term.endswith("s") else term
+    return len(letters) > 1 and letters.isupper()
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Regex matching the longest of terms at a position, with shared prefixes factored out"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    
+    def render(node):
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:  # A term ends here; prefer continuing to a longer one
+            body = "(?:" + body + ")?"
+        return body
+    
+    return render(trie)
+
+
+class KeywordClassifier:
+    """
+    Tags text with every matching tag of every keyword table at once
+    
+    Tables are {group: {tag: [terms]}}; results list the matching tags of
+    each group in table order.
+    """
+    
+    def __init__(self, tables: Dict[str, Dict[str, List[str]]]):
+        self.tables = {group: {tag: list(terms) for tag, terms in table.items()}
+                       for group, table in tables.items()}
+        
+        # (lowercase literal, acronym) -> term as written and the (group, tag)s it marks
+        self._terms = {}
+        for group, table in self.tables.items():
+            for tag, terms in table.items():
+                for term in terms:
+                    key = (term.lower(), is_acronym(term))
+                    self._terms.setdefault(key, (term, []))[1].append((group, tag))
+        
+        substrings = sorted(literal for literal, acronym in self._terms if not acronym)
+        acronyms = sorted(literal for literal, acronym in self._terms if acronym)
+        # The regex reports the longest term at each position; the shorter
+        # terms that are prefixes of it are there too
+        self._prefixes = {literal: tuple(p for p in substrings if literal.startswith(p)) for literal in substrings}
+        self._substring_regex = re.compile(f"(?=({_trie_pattern(substrings)}))") if substrings else None
+        self._acronym_regex = re.compile(rf"\b({_trie_pattern(acronyms)})\b") if acronyms else None
+        self._order = {key: i for i, key in
+                       enumerate((group, tag) for group, table in self.tables.items() for tag in table)}
+    
+    def _found(self, text: str) -> Set[tuple]:
+        """Keys of the terms found in text"""
+        text = (text or "").lower()
+        found = set()
+        if self._substring_regex is not None:
+            for literal in set(self._substring_regex.findall(text)):
+                found.update((prefix, False) for prefix in self._prefixes[literal])
+        if self._acronym_regex is not None:
+            found.update((literal, True) for literal in self._acronym_regex.findall(text))
+        return found
+    
+    def matched_terms(self, text: str) -> Set[str]:
+        """Terms (as written in the tables) found in text"""
+        return {self._terms[key][0] for key in self._found(text)}
+    
+    def classify(self, text: str) -> Dict[str, List[str]]:
+        """{group: [matching tags in table order]} for one text"""
+        hits = {pair for key in self._found(text) for pair in self._terms[key][1]}
+        result = {group: [] for group in self.tables}
+        for group, tag in sorted(hits, key=self._order.__getitem__):
+            result[group].append(tag)
+        return result
+    
+    def classify_many(self, texts: Iterable[str]) -> List[Dict[str, List[str]]]:
+        """classify() for each of a batch of texts"""
+        return [self.classify(text) for text in texts]
+    
+    def first(self, text: str, group: str, default=None):
+        """First matching tag of a group in table order (e.g. the primary product area)"""
+        tags = self.classify(text)[group]
+        return tags[0] if tags else default
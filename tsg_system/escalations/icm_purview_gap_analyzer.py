@@ -10,11 +10,15 @@ This script:
 """
 
 import json
+import os
 import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 from typing import Dict, List, Set
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from text_tools import KeywordClassifier
+
 # Gap indicators - signals that a better TSG could have prevented escalation
 TSG_GAP_INDICATORS = {
     'repeated_issue': [
@@ -75,6 +79,22 @@ PURVIEW_PRODUCTS = [
     'Agents'
 ]
 
+# Issue patterns, in priority order (the first match is the incident's pattern)
+ISSUE_PATTERNS = {
+    'Sync/Replication Issue': ['sync', 'synchronization'],
+    'Performance/Latency': ['performance', 'slow', 'timeout'],
+    'Configuration/Setup': ['configuration', 'setup'],
+    'Permissions/Access': ['permission', 'access', 'RBAC'],
+    'UI/Portal Issue': ['UI', 'portal', 'interface'],
+}
+
+# All three tables are matched in one pass over each incident
+CLASSIFIER = KeywordClassifier({
+    'gap_types': TSG_GAP_INDICATORS,
+    'product_area': {product: [product] for product in PURVIEW_PRODUCTS},
+    'issue_pattern': ISSUE_PATTERNS,
+})
+
 
 class ICMGapAnalyzer:
     """Analyzes ICM incidents to find TSG gaps"""
@@ -101,42 +121,14 @@ class ICMGapAnalyzer:
     def analyze_incident_description(self, incident: Dict) -> Dict:
         """Analyze incident description for gap indicators"""
         description = incident.get('Description', '') + ' ' + incident.get('Title', '')
-        description = description.lower()
+        matches = CLASSIFIER.classify(description)
         
-        gaps_found = {
-            'gap_types': [],
-            'gap_score': 0,
-            'product_area': None,
-            'issue_pattern': None
+        return {
+            'gap_types': matches['gap_types'],
+            'gap_score': len(matches['gap_types']),
+            'product_area': next(iter(matches['product_area']), None),
+            'issue_pattern': next(iter(matches['issue_pattern']), None)
         }
-        
-        # Check for gap indicators
-        for gap_type, keywords in TSG_GAP_INDICATORS.items():
-            for keyword in keywords:
-                if keyword in description:
-                    gaps_found['gap_types'].append(gap_type)
-                    gaps_found['gap_score'] += 1
-                    break
-        
-        # Identify product area
-        for product in PURVIEW_PRODUCTS:
-            if product.lower() in description:
-                gaps_found['product_area'] = product
-                break
-        
-        # Extract issue pattern (simplified)
-        if 'sync' in description or 'synchronization' in description:
-            gaps_found['issue_pattern'] = 'Sync/Replication Issue'
-        elif 'performance' in description or 'slow' in description or 'timeout' in description:
-            gaps_found['issue_pattern'] = 'Performance/Latency'
-        elif 'configuration' in description or 'setup' in description:
-            gaps_found['issue_pattern'] = 'Configuration/Setup'
-        elif 'permission' in description or 'access' in description or 'rbac' in description:
-            gaps_found['issue_pattern'] = 'Permissions/Access'
-        elif 'ui' in description or 'portal' in description or 'interface' in description:
-            gaps_found['issue_pattern'] = 'UI/Portal Issue'
-        
-        return gaps_found
     
     def score_tsg_opportunity(self, incident: Dict, analysis: Dict) -> int:
         """Score how beneficial a TSG would be (0-100)"""
@@ -4,103 +4,95 @@ Handles rate limiting, error recovery, and progress tracking
 """
 
 import json
-import time
+import os
+import sys
+import textwrap
 from pathlib import Path
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import Iterator, List, Dict, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from icm_tools.progress import FLUSH_EVERY, ProgressStore
 
 class BatchICMRetriever:
-    """Retrieve ICM incidents in batches with progress tracking"""
+    """
+    Retrieve ICM incidents in batches with progress tracking
+    
+    Progress lives in retrieval_progress.db (see icm_tools.progress), so
+    status and next-batch lookups don't re-read the data file, and saves
+    are written in batches of flush_every. Call close() (or use the
+    retriever as a context manager) when done; pending saves are also
+    written at exit.
+    """
     
-    def __init__(self, output_dir: str = "tsg_system/data"):
+    def __init__(self, output_dir: str = "tsg_system/data", flush_every: int = FLUSH_EVERY):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        self.progress_file = self.output_dir / "retrieval_progress.json"
+        self.progress_file = self.output_dir / "retrieval_progress.db"
         self.data_file = self.output_dir / "retrieved_incidents.jsonl"
         
-        self.progress = self._load_progress()
-    
-    def _load_progress(self) -> Dict:
-        """Load retrieval progress from file"""
-        if self.progress_file.exists():
-            with open(self.progress_file, 'r') as f:
-                return json.load(f)
-        return {
-            'total_incidents': 0,
-            'retrieved': 0,
-            'failed': [],
-            'last_updated': None,
-            'incident_ids': []
-        }
-    
-    def _save_progress(self):
-        """Save retrieval progress"""
-        self.progress['last_updated'] = datetime.now().isoformat()
-        with open(self.progress_file, 'w') as f:
-            json.dump(self.progress, f, indent=2)
+        self.store = ProgressStore(self.progress_file, self.data_file, flush_every=flush_every)
+        self._import_legacy_progress(self.output_dir / "retrieval_progress.json")
+    
+    def _import_legacy_progress(self, legacy_file: Path):
+        """Carry over the incident list and failures of a retrieval_progress.json from older runs"""
+        if self.store.total() or not legacy_file.exists():
+            return
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+        if not legacy.get('incident_ids'):
+            return
+        self.store.set_targets(legacy['incident_ids'])
+        for failure in legacy.get('failed', []):
+            self.store.add_failed(failure['incident_id'], failure.get('error', ''))
+        self.store.flush()
+        print(f"Imported {len(legacy['incident_ids'])} incident IDs from {legacy_file.name}")
     
     def set_incident_ids(self, incident_ids: List[int]):
         """Set the list of incident IDs to retrieve"""
-        self.progress['incident_ids'] = incident_ids
-        self.progress['total_incidents'] = len(incident_ids)
-        self._save_progress()
+        self.store.set_targets(incident_ids)
         print(f"Set {len(incident_ids)} incident IDs for retrieval")
     
     def save_incident(self, incident_data: Dict):
-        """Append incident data to JSONL file"""
-        with open(self.data_file, 'a') as f:
-            f.write(json.dumps(incident_data) + '\n')
-        
-        self.progress['retrieved'] += 1
-        self._save_progress()
+        """Append incident data to JSONL file (written with the next batch)"""
+        self.store.add_retrieved(incident_data)
     
     def mark_failed(self, incident_id: int, error: str):
         """Mark an incident as failed to retrieve"""
-        self.progress['failed'].append({
-            'incident_id': incident_id,
-            'error': error,
-            'timestamp': datetime.now().isoformat()
-        })
-        self._save_progress()
+        self.store.add_failed(incident_id, error)
+    
+    def flush(self):
+        """Write pending saves and failures now"""
+        self.store.flush()
+    
+    def close(self):
+        self.store.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def get_next_batch(self, batch_size: int = 10) -> List[int]:
         """Get next batch of incident IDs to retrieve"""
-        retrieved_ids = self._get_retrieved_ids()
-        failed_ids = {f['incident_id'] for f in self.progress['failed']}
-        
-        remaining = [
-            iid for iid in self.progress['incident_ids']
-            if iid not in retrieved_ids and iid not in failed_ids
-        ]
-        
-        return remaining[:batch_size]
+        return self.store.next_pending(batch_size)
     
-    def _get_retrieved_ids(self) -> set:
-        """Get set of already retrieved incident IDs"""
-        if not self.data_file.exists():
-            return set()
-        
-        retrieved = set()
-        with open(self.data_file, 'r') as f:
-            for line in f:
-                if line.strip():
-                    incident = json.loads(line)
-                    retrieved.add(incident.get('id'))
-        
-        return retrieved
+    def get_failed(self) -> List[Dict]:
+        """Failed incidents with their errors"""
+        return self.store.failures()
     
     def get_status(self) -> Dict:
         """Get current retrieval status"""
-        retrieved_ids = self._get_retrieved_ids()
+        counts = self.store.counts()
+        total = self.store.total()
         
         return {
-            'total': self.progress['total_incidents'],
-            'retrieved': len(retrieved_ids),
-            'failed': len(self.progress['failed']),
-            'remaining': self.progress['total_incidents'] - len(retrieved_ids) - len(self.progress['failed']),
-            'progress_pct': (len(retrieved_ids) / self.progress['total_incidents'] * 100) 
-                           if self.progress['total_incidents'] > 0 else 0
+            'total': total,
+            'retrieved': counts['retrieved'],
+            'failed': counts['failed'],
+            'remaining': counts['pending'],
+            'progress_pct': (counts['retrieved'] / total * 100) if total > 0 else 0
         }
     
     def print_status(self):
@@ -115,27 +107,34 @@ class BatchICMRetriever:
         print(f"Remaining: {status['remaining']}")
         print("=" * 60 + "\n")
     
-    def load_all_incidents(self) -> List[Dict]:
-        """Load all retrieved incidents from JSONL file"""
+    def iter_incidents(self) -> Iterator[Dict]:
+        """Retrieved incidents from the JSONL file, one at a time"""
+        self.store.flush()
         if not self.data_file.exists():
-            return []
+            return
         
-        incidents = []
-        with open(self.data_file, 'r') as f:
+        with open(self.data_file, 'r', encoding='utf-8') as f:
             for line in f:
                 if line.strip():
-                    incidents.append(json.loads(line))
-        
-        return incidents
+                    yield json.loads(line)
+    
+    def load_all_incidents(self) -> List[Dict]:
+        """Load all retrieved incidents from JSONL file (iter_incidents() for large retrievals)"""
+        return list(self.iter_incidents())
     
     def export_to_json(self, output_file: str):
-        """Export all retrieved incidents to a single JSON file"""
-        incidents = self.load_all_incidents()
-        
+        """Export all retrieved incidents to a single JSON file, writing one incident at a time"""
+        count = 0
         with open(output_file, 'w') as f:
-            json.dump(incidents, f, indent=2)
+            # Same layout as json.dump(incidents, f, indent=2)
+            f.write('[')
+            for incident in self.iter_incidents():
+                f.write(',\n' if count else '\n')
+                f.write(textwrap.indent(json.dumps(incident, indent=2), '  '))
+                count += 1
+            f.write('\n]' if count else ']')
         
-        print(f"Exported {len(incidents)} incidents to {output_file}")
+        print(f"Exported {count} incidents to {output_file}")
 
 
 # Example usage with MCP tool calls
@@ -92,7 +92,7 @@ def main():
         tsg_data = analyzer.extract_tsg_data(incident)
         analyzer.add_incident(tsg_data)
     
-    print(f"✓ Processed {len(analyzer.incidents)} incidents")
+    print(f"✓ Processed {analyzer.incident_count} incidents")
     print()
     
     # Generate report
@@ -1,13 +1,40 @@
 """
 TSG Gap Analyzer - Extract TSG-relevant data from ICM incidents
 Analyzes incidents to identify TSG coverage gaps and effectiveness issues
+
+Every aggregate is updated as incidents are added, so analysis is a single
+pass over the incidents. For large dumps, stream them in without keeping
+them in memory:
+    
+    analyzer = TSGGapAnalyzer(keep_incidents=False)
+    analyzer.add_incidents(retriever.iter_incidents())
+    analyzer.save_results('tsg_gap_analysis.json')
 """
 
 import json
-from typing import Dict, List, Optional
+import os
+import sys
+import tempfile
+import textwrap
+from typing import Dict, Iterable, Iterator, List, Optional
 from dataclasses import dataclass, asdict
 from collections import defaultdict
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from text_tools import KeywordClassifier
+
+# Incident categories, by keywords in the title
+CATEGORIES = KeywordClassifier({'categories': {
+    'Labeling/Classification': ['label', 'classification'],
+    'Encryption/DLP': ['encrypt', 'dlp'],
+    'SIT/Detection': ['sit', 'sensitive information'],
+    'Scanning': ['scanner', 'scan'],
+    'Policy': ['policy'],
+    'Migration': ['migration'],
+}})
+
+SAMPLE_SIZE = 5
+
 @dataclass
 class TSGIncidentData:
     """Lightweight structure for TSG-relevant incident data"""
@@ -29,11 +56,27 @@ class TSGIncidentData:
 class TSGGapAnalyzer:
     """Analyze ICM incidents for TSG gaps"""
     
-    def __init__(self):
+    def __init__(self, keep_incidents: bool = True):
+        """
+        Args:
+            keep_incidents: Hold every incident in self.incidents. With False,
+                incidents are spilled to a temporary JSONL file for
+                save_results() and memory stays bounded however many are added
+        """
         self.incidents: List[TSGIncidentData] = []
-        self.tsg_links: Dict[str, int] = defaultdict(int)  # Link -> count
-        self.categories: Dict[str, List[int]] = defaultdict(list)  # Category -> incident IDs
+        self.keep_incidents = keep_incidents
+        self._spill = None if keep_incidents else tempfile.TemporaryFile('w+', encoding='utf-8')
         
+        self.incident_count = 0
+        self.with_tsg = 0
+        self.effective_tsgs = 0
+        self.ineffective_tsgs = 0
+        self.tsg_links: Dict[str, int] = defaultdict(int)  # Link -> count
+        self.severity_no_tsg: Dict[int, int] = defaultdict(int)
+        self.categories: Dict[str, Dict[str, int]] = {}  # Category -> {'total', 'with_tsg'}, in first-seen order
+        self.high_sev_no_tsg = {'count': 0, 'samples': []}
+        self.ineffective = {'count': 0, 'samples': []}
+    
     def extract_tsg_data(self, incident_json: Dict) -> TSGIncidentData:
         """Extract TSG-relevant fields from full incident JSON"""
         
@@ -74,114 +117,119 @@ class TSGGapAnalyzer:
     
     def add_incident(self, incident_data: TSGIncidentData):
         """Add incident to analysis"""
-        self.incidents.append(incident_data)
+        if self.keep_incidents:
+            self.incidents.append(incident_data)
+        else:
+            self._spill.write(json.dumps(asdict(incident_data)) + '\n')
+        
+        self.incident_count += 1
+        has_tsg = bool(incident_data.tsg_link)
         
         # Track TSG links
-        if incident_data.tsg_link:
+        if has_tsg:
+            self.with_tsg += 1
             self.tsg_links[incident_data.tsg_link] += 1
+        else:
+            self.severity_no_tsg[incident_data.severity] += 1
+            if incident_data.severity <= 3:
+                self._count(self.high_sev_no_tsg, incident_data.incident_id)
+        
+        if incident_data.tsg_effectiveness is True:
+            self.effective_tsgs += 1
+        elif incident_data.tsg_effectiveness is False:
+            self.ineffective_tsgs += 1
+            self._count(self.ineffective, incident_data.incident_id)
         
         # Categorize by keywords in title
-        title_lower = incident_data.title.lower()
-        if 'label' in title_lower or 'classification' in title_lower:
-            self.categories['Labeling/Classification'].append(incident_data.incident_id)
-        if 'encrypt' in title_lower or 'dlp' in title_lower:
-            self.categories['Encryption/DLP'].append(incident_data.incident_id)
-        if 'sit' in title_lower or 'sensitive information' in title_lower:
-            self.categories['SIT/Detection'].append(incident_data.incident_id)
-        if 'scanner' in title_lower or 'scan' in title_lower:
-            self.categories['Scanning'].append(incident_data.incident_id)
-        if 'policy' in title_lower:
-            self.categories['Policy'].append(incident_data.incident_id)
-        if 'migration' in title_lower:
-            self.categories['Migration'].append(incident_data.incident_id)
+        for category in CATEGORIES.classify(incident_data.title)['categories']:
+            stats = self.categories.setdefault(category, {'total': 0, 'with_tsg': 0})
+            stats['total'] += 1
+            stats['with_tsg'] += has_tsg
+    
+    @staticmethod
+    def _count(tally: Dict, incident_id):
+        tally['count'] += 1
+        if len(tally['samples']) < SAMPLE_SIZE:
+            tally['samples'].append(incident_id)
+    
+    def add_incidents(self, incidents_json: Iterable[Dict]):
+        """Extract and add each of a stream of full incident JSONs"""
+        for incident_json in incidents_json:
+            self.add_incident(self.extract_tsg_data(incident_json))
+    
+    def iter_incidents(self) -> Iterator[TSGIncidentData]:
+        """Every incident added, in order (read back from the spill file when not kept in memory)"""
+        if self.keep_incidents:
+            yield from self.incidents
+            return
+        self._spill.flush()
+        self._spill.seek(0)
+        for line in self._spill:
+            yield TSGIncidentData(**json.loads(line))
+        self._spill.seek(0, os.SEEK_END)
     
     def analyze_gaps(self) -> Dict:
         """Perform TSG gap analysis"""
         
-        total_incidents = len(self.incidents)
+        total_incidents = self.incident_count
         if total_incidents == 0:
             return {"error": "No incidents to analyze"}
         
-        # Calculate metrics
-        incidents_with_tsg = sum(1 for i in self.incidents if i.tsg_link)
-        incidents_without_tsg = total_incidents - incidents_with_tsg
-        
-        # TSG effectiveness tracking
-        effective_tsgs = sum(1 for i in self.incidents 
-                            if i.tsg_effectiveness is True)
-        ineffective_tsgs = sum(1 for i in self.incidents 
-                              if i.tsg_effectiveness is False)
-        
-        # Severity breakdown for incidents without TSGs
-        sev_breakdown_no_tsg = defaultdict(int)
-        for incident in self.incidents:
-            if not incident.tsg_link:
-                sev_breakdown_no_tsg[incident.severity] += 1
-        
         # Category coverage analysis
         category_coverage = {}
-        for category, incident_ids in self.categories.items():
-            cat_incidents = [i for i in self.incidents if i.incident_id in incident_ids]
-            with_tsg = sum(1 for i in cat_incidents if i.tsg_link)
+        for category, stats in self.categories.items():
             category_coverage[category] = {
-                'total': len(cat_incidents),
-                'with_tsg': with_tsg,
-                'without_tsg': len(cat_incidents) - with_tsg,
-                'coverage_pct': (with_tsg / len(cat_incidents) * 100) if cat_incidents else 0
+                'total': stats['total'],
+                'with_tsg': stats['with_tsg'],
+                'without_tsg': stats['total'] - stats['with_tsg'],
+                'coverage_pct': (stats['with_tsg'] / stats['total'] * 100) if stats['total'] else 0
             }
         
         return {
             'summary': {
                 'total_incidents': total_incidents,
-                'incidents_with_tsg': incidents_with_tsg,
-                'incidents_without_tsg': incidents_without_tsg,
-                'tsg_coverage_pct': (incidents_with_tsg / total_incidents * 100),
-                'effective_tsgs': effective_tsgs,
-                'ineffective_tsgs': ineffective_tsgs
+                'incidents_with_tsg': self.with_tsg,
+                'incidents_without_tsg': total_incidents - self.with_tsg,
+                'tsg_coverage_pct': (self.with_tsg / total_incidents * 100),
+                'effective_tsgs': self.effective_tsgs,
+                'ineffective_tsgs': self.ineffective_tsgs
             },
-            'severity_breakdown_no_tsg': dict(sev_breakdown_no_tsg),
+            'severity_breakdown_no_tsg': dict(self.severity_no_tsg),
             'category_coverage': category_coverage,
             'most_used_tsgs': sorted(self.tsg_links.items(), key=lambda x: x[1], reverse=True)[:10],
-            'gap_priorities': self._identify_gap_priorities()
+            'gap_priorities': self._identify_gap_priorities(category_coverage)
         }
     
-    def _identify_gap_priorities(self) -> List[Dict]:
+    def _identify_gap_priorities(self, category_coverage: Dict) -> List[Dict]:
         """Identify highest priority TSG gaps"""
         priorities = []
         
         # High severity incidents without TSGs
-        high_sev_no_tsg = [i for i in self.incidents 
-                          if not i.tsg_link and i.severity <= 3]
-        if high_sev_no_tsg:
+        if self.high_sev_no_tsg['count']:
             priorities.append({
                 'priority': 'HIGH',
-                'reason': f'{len(high_sev_no_tsg)} high-severity incidents (Sev 0-3) without TSG links',
-                'count': len(high_sev_no_tsg),
-                'sample_incidents': [i.incident_id for i in high_sev_no_tsg[:5]]
+                'reason': f"{self.high_sev_no_tsg['count']} high-severity incidents (Sev 0-3) without TSG links",
+                'count': self.high_sev_no_tsg['count'],
+                'sample_incidents': list(self.high_sev_no_tsg['samples'])
             })
         
         # Incidents with ineffective TSGs
-        ineffective = [i for i in self.incidents if i.tsg_effectiveness is False]
-        if ineffective:
+        if self.ineffective['count']:
             priorities.append({
                 'priority': 'MEDIUM',
-                'reason': f'{len(ineffective)} incidents marked TSG as ineffective',
-                'count': len(ineffective),
-                'sample_incidents': [i.incident_id for i in ineffective[:5]]
+                'reason': f"{self.ineffective['count']} incidents marked TSG as ineffective",
+                'count': self.ineffective['count'],
+                'sample_incidents': list(self.ineffective['samples'])
             })
         
         # Categories with low coverage
-        for category, incident_ids in self.categories.items():
-            cat_incidents = [i for i in self.incidents if i.incident_id in incident_ids]
-            with_tsg = sum(1 for i in cat_incidents if i.tsg_link)
-            coverage = (with_tsg / len(cat_incidents) * 100) if cat_incidents else 0
-            
-            if coverage < 50 and len(cat_incidents) >= 5:
+        for category, stats in category_coverage.items():
+            if stats['coverage_pct'] < 50 and stats['total'] >= 5:
                 priorities.append({
                     'priority': 'MEDIUM',
-                    'reason': f'{category} category has low TSG coverage ({coverage:.1f}%)',
-                    'count': len(cat_incidents),
-                    'coverage_pct': coverage
+                    'reason': f"{category} category has low TSG coverage ({stats['coverage_pct']:.1f}%)",
+                    'count': stats['total'],
+                    'coverage_pct': stats['coverage_pct']
                 })
         
         return sorted(priorities, key=lambda x: (
@@ -190,15 +238,22 @@ class TSGGapAnalyzer:
         ))
     
     def save_results(self, output_path: str):
-        """Save analysis results to JSON"""
+        """Save analysis results to JSON, writing the incidents one at a time"""
         results = {
             'analysis': self.analyze_gaps(),
-            'incident_count': len(self.incidents),
-            'incidents': [asdict(i) for i in self.incidents]
+            'incident_count': self.incident_count
         }
         
+        # Same layout as json.dump(..., indent=2) with an 'incidents' list, without building the list
+        head = json.dumps(results, indent=2)
         with open(output_path, 'w') as f:
-            json.dump(results, f, indent=2)
+            f.write(head[:-2] + ',\n  "incidents": [')
+            count = 0
+            for incident in self.iter_incidents():
+                f.write(',\n' if count else '\n')
+                f.write(textwrap.indent(json.dumps(asdict(incident), indent=2), '    '))
+                count += 1
+            f.write('\n  ]\n}' if count else ']\n}')
         
         print(f"Results saved to {output_path}")
         return results
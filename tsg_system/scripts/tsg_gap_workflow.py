@@ -48,21 +48,12 @@ def run_tsg_gap_analysis():
         
         return None
     
-    # Step 2: Load all retrieved incidents
-    print("Step 2: Loading retrieved incidents...")
-    incidents = retriever.load_all_incidents()
-    print(f"✓ Loaded {len(incidents)} incidents")
-    print()
-    
-    # Step 3: Analyze for TSG gaps
-    print("Step 3: Analyzing TSG gaps...")
-    analyzer = TSGGapAnalyzer()
-    
-    for incident in incidents:
-        tsg_data = analyzer.extract_tsg_data(incident)
-        analyzer.add_incident(tsg_data)
+    # Step 2-3: Stream retrieved incidents through the analyzer, one at a time
+    print("Step 2-3: Loading retrieved incidents and analyzing TSG gaps...")
+    analyzer = TSGGapAnalyzer(keep_incidents=False)
+    analyzer.add_incidents(retriever.iter_incidents())
     
-    print(f"✓ Analyzed {len(analyzer.incidents)} incidents")
+    print(f"✓ Analyzed {analyzer.incident_count} incidents")
     print()
     
     # Step 4: Generate and save results